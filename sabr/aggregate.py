@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import struct
+
+import numpy as np
+
+from sabr.compiler import compile_metrics
+from sabr.evaluator import compute
+from sabr.registry import BATTING_STATS
+
+__author__ = 'Shinichi Nakagawa'
+
+MAGIC = b'SABRAGG1'
+# magic, header length(json: fields, keys), keys, fields
+_PREFIX = struct.Struct('<8sQQQ')
+
+
+class PartialAggregate(object):
+    """
+    Mergeable partial aggregate
+    One int64 counter vector per key(e.g. (player, season, split)). Counting stats are sums,
+    so partials built on different processes or nodes merge in O(keys) into the same totals
+    a single node would have counted.
+    """
+
+    def __init__(self, fields=BATTING_STATS):
+        """
+        :param fields: counting stats(default:sabr.registry.BATTING_STATS)
+        """
+        self.fields = tuple(fields)
+        self._index = {}
+        self._keys = []
+        self._values = np.zeros((16, len(self.fields)), dtype=np.int64)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def keys(self):
+        return list(self._keys)
+
+    @property
+    def values(self):
+        """
+        :return: (ndarray) (keys, fields) counters
+        """
+        return self._values[:len(self._keys)]
+
+    def _rows(self, keys):
+        rows = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            row = self._index.get(key)
+            if row is None:
+                # numpy scalars(e.g. from np.unique) are stored as Python values, so the header serializes
+                key = tuple(part.item() if isinstance(part, np.generic) else part for part in key)
+                row = self._index.get(key)
+            if row is None:
+                row = len(self._keys)
+                self._index[key] = row
+                self._keys.append(key)
+            rows[i] = row
+        if len(self._keys) > len(self._values):
+            values = np.zeros((max(len(self._keys), 2 * len(self._values)), len(self.fields)), dtype=np.int64)
+            values[:len(self._values)] = self._values
+            self._values = values
+        return rows
+
+    def add(self, key, counters):
+        """
+        Add one row
+        :param key: key tuple(e.g. ('suzukic01', 2004, 'vsL'))
+        :param counters: mapping of counting stats, missing ones are 0
+        """
+        row = self._rows([key])[0]
+        for i, field in enumerate(self.fields):
+            if field in counters:
+                self._values[row, i] += counters[field]
+
+    def update(self, table, by):
+        """
+        Add a table of rows, grouped by the key columns
+        :param table: mapping of columns(key columns and counting stats)
+        :param by: key column names(e.g. ('player', 'season', 'split'))
+        """
+        codes = None
+        for name in by:
+            _, inverse = np.unique(np.asarray(table[name]), return_inverse=True)
+            inverse = inverse.astype(np.int64).ravel()
+            codes = inverse if codes is None else codes * (inverse.max() + 1 if len(inverse) else 1) + inverse
+        if codes is None or not len(codes):
+            return
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        first = order[starts]
+        columns = [np.asarray(table[name])[first].tolist() for name in by]
+        rows = self._rows(list(zip(*columns)))
+        for i, field in enumerate(self.fields):
+            if field in table:
+                values = np.asarray(table[field], dtype=np.int64)[order]
+                self._values[rows, i] += np.add.reduceat(values, starts)
+
+    def merge(self, other):
+        """
+        Merge another partial into this one
+        :param other: PartialAggregate with the same fields
+        :return: (PartialAggregate) self
+        """
+        if other.fields != self.fields:
+            raise ValueError('fields mismatch: {} != {}'.format(other.fields, self.fields))
+        rows = self._rows(other._keys)
+        self._values[rows] += other.values
+        return self
+
+    def rollup(self, positions):
+        """
+        Totals over a coarser key
+        :param positions: key positions kept(e.g. (0, 1): (player, season, split) -> (player, season))
+        :return: (PartialAggregate) new aggregate
+        """
+        result = PartialAggregate(self.fields)
+        rows = result._rows([tuple(key[p] for p in positions) for key in self._keys])
+        np.add.at(result._values, rows, self.values)
+        return result
+
+    def counters(self, key):
+        """
+        :param key: key tuple
+        :return: (dict) counting stat -> value(0 for an unknown key)
+        """
+        row = self._index.get(key)
+        if row is None:
+            return dict.fromkeys(self.fields, 0)
+        return dict(zip(self.fields, self._values[row].tolist()))
+
+    def stat(self, key, metric, constants=None):
+        """
+        Metric of one key(raises ZeroDivisionError like Stats when the denominator is 0)
+        :param key: key tuple
+        :param metric: metric name(e.g. 'ops', 'woba_mlb', 'fip')
+        :param constants: constants profile
+        :return: value
+        """
+        return compile_metrics([metric], constants)(self.counters(key))[metric]
+
+    def compute(self, metrics, constants=None):
+        """
+        Metrics of every key(NaN/inf where a denominator is 0)
+        :param metrics: metric names
+        :param constants: constants profile
+        :return: (list, dict) keys, metric -> ndarray in keys order
+        """
+        values = self.values
+        data = {field: values[:, i] for i, field in enumerate(self.fields)}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.keys(), compute(metrics, data, constants)
+
+    def to_bytes(self):
+        """
+        Compact binary form: magic, sizes, JSON header(fields, keys), little-endian int64 counters
+        :return: (bytes) serialized aggregate
+        """
+        header = json.dumps({'fields': self.fields, 'keys': self._keys}, separators=(',', ':')).encode('utf-8')
+        prefix = _PREFIX.pack(MAGIC, len(header), len(self._keys), len(self.fields))
+        return prefix + header + self.values.astype('<i8').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        :param data: to_bytes() output
+        :return: (PartialAggregate) aggregate
+        """
+        magic, length, size, width = _PREFIX.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('not a sabr partial aggregate')
+        offset = _PREFIX.size
+        header = json.loads(bytes(data[offset:offset + length]).decode('utf-8'))
+        offset += length
+        aggregate = cls(header['fields'])
+        rows = aggregate._rows([tuple(key) for key in header['keys']])
+        values = np.frombuffer(data, dtype='<i8', count=size * width, offset=offset).reshape(size, width)
+        aggregate._values[rows] = values
+        return aggregate
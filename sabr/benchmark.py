@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark harness with regression gates
+
+    $ python -m sabr.benchmark --sizes 1000,100000 --save benchmark.json
+    $ python -m sabr.benchmark --sizes 1000,100000 --baseline benchmark.json --threshold 0.2
+    $ python -m sabr.benchmark --overhead
+"""
+
+import argparse
+import inspect
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import numpy as np
+
+from sabr.stats import Stats
+from sabr.vectorized import Stats as BatchStats
+
+__author__ = 'Shinichi Nakagawa'
+
+DEFAULT_SIZES = (1000, 100000, 10000000)
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_MIN_TIME = 0.2
+
+# name -> (setup, sized); setup(size) returns (function, rows per call)
+CASES = OrderedDict()
+
+
+def case(name, sized=True):
+    """
+    Register a benchmark case
+    :param name: case name(e.g. 'batch.rc')
+    :param sized: True if the case runs once per table size, False for a single scalar case
+    :return: decorator for setup(size) -> (function, rows per call)
+    """
+    def register(setup):
+        CASES[name] = (setup, sized)
+        return setup
+    return register
+
+
+def synthetic_table(size, seed=2004):
+    """
+    Synthetic player-season table with every column the Stats methods take
+    :param size: rows
+    :param seed: random seed
+    :return: (dict) name -> ndarray
+    """
+    rng = np.random.RandomState(seed)
+
+    def counts(high):
+        return rng.randint(0, high, size).astype(np.int32)
+
+    t = {k: counts(high) for k, high in (('_2b', 45), ('_3b', 10), ('hr', 50), ('bb', 120), ('ibb', 20),
+                                         ('hbp', 20), ('sf', 10), ('sh', 15), ('so', 200), ('sb', 60),
+                                         ('cs', 20), ('gidp', 25), ('er', 110), ('e_bb', 3), ('r', 130))}
+    t['ibb'] = np.minimum(t['ibb'], t['bb'])
+    t['h'] = t['_2b'] + t['_3b'] + t['hr'] + counts(150)
+    t['ab'] = t['h'] + t['so'] + counts(300) + 1
+    t['single'] = t['_1b'] = BatchStats.single(t['h'], t['hr'], t['_2b'], t['_3b'])
+    t['tb'] = BatchStats.tb(t['single'], t['hr'], t['_2b'], t['_3b'])
+    t['pa'] = BatchStats.pa(t['ab'], t['bb'], t['hbp'], t['sf'], t['sh'])
+    t['bfp'] = t['pa']
+    t['ip_outs'] = counts(700) + 1
+    t['ip'] = BatchStats.ip(t['ip_outs'])
+    t['rc'] = BatchStats.rc(t['tb'], t['h'], t['bb'], t['hbp'], t['cs'], t['gidp'], t['sf'], t['sh'], t['sb'],
+                            t['so'], t['ab'], t['ibb'])
+    t['woba'] = BatchStats.woba_mlb(t['bb'], t['hbp'], t['single'], t['_2b'], t['_3b'], t['hr'], t['ab'], t['sf'],
+                                    t['ibb'])
+    t['lg_woba'] = np.full(size, 0.32)
+    t['ra'] = rng.random_sample(size) * 6
+    t['league_ra'] = np.full(size, 4.5)
+    return t
+
+
+def stats_methods():
+    """
+    Public Stats methods
+    :return: (list) method names
+    """
+    return [name for name, _ in inspect.getmembers(Stats, inspect.ismethod) if not name.startswith('_')]
+
+
+def _parameters(method):
+    parameters = inspect.signature(method).parameters.values()
+    return [p.name for p in parameters if p.kind == p.POSITIONAL_OR_KEYWORD and p.default is p.empty]
+
+
+def _scalar_case(name):
+    def setup(size):
+        row = {k: v[0].item() for k, v in synthetic_table(1).items()}
+        method = getattr(Stats, name)
+        args = [row[p] for p in _parameters(method)]
+        if name == 'woba':
+            return lambda: method(*args, const_u_bb=0.69, const_u_hbp=0.72, const_u_e_bb=0, const_u_1b=0.89,
+                                  const_u_2b=1.27, const_u_3b=1.62, const_u_hr=2.10), 1
+        return lambda: method(*args), 1
+    return setup
+
+
+def _batch_case(name):
+    def setup(size):
+        table = synthetic_table(size)
+        method = getattr(BatchStats, name)
+        args = [table[p] for p in _parameters(method)]
+        if name == 'woba':
+            return lambda: method(*args, const_u_bb=0.69, const_u_hbp=0.72, const_u_e_bb=0, const_u_1b=0.89,
+                                  const_u_2b=1.27, const_u_3b=1.62, const_u_hr=2.10), size
+        return lambda: method(*args), size
+    return setup
+
+
+for _name in stats_methods():
+    case('scalar.{}'.format(_name), sized=False)(_scalar_case(_name))
+    case('batch.{}'.format(_name))(_batch_case(_name))
+
+
+STAT_LINE = ['avg', 'obp', 'slg', 'ops', 'babip', 'woba_mlb', 'rc', 'rc2002', 'base_runs']
+
+
+@case('evaluator.stat_line')
+def _evaluator_stat_line(size):
+    from sabr.evaluator import compute
+    table = synthetic_table(size)
+    data = {k: table[k] for k in ('ab', 'h', '_2b', '_3b', 'hr', 'bb', 'ibb', 'hbp', 'sf', 'sh', 'so', 'sb', 'cs',
+                                  'gidp')}
+    return lambda: compute(STAT_LINE, data), size
+
+
+@case('evaluator.masked')
+def _evaluator_masked(size):
+    from sabr.evaluator import evaluate
+    table = synthetic_table(size)
+    data = {k: table[k] for k in ('ab', 'h', '_2b', '_3b', 'hr', 'bb', 'ibb', 'hbp', 'sf', 'sh', 'so', 'sb', 'cs',
+                                  'gidp')}
+    # cup-of-coffee rows: no plate appearance at all
+    for k in data:
+        data[k][::10] = 0
+    return lambda: evaluate(STAT_LINE, data), size
+
+
+@case('compiler.stat_line')
+def _compiler_stat_line(size):
+    from sabr.compiler import compile_metrics
+    table = synthetic_table(size)
+    kernel = compile_metrics(STAT_LINE, batch=True)
+    args = [table[name] for name in kernel.inputs + kernel.optional]
+    return lambda: kernel.function(*args), size
+
+
+@case('compiler.scalar_row', sized=False)
+def _compiler_scalar_row(size):
+    from sabr.compiler import compile_metrics
+    row = {k: v[0].item() for k, v in synthetic_table(1).items()}
+    kernel = compile_metrics(STAT_LINE)
+    args = [row[name] for name in kernel.inputs + kernel.optional]
+    return lambda: kernel.function(*args), 1
+
+
+@case('streaming.plate_appearance', sized=False)
+def _streaming_plate_appearance(size):
+    from sabr.events import PLATE_APPEARANCES
+    from sabr.streaming import Accumulator
+    accumulator = Accumulator()
+    events = [(i % 300, i % 40, PLATE_APPEARANCES[i % len(PLATE_APPEARANCES)]) for i in range(1000)]
+
+    def stream():
+        for batter, pitcher, event in events:
+            accumulator.plate_appearance(batter, pitcher, event)
+    return stream, len(events)
+
+
+@case('gamelog.rolling')
+def _gamelog_rolling(size):
+    from sabr.gamelog import GameLogIndex
+    table = synthetic_table(size)
+    players = np.arange(size) // 150
+    dates = np.arange(size) % 150
+    index = GameLogIndex(players, dates, {k: table[k] for k in ('ab', 'h', '_2b', '_3b', 'hr', 'bb', 'hbp', 'sf')})
+    return lambda: index.rolling(15, ['ops']), size
+
+
+@case('parallel.recompute')
+def _parallel_recompute(size):
+    from sabr.parallel import recompute
+    table = synthetic_table(size)
+    data = {k: table[k] for k in ('ab', 'h', '_2b', '_3b', 'hr', 'bb', 'ibb', 'hbp', 'sf', 'sh', 'so', 'sb', 'cs',
+                                  'gidp')}
+    return lambda: recompute(STAT_LINE, data), size
+
+
+_GAME = '''id,{id}
+start,v1,"V1",0,1,8
+start,v2,"V2",0,2,6
+start,vp,"VP",0,0,1
+start,h1,"H1",1,1,8
+start,h2,"H2",1,2,6
+start,hp,"HP",1,0,1
+play,1,0,v1,12,BCX,S8/G
+play,1,0,v2,32,BBCBFB,W.1-2
+play,1,0,v1,22,CBFBX,D7/L.2-H;1-3
+play,1,0,v2,01,CX,8/SF.3-H
+play,1,0,v1,11,BCX,64(1)3/GDP
+play,1,1,h1,00,X,HR/9
+play,1,1,h2,32,BBCBFS,K+SB2
+play,1,1,h1,10,BX,E6/G
+play,1,1,h2,11,CBX,53/SH.1-2
+play,1,1,h1,22,BCBFX,9/F
+'''
+
+
+@case('retrosheet.parse', sized=False)
+def _retrosheet_parse(size):
+    from sabr.retrosheet import batches, read
+    text = ''.join(_GAME.format(id='TST2004{:05d}'.format(game)) for game in range(200))
+    return lambda: list(batches(read(io.StringIO(text)))), 200 * 10
+
+
+@case('simulation.innings')
+def _simulation_innings(size):
+    from sabr.simulation import profiles, simulate
+    table = synthetic_table(9)
+    probabilities = profiles({k: table[k] for k in ('ab', 'h', '_2b', '_3b', 'hr', 'bb', 'ibb', 'hbp', 'sf', 'sh',
+                                                    'so')})
+    return lambda: simulate(probabilities, range(9), games=size, innings=1, seed=2004), size
+
+
+@case('projection.marcel')
+def _projection_marcel(size):
+    from sabr.projection import projections
+    table = synthetic_table(size)
+    players = np.arange(size) // 3
+    seasons = 2013 + np.arange(size) % 3
+    ages = 22 + players % 18
+    return lambda: projections(STAT_LINE, players, seasons, table, 2016, ages=ages), size
+
+
+@case('instrument.disabled', sized=False)
+def _instrument_disabled(size):
+    from sabr import instrument
+    instrument.enable()
+    instrument.disable()
+    return _avg_call, 1
+
+
+def _avg_call():
+    # Stats.avg looked up on every call, as a wrapper left behind by instrumentation would be
+    return Stats.avg(150, 500)
+
+
+def measure(function, rows, min_time=DEFAULT_MIN_TIME, repeat=3):
+    """
+    Time and memory of one case
+    :param function: callable
+    :param rows: rows per call
+    :param min_time: minimum seconds per timing repeat
+    :param repeat: timing repeats(best is kept)
+    :return: (dict) seconds per call, calls/sec, rows/sec, peak bytes
+    """
+    function()
+    number, elapsed = 1, 0.0
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 24:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - start) / number)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'seconds': best,
+        'calls_per_sec': 1.0 / best if best else float('inf'),
+        'rows_per_sec': rows / best if best else float('inf'),
+        'peak_bytes': peak,
+    }
+
+
+def overhead(min_time=DEFAULT_MIN_TIME, repeat=3):
+    """
+    Instrumentation cost on the scalar hot path(Stats.avg), the counters are reset afterwards
+    :param min_time: minimum seconds per timing repeat
+    :param repeat: timing repeats
+    :return: (OrderedDict) 'disabled', 'enabled' -> seconds per call relative to a never instrumented run
+    """
+    from sabr import instrument
+    if instrument.enabled():
+        raise RuntimeError('instrumentation is enabled')
+    before = measure(_avg_call, 1, min_time, repeat)['seconds']
+    instrument.enable()
+    try:
+        enabled = measure(_avg_call, 1, min_time, repeat)['seconds']
+    finally:
+        instrument.disable()
+        instrument.reset()
+    disabled = measure(_avg_call, 1, min_time, repeat)['seconds']
+    return OrderedDict([('disabled', disabled / before), ('enabled', enabled / before)])
+
+
+def run(sizes=DEFAULT_SIZES, pattern=None, min_time=DEFAULT_MIN_TIME, repeat=3, out=None):
+    """
+    Run benchmark cases
+    :param sizes: table sizes for sized cases
+    :param pattern: substring filter on case names(default:None, every case)
+    :param min_time: minimum seconds per timing repeat
+    :param repeat: timing repeats
+    :param out: progress stream(default:None, quiet)
+    :return: (dict) 'case@size' -> measurement
+    """
+    results = OrderedDict()
+    for name, (setup, sized) in CASES.items():
+        if pattern and pattern not in name:
+            continue
+        for size in (sizes if sized else (1, )):
+            function, rows = setup(size)
+            key = '{}@{}'.format(name, size) if sized else name
+            results[key] = measure(function, rows, min_time, repeat)
+            if out is not None:
+                out.write('{:<40} {:>16,.0f} rows/s {:>14,} B\n'.format(
+                    key, results[key]['rows_per_sec'], results[key]['peak_bytes']))
+    return results
+
+
+def save(path, results):
+    """
+    Store results as a JSON baseline
+    :param path: file path
+    :param results: run() results
+    """
+    document = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(document, indent=2, sort_keys=True))
+
+
+def load(path):
+    """
+    Load a JSON baseline
+    :param path: file path
+    :return: (dict) 'case@size' -> measurement
+    """
+    with io.open(path, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Regressions against a baseline
+    :param results: run() results
+    :param baseline: load() results
+    :param threshold: allowed throughput loss(default:0.2, 20%)
+    :return: (list) (case, baseline rows/sec, current rows/sec) for each regressed case
+    """
+    regressions = []
+    for key, current in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        if current['rows_per_sec'] < before['rows_per_sec'] * (1.0 - threshold):
+            regressions.append((key, before['rows_per_sec'], current['rows_per_sec']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sabr.benchmark', description='sabr benchmark harness')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='comma separated table sizes')
+    parser.add_argument('-k', '--pattern', default=None, help='run cases whose name contains this')
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME, help='seconds per timing repeat')
+    parser.add_argument('--repeat', type=int, default=3, help='timing repeats')
+    parser.add_argument('--baseline', default=None, help='JSON baseline to compare with')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='allowed throughput loss')
+    parser.add_argument('--save', default=None, help='write results as a JSON baseline')
+    parser.add_argument('--overhead', action='store_true',
+                        help='check that disabled instrumentation costs nothing(within the threshold)')
+    args = parser.parse_args(argv)
+    if args.overhead:
+        ratios = overhead(args.min_time, args.repeat)
+        sys.stdout.write('instrumentation overhead: disabled {disabled:.3f}x, enabled {enabled:.3f}x\n'.format(
+            **ratios))
+        return 1 if ratios['disabled'] > 1.0 + args.threshold else 0
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    results = run(sizes, args.pattern, args.min_time, args.repeat, out=sys.stdout)
+    if args.save:
+        save(args.save, results)
+    if args.baseline:
+        regressions = compare(results, load(args.baseline), args.threshold)
+        for key, before, current in regressions:
+            sys.stdout.write('REGRESSION {}: {:,.0f} -> {:,.0f} rows/s\n'.format(key, before, current))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.league import BATTING, PITCHING
+from sabr.vectorized import column
+
+__author__ = 'Shinichi Nakagawa'
+
+DEFAULT_REPLICATES = 1000
+DEFAULT_CHUNK_SIZE = 100
+DEFAULT_LEVEL = 0.95
+
+# plate appearance outcomes drawn per side
+OUTCOMES = {
+    BATTING: ('single', '_2b', '_3b', 'hr', 'ubb', 'ibb', 'hbp', 'so', 'sf', 'sh', 'out'),
+    PITCHING: ('hr', 'hit', 'ubb', 'ibb', 'hbp', 'so', 'other'),
+}
+
+Interval = namedtuple('Interval', ('estimate', 'lower', 'upper'))
+
+
+def outcomes(table, side=BATTING):
+    """
+    Plate appearance outcome counts per player
+    :param table: mapping of counting stat columns
+    :param side: 'batting' or 'pitching'(default:'batting')
+    :return: (ndarray) (players, outcomes) counts in OUTCOMES[side] order
+    """
+    t = {k: column(v).astype(np.int64) for k, v in table.items()}
+    zero = np.zeros_like(t['h'])
+    ibb = t.get('ibb', zero)
+    if side == PITCHING:
+        hbp = t.get('hbp', zero)
+        counts = [t['hr'], t['h'] - t['hr'], t['bb'] - ibb, ibb, hbp, t['so']]
+        counts.append(t['bfp'] - sum(counts))
+    else:
+        counts = [t['h'] - t['hr'] - t['_2b'] - t['_3b'], t['_2b'], t['_3b'], t['hr'], t['bb'] - ibb, ibb,
+                  t.get('hbp', zero), t['so'], t.get('sf', zero), t.get('sh', zero)]
+        counts.append(t['ab'] - t['h'] - t['so'])
+    counts = np.stack(counts, axis=1)
+    if np.any(counts < 0):
+        raise ValueError('inconsistent counting stats(negative outcome count)')
+    return counts
+
+
+def counting_stats(draws, table, side=BATTING):
+    """
+    Counting stats of resampled outcomes
+    Stats that are not plate appearance outcomes(sb, cs, gidp...) keep their observed values;
+    pitcher outs scale with the outs drawn.
+    :param draws: (..., players, outcomes) resampled counts
+    :param table: observed mapping of counting stat columns
+    :param side: 'batting' or 'pitching'(default:'batting')
+    :return: (dict) counting stat -> (..., players) array
+    """
+    d = dict(zip(OUTCOMES[side], np.moveaxis(draws, -1, 0)))
+    shape = draws.shape[:-1]
+    stats = {k: np.broadcast_to(column(v), shape) for k, v in table.items()}
+    if side == PITCHING:
+        stats.update(hr=d['hr'], h=d['hr'] + d['hit'], bb=d['ubb'] + d['ibb'], ibb=d['ibb'], hbp=d['hbp'],
+                     so=d['so'])
+        counts = outcomes(table, side)
+        observed = counts[:, OUTCOMES[side].index('so')] + counts[:, -1]
+        ratio = np.where(observed > 0, (d['so'] + d['other']) / np.maximum(observed, 1), 1.0)
+        stats['ip_outs'] = np.rint(column(table['ip_outs']) * ratio).astype(np.int64)
+    else:
+        h = d['single'] + d['_2b'] + d['_3b'] + d['hr']
+        stats.update(h=h, _2b=d['_2b'], _3b=d['_3b'], hr=d['hr'], bb=d['ubb'] + d['ibb'], ibb=d['ibb'],
+                     hbp=d['hbp'], so=d['so'], sf=d['sf'], sh=d['sh'], ab=h + d['so'] + d['out'])
+    return stats
+
+
+def _chunk(task):
+    """
+    Worker: one chunk of replicates
+    """
+    metrics, table, side, size, seed, constants = task
+    rng = np.random.default_rng(seed)
+    counts = outcomes(table, side)
+    trials = counts.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = counts / np.maximum(trials, 1)[:, None]
+    p[trials == 0] = 0.0
+    p[trials == 0, -1] = 1.0
+    draws = rng.multinomial(trials, p, size=(size, len(trials)))
+    stats = counting_stats(draws, table, side)
+    data = {k: np.ascontiguousarray(v).reshape(-1) for k, v in stats.items()}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = compute(metrics, data, constants)
+    return {metric: np.asarray(values[metric], dtype=np.float64).reshape(size, len(trials)) for metric in metrics}
+
+
+def resample(metrics, table, side=BATTING, replicates=DEFAULT_REPLICATES, seed=None, chunk_size=DEFAULT_CHUNK_SIZE,
+             workers=1, constants=None):
+    """
+    Bootstrap replicates of metrics for every player at once
+    Each chunk of replicates draws a (chunk, players, outcomes) multinomial array, so memory
+    is bounded by chunk_size. Chunks get independent child seeds of one SeedSequence: the
+    result depends on the seed only, not on chunk scheduling or the number of workers.
+    :param metrics: metric names(e.g. ['avg', 'obp', 'babip', 'woba_mlb'] or ['fip'])
+    :param table: mapping of counting stat columns, one row per player
+    :param side: 'batting' or 'pitching'(default:'batting')
+    :param replicates: number of replicates(default:1000)
+    :param seed: RNG seed
+    :param chunk_size: replicates per chunk(default:100)
+    :param workers: worker processes(default:1, in process; None: os.cpu_count())
+    :param constants: constants profile
+    :return: (dict) metric -> (replicates, players) array
+    """
+    metrics = list(metrics)
+    table = {k: column(v) for k, v in table.items()}
+    sizes = [min(chunk_size, replicates - start) for start in range(0, replicates, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(metrics, table, side, size, child, constants) for size, child in zip(sizes, seeds)]
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers <= 1 or len(tasks) <= 1:
+        chunks = [_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            chunks = list(executor.map(_chunk, tasks))
+    return {metric: np.concatenate([chunk[metric] for chunk in chunks]) for metric in metrics}
+
+
+def intervals(metrics, table, side=BATTING, level=DEFAULT_LEVEL, replicates=DEFAULT_REPLICATES, seed=None,
+              chunk_size=DEFAULT_CHUNK_SIZE, workers=1, constants=None):
+    """
+    Percentile bootstrap confidence intervals
+    :param metrics: metric names
+    :param table: mapping of counting stat columns, one row per player
+    :param side: 'batting' or 'pitching'(default:'batting')
+    :param level: confidence level(default:0.95)
+    :param replicates: number of replicates(default:1000)
+    :param seed: RNG seed
+    :param chunk_size: replicates per chunk(default:100)
+    :param workers: worker processes(default:1)
+    :param constants: constants profile
+    :return: (dict) metric -> Interval(estimate, lower, upper) columns
+    """
+    draws = resample(metrics, table, side, replicates, seed, chunk_size, workers, constants)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        estimates = compute(metrics, table, constants)
+    tail = 50.0 * (1.0 - level)
+    result = OrderedDict()
+    for metric in metrics:
+        values = draws[metric]
+        empty = np.all(np.isnan(values), axis=0)
+        values = np.where(empty, 0.0, values)
+        lower, upper = np.nanpercentile(values, [tail, 100.0 - tail], axis=0)
+        lower[empty] = upper[empty] = np.nan
+        result[metric] = Interval(np.asarray(estimates[metric], dtype=np.float64), lower, upper)
+    return result
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import os
+
+import numpy as np
+
+__author__ = 'Shinichi Nakagawa'
+
+FORMAT = 'sabr-columnar'
+VERSION = 1
+HEADER = 'header.json'
+DTYPE = np.dtype('<i4')
+
+# counting stats a player-season history usually carries
+COUNTING_STATS = ('ab', 'h', '_2b', '_3b', 'hr', 'bb', 'ibb', 'hbp', 'sf', 'sh', 'so', 'sb', 'cs', 'gidp',
+                  'ip_outs', 'er', 'bfp')
+
+_INT32 = np.iinfo(np.int32)
+
+
+def _column_file(path, name):
+    return os.path.join(path, '{}.i32'.format(name))
+
+
+def _dictionary_file(path, name):
+    return os.path.join(path, '{}.dict'.format(name))
+
+
+class ColumnWriter(object):
+    """
+    Columnar store writer
+    One little-endian int32 file per column, string columns dictionary-encoded
+    (int32 codes + one value per line). Chunks are appended as they arrive.
+    """
+
+    def __init__(self, path, columns, strings=()):
+        """
+        :param path: store directory(created)
+        :param columns: int column names
+        :param strings: string(id) column names
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.path = path
+        self.columns = tuple(columns)
+        self.strings = tuple(strings)
+        self.rows = 0
+        self._files = {name: open(_column_file(path, name), 'wb') for name in self.columns + self.strings}
+        self._dictionaries = {name: {} for name in self.strings}
+
+    def append(self, table):
+        """
+        Append a chunk
+        Every column is checked before anything is written, so a rejected chunk leaves the
+        store as it was.
+        :param table: mapping of columns(every store column, same length, integer store columns)
+        """
+        chunk, size = {}, None
+        for name in self.columns + self.strings:
+            values = np.asarray(table[name])
+            if size is None:
+                size = len(values)
+            elif len(values) != size:
+                raise ValueError('column length mismatch: {}'.format(name))
+            if name in self.columns and len(values):
+                if values.dtype.kind not in 'iu':
+                    raise ValueError('not an integer column: {}({})'.format(name, values.dtype))
+                if values.min() < _INT32.min or values.max() > _INT32.max:
+                    raise ValueError('int32 overflow: {}'.format(name))
+            chunk[name] = values
+        for name in self.strings:
+            chunk[name] = self._encode(name, chunk[name])
+        for name, values in chunk.items():
+            self._files[name].write(values.astype(DTYPE).tobytes())
+        self.rows += size or 0
+
+    def _encode(self, name, values):
+        dictionary = self._dictionaries[name]
+        keys, inverse = np.unique(values.astype(str), return_inverse=True)
+        codes = np.array([dictionary.setdefault(key, len(dictionary)) for key in keys.tolist()], dtype=DTYPE)
+        return codes[inverse]
+
+    def _release(self):
+        for f in self._files.values():
+            f.close()
+
+    def close(self):
+        """
+        Flush the columns and write the dictionaries and header
+        """
+        self._release()
+        for name, dictionary in self._dictionaries.items():
+            with io.open(_dictionary_file(self.path, name), 'w', encoding='utf-8', newline='\n') as f:
+                for value in sorted(dictionary, key=dictionary.get):
+                    f.write(value + '\n')
+        header = {
+            'format': FORMAT,
+            'version': VERSION,
+            'rows': self.rows,
+            'columns': list(self.columns),
+            'strings': list(self.strings),
+        }
+        with io.open(os.path.join(self.path, HEADER), 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header, indent=2))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # no header: a store left by a failed write does not open
+            self._release()
+
+
+class ColumnStore(object):
+    """
+    Memory-mapped columnar store
+    Columns are read-only int32 views over the mapped files: opening costs a header read,
+    pages load on first touch and are shared through the page cache between processes.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: store directory
+        """
+        with io.open(os.path.join(path, HEADER), encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get('format') != FORMAT or header.get('version') != VERSION:
+            raise ValueError('not a {} v{} store: {}'.format(FORMAT, VERSION, path))
+        self.path = path
+        self.rows = header['rows']
+        self.columns = tuple(header['columns'])
+        self.strings = tuple(header['strings'])
+        self._maps = {}
+        self._dictionaries = {}
+
+    @classmethod
+    def write(cls, path, table, strings=()):
+        """
+        Write a table and open it
+        :param path: store directory
+        :param table: mapping of columns
+        :param strings: string(id) column names
+        :return: (ColumnStore) store
+        """
+        columns = [name for name in table if name not in strings]
+        with ColumnWriter(path, columns, strings) as writer:
+            writer.append(table)
+        return cls(path)
+
+    def __len__(self):
+        return self.rows
+
+    def __contains__(self, name):
+        return name in self.columns or name in self.strings
+
+    def __getitem__(self, name):
+        """
+        Zero-copy int32 column(codes for string columns)
+        :param name: column name
+        :return: (ndarray) read-only view
+        """
+        if name not in self:
+            raise KeyError(name)
+        view = self._maps.get(name)
+        if view is None:
+            if self.rows:
+                view = np.memmap(_column_file(self.path, name), dtype=DTYPE, mode='r', shape=(self.rows, ))
+            else:
+                view = np.empty(0, dtype=DTYPE)
+            self._maps[name] = view
+        return view
+
+    def keys(self):
+        return self.columns
+
+    def dictionary(self, name):
+        """
+        Values of a string column's codes
+        :param name: string column name
+        :return: (ndarray) code -> value
+        """
+        values = self._dictionaries.get(name)
+        if values is None:
+            with io.open(_dictionary_file(self.path, name), encoding='utf-8') as f:
+                values = np.array(f.read().splitlines())
+            self._dictionaries[name] = values
+        return values
+
+    def decode(self, name):
+        """
+        Decoded string column
+        :param name: string column name
+        :return: (ndarray) values
+        """
+        return self.dictionary(name)[self[name]]
+
+    def table(self, names=None):
+        """
+        Int columns as zero-copy views, ready for sabr.vectorized / sabr.evaluator
+        :param names: column names(default:None, every int column)
+        :return: (dict) name -> view
+        """
+        return {name: self[name] for name in (self.columns if names is None else names)}
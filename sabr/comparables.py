@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import heapq
+import io
+import json
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.league import BATTING, PITCHING
+
+__author__ = 'Shinichi Nakagawa'
+
+FEATURES = {
+    BATTING: ('avg', 'obp', 'slg', 'iso', 'bb_rate', 'so_rate', 'woba_mlb'),
+    PITCHING: ('era', 'fip', 'whip', 'so9', 'bb9', 'hr9'),
+}
+LEAF_SIZE = 32
+VERSION = 1
+
+
+def _lower(queries, lo, hi):
+    """
+    Squared distance from every query to a bounding box
+    """
+    gap = np.maximum(lo - queries, 0.0) + np.maximum(queries - hi, 0.0)
+    return (gap * gap).sum(axis=1)
+
+
+class ComparablesIndex(object):
+    """
+    Nearest-neighbor index of player-seasons
+    Feature vectors(z-scores of Stats outputs) are held in a KD-tree: nodes split at the
+    median of their widest feature down to LEAF_SIZE points. Queries go best-first through
+    the nodes and skip the ones whose bounding box is farther than the k-th candidate, so a
+    lookup reads a few leaves instead of every player-season. Bulk runs query the points of
+    one leaf together, as they share most of the leaves they have to read.
+    """
+
+    def __init__(self, keys, vectors, features, mean=None, scale=None, leaf_size=LEAF_SIZE):
+        """
+        :param keys: key per row(e.g. (player, season)), JSON serializable
+        :param vectors: (rows, features) raw feature values
+        :param features: feature names
+        :param mean: feature means(default:None, from vectors)
+        :param scale: feature standard deviations(default:None, from vectors)
+        :param leaf_size: points per leaf(default:32)
+        """
+        vectors = np.asarray(vectors, dtype=np.float64).reshape(len(keys), len(features))
+        self.keys = [tuple(key) if isinstance(key, list) else key for key in keys]
+        self.features = tuple(features)
+        self.mean = vectors.mean(axis=0) if mean is None else np.asarray(mean, dtype=np.float64)
+        if scale is None:
+            scale = vectors.std(axis=0)
+            scale[scale == 0] = 1.0
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self._positions = {key: i for i, key in enumerate(self.keys)}
+        self._build((vectors - self.mean) / self.scale, leaf_size)
+
+    @classmethod
+    def from_table(cls, keys, table, side=BATTING, features=None, constants=None, leaf_size=LEAF_SIZE):
+        """
+        Build from counting stats with the batch formulas
+        Rows with an undefined feature(no AB, no IP...) are left out.
+        :param keys: key per row
+        :param table: mapping of counting stat columns
+        :param side: 'batting' or 'pitching'(default:'batting')
+        :param features: metric names(default:FEATURES[side])
+        :param constants: constants profile
+        :param leaf_size: points per leaf(default:32)
+        :return: (ComparablesIndex) index
+        """
+        features = FEATURES[side] if features is None else tuple(features)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = compute(features, table, constants)
+        vectors = np.column_stack([np.asarray(values[f], dtype=np.float64) for f in features])
+        rows = np.flatnonzero(np.all(np.isfinite(vectors), axis=1))
+        keys = keys.tolist() if isinstance(keys, np.ndarray) else list(keys)
+        return cls([keys[i] for i in rows], vectors[rows], features, leaf_size=leaf_size)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def _build(self, points, leaf_size):
+        order = np.arange(len(points))
+        lo, hi, children, bounds = [], [], [], []
+
+        def split(start, end):
+            node = len(bounds)
+            block = points[order[start:end]]
+            lo.append(block.min(axis=0) if end > start else np.zeros(points.shape[1]))
+            hi.append(block.max(axis=0) if end > start else np.zeros(points.shape[1]))
+            children.append((-1, -1))
+            bounds.append((start, end))
+            if end - start > leaf_size:
+                middle = (start + end) // 2
+                dimension = np.argmax(hi[node] - lo[node])
+                part = np.argpartition(block[:, dimension], middle - start)
+                order[start:end] = order[start:end][part]
+                children[node] = (split(start, middle), split(middle, end))
+            return node
+
+        split(0, len(points))
+        self._set_order(order)
+        self._points = points[order]
+        self._norms = (self._points * self._points).sum(axis=1)
+        self._lo, self._hi = np.array(lo), np.array(hi)
+        self._children = np.array(children, dtype=np.int64)
+        self._bounds = np.array(bounds, dtype=np.int64)
+
+    def _set_order(self, order):
+        self._order = order
+        self._inverse = np.empty_like(order)
+        self._inverse[order] = np.arange(len(order))
+
+    def _search(self, queries, k, exclude=None):
+        """
+        k nearest rows of a batch of normalized queries
+        :return: (ndarray, ndarray) (queries, k) row indexes(-1: fewer rows than k), squared distances
+        """
+        m = len(queries)
+        best = np.full((m, k), np.inf)
+        rows = np.full((m, k), -1, dtype=np.int64)
+        heap, counter = [(0.0, 0, 0, np.zeros(m))], 1
+        while heap:
+            nearest, _, node, lower = heapq.heappop(heap)
+            worst = best[:, -1]
+            if nearest > worst.max():
+                break
+            if np.all(lower > worst):
+                continue
+            left, right = self._children[node]
+            if left < 0:
+                start, end = self._bounds[node]
+                diff = queries[:, None, :] - self._points[None, start:end, :]
+                distances = (diff * diff).sum(axis=2)
+                ids = self._order[start:end]
+                if exclude is not None:
+                    distances[exclude[:, None] == ids[None, :]] = np.inf
+                candidates = np.concatenate([best, distances], axis=1)
+                labels = np.concatenate([rows, np.broadcast_to(ids, distances.shape)], axis=1)
+                chosen = np.argsort(candidates, axis=1, kind='stable')[:, :k]
+                best = np.take_along_axis(candidates, chosen, axis=1)
+                rows = np.take_along_axis(labels, chosen, axis=1)
+                continue
+            for child in (left, right):
+                bound = _lower(queries, self._lo[child], self._hi[child])
+                heapq.heappush(heap, (bound.min(), counter, child, bound))
+                counter += 1
+        rows[np.isinf(best)] = -1
+        return rows, best
+
+    def normalize(self, values):
+        """
+        Feature vectors of metric values
+        :param values: metric -> value or column
+        :return: (ndarray) (rows, features) z-scores
+        """
+        vectors = np.column_stack([np.atleast_1d(np.asarray(values[f], dtype=np.float64)) for f in self.features])
+        return (vectors - self.mean) / self.scale
+
+    def query(self, values, k=10):
+        """
+        Nearest player-seasons of metric values
+        :param values: metric -> value(e.g. {'avg': .300, 'obp': .400, ...})
+        :param k: neighbors(default:10)
+        :return: (list) (key, distance) nearest first
+        """
+        rows, distances = self._search(self.normalize(values)[:1], k)
+        return [(self.keys[r], float(np.sqrt(d))) for r, d in zip(rows[0], distances[0]) if r >= 0]
+
+    def comparables(self, key, k=10):
+        """
+        Nearest player-seasons of an indexed one(itself left out)
+        :param key: indexed key
+        :param k: neighbors(default:10)
+        :return: (list) (key, distance) nearest first
+        """
+        row = self._positions[key]
+        query = self._points[self._inverse[row]][None, :]
+        rows, distances = self._search(query, k, exclude=np.array([row]))
+        return [(self.keys[r], float(np.sqrt(d))) for r, d in zip(rows[0], distances[0]) if r >= 0]
+
+    def neighbors(self, k=10):
+        """
+        Comparables of every indexed player-season(bulk run, one batch per leaf)
+        The points of a leaf are compared, in one distance block, with the leaves that any of
+        them can reach within the distance of its k-th neighbor among the nearest leaves.
+        :param k: neighbors(default:10)
+        :return: (ndarray, ndarray) (rows, k) row indexes into keys(-1: none) and distances, in keys order
+        """
+        rows = np.full((len(self.keys), k), -1, dtype=np.int64)
+        distances = np.full((len(self.keys), k), np.inf)
+        leaves = np.flatnonzero((self._children[:, 0] < 0) & (self._bounds[:, 1] > self._bounds[:, 0]))
+        lo, hi, bounds = self._lo[leaves], self._hi[leaves], self._bounds[leaves]
+        sizes = bounds[:, 1] - bounds[:, 0]
+        for leaf in range(len(leaves)):
+            start, end = bounds[leaf]
+            queries, ids = self._points[start:end], self._order[start:end]
+            gap = np.maximum(lo - hi[leaf], 0.0) + np.maximum(lo[leaf] - hi, 0.0)
+            box = (gap * gap).sum(axis=1)
+            nearest = np.argsort(box, kind='stable')
+            # leaves holding k + 1 points(the query itself is one) bound the search radius
+            first = nearest[:np.searchsorted(np.cumsum(sizes[nearest]), k + 1) + 1]
+            radius = self._block(queries, ids, bounds[first], k)[1][:, -1]
+            candidates = np.flatnonzero(box <= radius.max())
+            gap = (np.maximum(lo[candidates][None, :, :] - queries[:, None, :], 0.0)
+                   + np.maximum(queries[:, None, :] - hi[candidates][None, :, :], 0.0))
+            candidates = candidates[np.any((gap * gap).sum(axis=2) <= radius[:, None], axis=0)]
+            found, squared = self._block(queries, ids, bounds[candidates], k)
+            rows[ids], distances[ids] = found, np.sqrt(squared)
+        return rows, distances
+
+    def _block(self, queries, ids, bounds, k):
+        """
+        k nearest rows among the points of some leaves, the query rows themselves left out
+        """
+        sizes = bounds[:, 1] - bounds[:, 0]
+        offsets = np.cumsum(sizes) - sizes
+        positions = np.arange(sizes.sum()) + np.repeat(bounds[:, 0] - offsets, sizes)
+        points = self._points[positions]
+        squared = ((queries * queries).sum(axis=1)[:, None] + self._norms[positions][None, :]
+                   - 2.0 * queries.dot(points.T))
+        np.maximum(squared, 0.0, out=squared)
+        labels = self._order[positions]
+        squared[ids[:, None] == labels[None, :]] = np.inf
+        if squared.shape[1] > k:
+            chosen = np.argpartition(squared, k - 1, axis=1)[:, :k]
+            labels = np.take_along_axis(np.broadcast_to(labels, squared.shape), chosen, axis=1)
+            squared = np.take_along_axis(squared, chosen, axis=1)
+        else:
+            labels = np.broadcast_to(labels, squared.shape)
+        order = np.argsort(squared, axis=1, kind='stable')
+        squared = np.take_along_axis(squared, order, axis=1)
+        labels = np.take_along_axis(labels, order, axis=1)
+        if squared.shape[1] < k:
+            padding = k - squared.shape[1]
+            squared = np.pad(squared, ((0, 0), (0, padding)), constant_values=np.inf)
+            labels = np.pad(labels, ((0, 0), (0, padding)), constant_values=-1)
+        labels = np.where(np.isinf(squared), -1, labels)
+        return labels, squared
+
+    def save(self, path):
+        """
+        Write the index(numpy .npz, no pickled objects)
+        :param path: file path, written as given(np.savez would add .npz to a path without it)
+        """
+        header = {'version': VERSION, 'features': list(self.features), 'keys': self.keys}
+        with io.open(path, 'wb') as f:
+            np.savez(f, header=np.array(json.dumps(header)), mean=self.mean, scale=self.scale, order=self._order,
+                     points=self._points, lo=self._lo, hi=self._hi, children=self._children, bounds=self._bounds)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an index written by save(), the tree is not rebuilt
+        :param path: file path
+        :return: (ComparablesIndex) index
+        """
+        with np.load(path) as f:
+            header = json.loads(f['header'].item())
+            if header['version'] != VERSION:
+                raise ValueError('unsupported comparables index version: {}'.format(header['version']))
+            index = cls.__new__(cls)
+            index.keys = [tuple(key) if isinstance(key, list) else key for key in header['keys']]
+            index.features = tuple(header['features'])
+            index.mean, index.scale = f['mean'], f['scale']
+            index._set_order(f['order'])
+            index._points = f['points']
+            index._norms = (index._points * index._points).sum(axis=1)
+            index._lo, index._hi = f['lo'], f['hi']
+            index._children, index._bounds = f['children'], f['bounds']
+        index._positions = {key: i for i, key in enumerate(index.keys)}
+        return index
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+
+from sabr.registry import REGISTRY, DEFAULTS, dependencies
+from sabr.vectorized import py_round, as_float, column
+
+__author__ = 'Shinichi Nakagawa'
+
+_CAST = re.compile(r'\bfloat\((\w+)\)')
+# zero-weight term of an inlined constant(e.g. const_u_e_bb for MLB), always 0.0 for counting stats
+_ZERO_TERM = re.compile(r'\bround\(\(0(?:\.0)?\) \* [\w()]+, \d+\)')
+
+
+def _identifier(name):
+    return re.compile(r'(?<![\w.]){}\b'.format(re.escape(name)))
+
+
+class Kernel(object):
+    """
+    Fused metric function
+    function(*inputs) returns a tuple of metric values in metrics order.
+    """
+
+    def __init__(self, metrics, inputs, optional, source, function, batch):
+        """
+        :param metrics: metric names(return order)
+        :param inputs: required parameter names
+        :param optional: optional parameter names(default 0)
+        :param source: generated python source
+        :param function: compiled function
+        :param batch: True if the kernel takes NumPy columns
+        """
+        self.metrics = metrics
+        self.inputs = inputs
+        self.optional = optional
+        self.source = source
+        self.function = function
+        self.batch = batch
+
+    def __call__(self, data):
+        """
+        Compute metrics for a row or a table
+        :param data: mapping of counting stats
+        :return: (dict) metric -> value
+        """
+        args = [data[name] for name in self.inputs]
+        args.extend(data[name] if name in data else DEFAULTS.get(name, 0) for name in self.optional)
+        return dict(zip(self.metrics, self.function(*args)))
+
+    def __repr__(self):
+        return 'Kernel({!r})'.format(self.metrics)
+
+
+class Compiler(object):
+    """
+    Formula compiler
+    Turns a metric set plus a constants profile into one python function(scalar rows)
+    or one NumPy expression sequence(batch). Constants are inlined as literals, each
+    intermediate is assigned once and float() casts of a name are hoisted to one local.
+    Kernels are cached by(metric set, constants, inputs, batch).
+    """
+
+    def __init__(self, registry=None):
+        """
+        :param registry: formula registry(default:sabr.registry.REGISTRY)
+        """
+        self.registry = REGISTRY if registry is None else registry
+        self._cache = {}
+
+    def compile(self, metrics, constants=None, batch=False, inputs=()):
+        """
+        Compile (or fetch from cache) a kernel
+        :param metrics: metric names
+        :param constants: constants profile(e.g. sabr.registry.WOBA_NPB, {'c': 3.05}), inlined
+        :param batch: True for NumPy columns, False for scalar rows(default:False)
+        :param inputs: names to take as parameters instead of computing or inlining them
+                       (e.g. 'ip' when it is supplied, 'c' when it varies per row)
+        :return: (Kernel) kernel
+        """
+        metrics = tuple(metrics)
+        constants = dict(constants or {})
+        key = (metrics, tuple(sorted(constants.items())), bool(batch), tuple(sorted(inputs)))
+        kernel = self._cache.get(key)
+        if kernel is None:
+            kernel = self._build(metrics, constants, bool(batch), frozenset(inputs))
+            self._cache[key] = kernel
+        return kernel
+
+    def _build(self, metrics, constants, batch, inputs):
+        plan = dependencies(metrics, inputs | frozenset(constants), self.registry, strict=False)
+        computed = frozenset(f.name for f in plan)
+        params, optional, expressions = [], [], []
+        for formula in plan:
+            expression = formula.expression
+            for name in formula.names:
+                if name in computed or name in params or name in optional:
+                    continue
+                if name in inputs:
+                    params.append(name)
+                elif name in constants or formula.constants.get(name) is not None:
+                    # inline the constant as a literal
+                    value = constants[name] if name in constants else formula.constants[name]
+                    value = value.item() if hasattr(value, 'item') else value
+                    expression = _identifier(name).sub('({!r})'.format(value), expression)
+                elif name in DEFAULTS:
+                    optional.append(name)
+                else:
+                    params.append(name)
+            expressions.append((formula.name, _ZERO_TERM.sub('0.0', expression)))
+        casts = set()
+        for _, expression in expressions:
+            casts.update(_CAST.findall(expression))
+
+        def cast(name):
+            return '    f_{0} = float({0})'.format(name)
+
+        lines = ['def kernel({}):'.format(', '.join(params + ['{}=0'.format(n) for n in optional]))]
+        if batch:
+            lines.extend('    {0} = column({0})'.format(name) for name in params + optional)
+        lines.extend(cast(name) for name in params + optional if name in casts)
+        for name, expression in expressions:
+            lines.append('    {} = {}'.format(name, _CAST.sub(r'f_\1', expression)))
+            if name in casts:
+                lines.append(cast(name))
+        lines.append('    return ({},)'.format(', '.join(metrics)))
+        source = '\n'.join(lines) + '\n'
+        namespace = {'__builtins__': {}}
+        if batch:
+            namespace.update({'round': py_round, 'float': as_float, 'column': column})
+        else:
+            namespace.update({'round': round, 'float': float})
+        exec(compile(source, '<sabr.compiler:{}>'.format(','.join(metrics)), 'exec'), namespace)
+        return Kernel(metrics, tuple(params), tuple(optional), source, namespace['kernel'], batch)
+
+
+_compiler = Compiler()
+
+
+def compile_metrics(metrics, constants=None, batch=False, inputs=()):
+    """
+    Compile a kernel with the default registry
+    :param metrics: metric names
+    :param constants: constants profile
+    :param batch: True for NumPy columns(default:False)
+    :param inputs: names to take as parameters instead of computing or inlining them
+    :return: (Kernel) kernel
+    """
+    return _compiler.compile(metrics, constants, batch, inputs)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.registry import BATTING_STATS
+
+__author__ = 'Shinichi Nakagawa'
+
+DTYPE = np.int32
+
+# common split dimensions
+PLATOON = ('L', 'R')
+HOME_AWAY = ('away', 'home')
+MONTHS = (3, 4, 5, 6, 7, 8, 9, 10)
+BASES = tuple(range(8))
+COUNTS = ('0-0', '0-1', '0-2', '1-0', '1-1', '1-2', '2-0', '2-1', '2-2', '3-0', '3-1', '3-2')
+
+
+class SplitCube(object):
+    """
+    Split aggregation cube
+    One dense int32 block per player, shaped (dimension values..., counting stats).
+    A split is a slice of the block, a rollup is a sum over the other axes, so every
+    split of a player is served from one indexed read and the formulas run in batch.
+    """
+
+    def __init__(self, dimensions, fields=BATTING_STATS):
+        """
+        :param dimensions: name -> values, in axis order(e.g. {'hand': PLATOON, 'month': MONTHS})
+        :param fields: counting stats(default:sabr.registry.BATTING_STATS)
+        """
+        self.dimensions = OrderedDict((name, tuple(values)) for name, values in dimensions.items())
+        self.fields = tuple(fields)
+        self.shape = tuple(len(values) for values in self.dimensions.values())
+        self._lookup = {}
+        for name, values in self.dimensions.items():
+            order = np.argsort(np.asarray(values), kind='stable')
+            self._lookup[name] = (np.asarray(values)[order], order)
+        self._players = {}
+        self._values = np.zeros((16, ) + self.shape + (len(self.fields), ), dtype=DTYPE)
+
+    def __len__(self):
+        return len(self._players)
+
+    def __contains__(self, player):
+        return player in self._players
+
+    def players(self):
+        """
+        :return: (list) players in row order
+        """
+        return list(self._players)
+
+    def _codes(self, name, values):
+        ordered, order = self._lookup[name]
+        values = np.asarray(values)
+        positions = np.minimum(np.searchsorted(ordered, values), len(ordered) - 1)
+        unknown = ordered[positions] != values
+        if np.any(unknown):
+            raise ValueError('unknown {} value: {}'.format(name, values[unknown][0]))
+        return order[positions]
+
+    def _rows(self, players):
+        rows = np.empty(len(players), dtype=np.int64)
+        for i, player in enumerate(players):
+            row = self._players.get(player)
+            if row is None:
+                row = len(self._players)
+                self._players[player] = row
+            rows[i] = row
+        if len(self._players) > len(self._values):
+            values = np.zeros((max(len(self._players), 2 * len(self._values)), ) + self._values.shape[1:], dtype=DTYPE)
+            values[:len(self._values)] = self._values
+            self._values = values
+        return rows
+
+    def add(self, table, player='player'):
+        """
+        Add rows(events or pre-aggregated lines) into the cells
+        :param table: mapping of columns: player, one column per dimension, counting stats
+        :param player: player column name(default:'player')
+        """
+        players = np.asarray(table[player])
+        if not len(players):
+            return
+        keys, inverse = np.unique(players, return_inverse=True)
+        cells = self._rows(keys.tolist())[inverse.ravel()]
+        for name, size in zip(self.dimensions, self.shape):
+            cells = cells * size + self._codes(name, table[name])
+        order = np.argsort(cells, kind='stable')
+        cells = cells[order]
+        starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+        flat = self._values.reshape(-1, len(self.fields))
+        for i, field in enumerate(self.fields):
+            if field in table:
+                sums = np.add.reduceat(np.asarray(table[field], dtype=np.int64)[order], starts)
+                flat[cells[starts], i] += sums.astype(DTYPE)
+
+    def block(self, player):
+        """
+        Every cell of a player(one indexed read)
+        :param player: player id
+        :return: (ndarray) dimension axes + counting stats(zeros for an unknown player)
+        """
+        row = self._players.get(player)
+        if row is None:
+            return np.zeros(self.shape + (len(self.fields), ), dtype=DTYPE)
+        return self._values[row]
+
+    def _select(self, block, selection, offset=0):
+        # block axes: (offset leading axes, dimensions..., fields)
+        for axis, name in reversed(list(enumerate(self.dimensions))):
+            chosen = selection.get(name)
+            if chosen is None:
+                block = block.sum(axis=offset + axis, dtype=np.int64)
+                continue
+            many = isinstance(chosen, (list, tuple, set, frozenset))
+            codes = self._codes(name, list(chosen) if many else [chosen])
+            block = np.take(block, codes, axis=offset + axis).sum(axis=offset + axis, dtype=np.int64)
+        return block
+
+    def counters(self, player, **selection):
+        """
+        Counting stats of a slice(dimensions left out are rolled up)
+        :param player: player id
+        :param selection: dimension -> value or list of values(e.g. hand='L', month=[4, 5])
+        :return: (dict) counting stat -> total
+        """
+        return dict(zip(self.fields, self._select(self.block(player), selection).tolist()))
+
+    def stats(self, player, metrics, constants=None, **selection):
+        """
+        Metrics of a slice
+        :param player: player id
+        :param metrics: metric names
+        :param constants: constants profile
+        :param selection: dimension -> value or list of values
+        :return: (dict) metric -> value(NaN where a denominator is 0)
+        """
+        totals = self._select(self.block(player), selection)
+        data = {field: totals[i:i + 1] for i, field in enumerate(self.fields)}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = compute(metrics, data, constants)
+        return {metric: value[0].item() for metric, value in values.items()}
+
+    def page(self, player, metrics, constants=None):
+        """
+        Every single-dimension split of a player, computed in one batch
+        :param player: player id
+        :param metrics: metric names
+        :param constants: constants profile
+        :return: (OrderedDict) dimension -> OrderedDict value -> {metric: value}
+        """
+        block = self.block(player).astype(np.int64)
+        rows, labels = [], []
+        for axis, name in enumerate(self.dimensions):
+            others = tuple(a for a in range(len(self.shape)) if a != axis)
+            rows.append(block.sum(axis=others) if others else block)
+            labels.extend((name, value) for value in self.dimensions[name])
+        totals = np.concatenate(rows)
+        data = {field: totals[:, i] for i, field in enumerate(self.fields)}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = compute(metrics, data, constants)
+        page = OrderedDict((name, OrderedDict()) for name in self.dimensions)
+        for i, (name, value) in enumerate(labels):
+            page[name][value] = {metric: values[metric][i].item() for metric in metrics}
+        return page
+
+    def compute(self, metrics, constants=None, **selection):
+        """
+        Metrics of a slice for every player
+        :param metrics: metric names
+        :param constants: constants profile
+        :param selection: dimension -> value or list of values
+        :return: (list, dict) players, metric -> ndarray in players order
+        """
+        totals = self._select(self._values[:len(self._players)], selection, offset=1)
+        data = {field: totals[:, i] for i, field in enumerate(self.fields)}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.players(), compute(metrics, data, constants)
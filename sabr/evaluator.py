@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+
+import numpy as np
+
+from sabr.registry import REGISTRY, DEFAULTS, dependencies
+from sabr.vectorized import py_round, as_float, column
+
+__author__ = 'Shinichi Nakagawa'
+
+SCALAR = {'__builtins__': {}, 'round': round, 'float': float}
+BATCH = {'__builtins__': {}, 'round': py_round, 'float': as_float}
+
+# evaluate(): values(NaN or masked where undefined) and per row error bitmap(bit i: metrics[i] undefined)
+Evaluation = namedtuple('Evaluation', ('values', 'errors'))
+BITMAPS = ((8, np.uint8), (16, np.uint16), (32, np.uint32), (64, np.uint64))
+
+
+def is_batch(data):
+    """
+    Table(columns) or single row
+    :param data: mapping of counting stats
+    :return: (bool) True if any value is an array or sequence
+    """
+    return any(np.ndim(data[k]) > 0 for k in data.keys())
+
+
+class Evaluator(object):
+    """
+    Multi-metric evaluator
+    Resolves the requested metrics against the formula registry and computes every
+    shared intermediate(single, tb, pa, obp denominator...) once per call.
+    """
+
+    def __init__(self, registry=None):
+        """
+        :param registry: formula registry(default:sabr.registry.REGISTRY)
+        """
+        self.registry = REGISTRY if registry is None else registry
+        self._plans = {}
+
+    def plan(self, metrics, available=()):
+        """
+        Evaluation order for metrics
+        :param metrics: metric names
+        :param available: names supplied by the caller
+        :return: (list) Formula list, dependencies first
+        """
+        key = (tuple(metrics), frozenset(available))
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = dependencies(metrics, available, self.registry)
+            self._plans[key] = plan
+        return plan
+
+    def compute(self, metrics, data, constants=None):
+        """
+        Compute metrics for a row or a table
+        :param metrics: metric names(e.g. ['ops', 'rc', 'woba_mlb', 'babip'])
+        :param data: mapping of counting stats named like the Stats parameters,
+                     scalars(one row) or columns(table)
+        :param constants: constant overrides(e.g. {'c': 3.05}), scalar or per row
+        :return: (dict) metric -> value(scalar row) or ndarray(table)
+        """
+        constants = constants or {}
+        batch = is_batch(data) or is_batch(constants)
+        namespace = BATCH if batch else SCALAR
+        keys = tuple(data.keys())
+        values = {k: column(data[k]) if batch else data[k] for k in keys}
+        for formula in self.plan(metrics, keys + tuple(constants.keys())):
+            values[formula.name] = self._eval(formula, namespace, self._scope(formula, values, constants))
+        return {metric: values[metric] for metric in metrics}
+
+    def evaluate(self, metrics, data, constants=None, masked=False):
+        """
+        Batch-safe evaluation: zero or negative denominators never raise
+        Every formula runs once over the whole columns. Rows where a denominator of the formula
+        or of one it depends on(registered Formula.denominators) is not positive get NaN(or a
+        masked entry) and their bit set in the error bitmap, the other rows are untouched.
+        :param metrics: metric names(at most 64)
+        :param data: mapping of counting stats, scalars(one row) or columns(table)
+        :param constants: constant overrides, scalar or per row
+        :param masked: return numpy masked arrays instead of NaN(default:False)
+        :return: (Evaluation) values: metric -> float column(float for a row),
+                 errors: unsigned int column(int for a row), bit i set where metrics[i] is undefined
+        """
+        dtype = next((dtype for bits, dtype in BITMAPS if len(metrics) <= bits), None)
+        if dtype is None:
+            raise ValueError('at most 64 metrics per evaluation, got {}'.format(len(metrics)))
+        constants = constants or {}
+        scalar = not (is_batch(data) or is_batch(constants))
+        keys = tuple(data.keys())
+        values = {k: np.atleast_1d(column(data[k])) for k in keys}
+        invalid = {}
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            for formula in self.plan(metrics, keys + tuple(constants.keys())):
+                scope = self._scope(formula, values, constants)
+                values[formula.name] = self._eval(formula, BATCH, scope)
+                bad = False
+                for check in formula.checks:
+                    bad = bad | ~(np.asarray(eval(check, BATCH, scope)) > 0)
+                for name in formula.inputs:
+                    bad = bad | invalid.get(name, False)
+                invalid[formula.name] = bad
+        shape = np.broadcast_shapes(*[np.shape(v) for v in values.values()]) if values else (1, )
+        result, errors = {}, np.zeros(shape, dtype=dtype)
+        for i, metric in enumerate(metrics):
+            value = np.array(np.broadcast_to(values[metric], shape), dtype=np.float64)
+            bad = np.broadcast_to(invalid.get(metric, False), shape)
+            value[bad] = np.nan
+            errors |= bad.astype(dtype) << dtype(i)
+            if masked:
+                value = np.ma.MaskedArray(value, mask=bad.copy())
+            result[metric] = (value[0] if masked else float(value[0])) if scalar else value
+        if scalar:
+            return Evaluation(result, int(errors[0]))
+        return Evaluation(result, errors)
+
+    def _eval(self, formula, namespace, scope):
+        """
+        Run one formula(sabr.instrument times every formula here)
+        :param formula: Formula
+        :param namespace: SCALAR or BATCH globals
+        :param scope: formula inputs
+        :return: value or column
+        """
+        return eval(formula.code, namespace, scope)
+
+    @staticmethod
+    def _scope(formula, values, constants):
+        scope = {}
+        for name in formula.names:
+            if name in values:
+                scope[name] = values[name]
+            elif name in constants:
+                scope[name] = constants[name]
+            elif name in formula.constants:
+                scope[name] = formula.constants[name]
+            else:
+                scope[name] = DEFAULTS[name]
+        return scope
+
+
+_evaluator = Evaluator()
+
+
+def compute(metrics, data, constants=None):
+    """
+    Compute metrics with the default registry
+    :param metrics: metric names
+    :param data: mapping of counting stats, scalars(one row) or columns(table)
+    :param constants: constant overrides
+    :return: (dict) metric -> value
+    """
+    return _evaluator.compute(metrics, data, constants)
+
+
+def evaluate(metrics, data, constants=None, masked=False):
+    """
+    Batch-safe evaluation with the default registry(NaN and an error bitmap, never ZeroDivisionError)
+    :param metrics: metric names(at most 64)
+    :param data: mapping of counting stats, scalars(one row) or columns(table)
+    :param constants: constant overrides
+    :param masked: return numpy masked arrays instead of NaN(default:False)
+    :return: (Evaluation) values, per row error bitmap(bit i: metrics[i] undefined)
+    """
+    return _evaluator.evaluate(metrics, data, constants, masked)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from sabr.registry import BATTING_STATS, PITCHING_STATS
+
+__author__ = 'Shinichi Nakagawa'
+
+# plate appearance outcomes
+SINGLE = '1B'
+DOUBLE = '2B'
+TRIPLE = '3B'
+HOME_RUN = 'HR'
+WALK = 'BB'
+INTENTIONAL_WALK = 'IBB'
+HIT_BY_PITCH = 'HBP'
+STRIKEOUT = 'K'
+SACRIFICE_FLY = 'SF'
+SACRIFICE_HIT = 'SH'
+OUT = 'OUT'
+DOUBLE_PLAY = 'GIDP'
+ERROR = 'E'
+FIELDERS_CHOICE = 'FC'
+
+# runner events
+STOLEN_BASE = 'SB'
+CAUGHT_STEALING = 'CS'
+
+# any other play(wild pitch, passed ball, balk, defensive indifference, other advance, pickoff,
+# catcher interference): moves the base-out state, no counting stat of its own
+OTHER = 'OTHER'
+
+PLATE_APPEARANCES = (SINGLE, DOUBLE, TRIPLE, HOME_RUN, WALK, INTENTIONAL_WALK, HIT_BY_PITCH, STRIKEOUT,
+                     SACRIFICE_FLY, SACRIFICE_HIT, OUT, DOUBLE_PLAY, ERROR, FIELDERS_CHOICE)
+RUNNER_EVENTS = (STOLEN_BASE, CAUGHT_STEALING)
+OTHER_EVENTS = (OTHER, )
+
+# counting stat increments per event
+BATTING = {
+    SINGLE: {'ab': 1, 'h': 1},
+    DOUBLE: {'ab': 1, 'h': 1, '_2b': 1},
+    TRIPLE: {'ab': 1, 'h': 1, '_3b': 1},
+    HOME_RUN: {'ab': 1, 'h': 1, 'hr': 1},
+    WALK: {'bb': 1},
+    INTENTIONAL_WALK: {'bb': 1, 'ibb': 1},
+    HIT_BY_PITCH: {'hbp': 1},
+    STRIKEOUT: {'ab': 1, 'so': 1},
+    SACRIFICE_FLY: {'sf': 1},
+    SACRIFICE_HIT: {'sh': 1},
+    OUT: {'ab': 1},
+    DOUBLE_PLAY: {'ab': 1, 'gidp': 1},
+    ERROR: {'ab': 1},
+    FIELDERS_CHOICE: {'ab': 1},
+    STOLEN_BASE: {'sb': 1},
+    CAUGHT_STEALING: {'cs': 1},
+    OTHER: {},
+}
+
+PITCHING = {
+    SINGLE: {'bfp': 1, 'h': 1},
+    DOUBLE: {'bfp': 1, 'h': 1},
+    TRIPLE: {'bfp': 1, 'h': 1},
+    HOME_RUN: {'bfp': 1, 'h': 1, 'hr': 1},
+    WALK: {'bfp': 1, 'bb': 1},
+    INTENTIONAL_WALK: {'bfp': 1, 'bb': 1, 'ibb': 1},
+    HIT_BY_PITCH: {'bfp': 1, 'hbp': 1},
+    STRIKEOUT: {'bfp': 1, 'so': 1, 'ip_outs': 1},
+    SACRIFICE_FLY: {'bfp': 1, 'ip_outs': 1},
+    SACRIFICE_HIT: {'bfp': 1, 'ip_outs': 1},
+    OUT: {'bfp': 1, 'ip_outs': 1},
+    DOUBLE_PLAY: {'bfp': 1, 'ip_outs': 2},
+    ERROR: {'bfp': 1},
+    FIELDERS_CHOICE: {'bfp': 1, 'ip_outs': 1},
+    STOLEN_BASE: {},
+    CAUGHT_STEALING: {'ip_outs': 1},
+    OTHER: {},
+}
+
+
+def increments(table, fields):
+    """
+    Event increments as (field index, delta) pairs
+    :param table: event -> {counting stat: delta}
+    :param fields: counting stat order
+    :return: (dict) event -> tuple of (index, delta)
+    """
+    return {
+        event: tuple((fields.index(field), delta) for field, delta in deltas.items())
+        for event, deltas in table.items()
+    }
+
+
+BATTING_INCREMENTS = increments(BATTING, BATTING_STATS)
+PITCHING_INCREMENTS = increments(PITCHING, PITCHING_STATS)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.vectorized import column
+
+__author__ = 'Shinichi Nakagawa'
+
+
+def _date_keys(dates):
+    dates = np.asarray(dates)
+    if dates.dtype.kind == 'M':
+        dates = dates.astype('datetime64[D]').astype(np.int64)
+    return dates.astype(np.int64)
+
+
+class GameLogIndex(object):
+    """
+    Prefix-sum index over game logs
+    Rows are ordered by (player, date) and every counting stat is stored as a running
+    total in one contiguous int64 matrix with a leading zero row. The counting stats of
+    any run of consecutive games are two lookups and a subtraction.
+    """
+
+    def __init__(self, players, dates, table):
+        """
+        :param players: player id per game
+        :param dates: game date per game(int such as 20130815, or datetime64)
+        :param table: mapping of counting stat columns, one row per player-game
+        """
+        players = np.asarray(players)
+        dates = np.asarray(dates)
+        order = np.lexsort((dates, players))
+        self.fields = tuple(table.keys())
+        self.players, starts = np.unique(players[order], return_index=True)
+        self.starts = np.append(starts, len(order)).astype(np.int64)
+        self.dates = dates[order]
+        self._player_index = np.repeat(np.arange(len(self.players)), np.diff(self.starts))
+        self._keys = _date_keys(self.dates)
+        self._base = self._keys.min() if len(self._keys) else 0
+        self._composite = (self._player_index.astype(np.int64) << 32) | (self._keys - self._base)
+        self.prefix = np.zeros((len(order) + 1, len(self.fields)), dtype=np.int64)
+        for i, field in enumerate(self.fields):
+            np.cumsum(column(table[field])[order], out=self.prefix[1:, i])
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _segment(self, player):
+        p = np.searchsorted(self.players, player)
+        if p >= len(self.players) or self.players[p] != player:
+            raise KeyError(player)
+        return p, self.starts[p], self.starts[p + 1]
+
+    def _bound(self, player_index, date, side):
+        player_index = np.asarray(player_index, dtype=np.int64)
+        # dates outside the log land one step past its ends(-1, 2 ** 32), so the key never reaches
+        # into the bits of another player, and the position is kept within the player's games
+        offset = np.clip(_date_keys(date) - self._base, -1, 1 << 32)
+        position = np.searchsorted(self._composite, (player_index << 32) + offset, side=side)
+        return np.clip(position, self.starts[player_index], self.starts[player_index + 1])
+
+    def _counts(self, lo, hi):
+        totals = self.prefix[hi] - self.prefix[lo]
+        return {field: totals[..., i] for i, field in enumerate(self.fields)}
+
+    def counts(self, player, start=None, end=None):
+        """
+        Counting stats of a player between two dates(inclusive)
+        :param player: player id
+        :param start: first date(default:None, first game)
+        :param end: last date(default:None, last game)
+        :return: (dict) counting stat -> total
+        """
+        p, lo, hi = self._segment(player)
+        if start is not None:
+            lo = max(lo, self._bound(p, start, 'left'))
+        if end is not None:
+            hi = min(hi, self._bound(p, end, 'right'))
+        return {k: int(v) for k, v in self._counts(lo, max(lo, hi)).items()}
+
+    def last(self, player, n):
+        """
+        Counting stats of a player's last n games
+        :param player: player id
+        :param n: number of games
+        :return: (dict) counting stat -> total
+        """
+        _, lo, hi = self._segment(player)
+        return {k: int(v) for k, v in self._counts(max(lo, hi - n), hi).items()}
+
+    def stats(self, player, metrics, start=None, end=None, constants=None):
+        """
+        Metrics of a player between two dates(inclusive)
+        :param player: player id
+        :param metrics: metric names(e.g. ['ops'], ['era', 'fip'])
+        :param start: first date(default:None)
+        :param end: last date(default:None)
+        :param constants: constant overrides
+        :return: (dict) metric -> value
+        """
+        return compute(metrics, self.counts(player, start, end), constants)
+
+    def window(self, metrics, start=None, end=None, constants=None):
+        """
+        Metrics of every player between two dates(inclusive), in one vectorized pass
+        Players without a game in the window get 0 counts(so nan / inf rates).
+        :param metrics: metric names
+        :param start: first date(default:None)
+        :param end: last date(default:None)
+        :param constants: constant overrides
+        :return: (ndarray, dict) players, metric -> ndarray
+        """
+        index = np.arange(len(self.players))
+        lo = self.starts[:-1] if start is None else self._bound(index, start, 'left')
+        hi = self.starts[1:] if end is None else self._bound(index, end, 'right')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.players, compute(metrics, self._counts(lo, np.maximum(lo, hi)), constants)
+
+    def rolling(self, n, metrics, min_games=None, constants=None):
+        """
+        n-game rolling metrics for every player-game, in one vectorized sweep
+        :param n: window size in games
+        :param metrics: metric names
+        :param min_games: windows with fewer games are nan(default:None, n)
+        :param constants: constant overrides
+        :return: (ndarray, ndarray, dict) players, dates, metric -> ndarray(one value per game)
+        """
+        min_games = n if min_games is None else min_games
+        hi = np.arange(1, len(self.dates) + 1)
+        lo = np.maximum(hi - n, self.starts[self._player_index])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = compute(metrics, self._counts(lo, hi), constants)
+        short = (hi - lo) < min_games
+        if short.any():
+            for metric, value in values.items():
+                value = value.astype(np.float64)
+                value[short] = np.nan
+                values[metric] = value
+        return self.players[self._player_index], self.dates, values
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.league import BATTING, FIELDS, PITCHING, LeagueContext, group
+from sabr.registry import WOBA_MLB, WOBA_MLB_SCALE, dependencies
+from sabr.vectorized import column
+
+__author__ = 'Shinichi Nakagawa'
+
+# formula input -> League field it is taken from
+LEAGUE_INPUTS = OrderedDict((
+    ('lg_woba', 'lg_woba'),
+    ('woba_scale', 'woba_scale'),
+    ('c', 'c'),
+    ('league_ra', 'ra9'),
+))
+
+# players: key -> {metric: (before, after)}, leagues: (league, season) -> {League field: (before, after)}
+Changeset = namedtuple('Changeset', ('players', 'leagues'))
+
+
+def _names(metric):
+    names = set()
+    for formula in dependencies([metric], strict=False):
+        names.update(formula.names)
+    return names
+
+
+def _changed(before, after):
+    return not (before == after or (before != before and after != after))
+
+
+class IncrementalTable(object):
+    """
+    Dirty-tracking player-season table
+    Corrections add a counting stat delta to one player-season. Only the corrected rows
+    are recomputed, league totals are adjusted by the same delta, and rows whose metrics
+    read a league value(lg_woba, woba_scale, FIP constant, league RA) are recomputed only
+    when that league-season value actually moved.
+    """
+
+    def __init__(self, keys, leagues, seasons, table, metrics, side=BATTING, constants=None, weights=WOBA_MLB,
+                 scale=WOBA_MLB_SCALE):
+        """
+        :param keys: player-season key per row(e.g. (player, season, stint))
+        :param leagues: league column
+        :param seasons: season column
+        :param table: mapping of counting stat columns
+        :param metrics: metric names kept up to date
+        :param side: 'batting' or 'pitching'(default:'batting')
+        :param constants: constant overrides
+        :param weights: wOBA weights(default:sabr.registry.WOBA_MLB)
+        :param scale: wOBA scale the weights come with(default:sabr.registry.WOBA_MLB_SCALE)
+        """
+        self.side = side
+        self.metrics = list(metrics)
+        self.constants = dict(weights)
+        self.constants.update(constants or {})
+        self.keys = list(keys)
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        self.data = OrderedDict((k, column(v).astype(np.int64)) for k, v in table.items())
+        self.leagues, self.seasons = np.asarray(leagues), np.asarray(seasons)
+        groups, index = group(self.leagues, self.seasons)
+        self._groups = {key: np.flatnonzero(index == g) for g, key in enumerate(groups)}
+        self._league = [self.leagues[row].item() for row in range(len(self.keys))]
+        self._season = [self.seasons[row].item() for row in range(len(self.keys))]
+        self.context = LeagueContext(weights, scale)
+        self.context.update_grouped(self.leagues, self.seasons, self.data, side)
+        self._dependent = [m for m in self.metrics if _names(m) & set(LEAGUE_INPUTS)]
+        rows = np.arange(len(self.keys))
+        self.values = self._compute(self.metrics, rows)
+
+    def _compute(self, metrics, rows):
+        data = {k: v[rows] for k, v in self.data.items()}
+        needed = set()
+        for metric in metrics:
+            needed |= _names(metric)
+        for name, field in LEAGUE_INPUTS.items():
+            if name in needed:
+                data[name] = self.context.column(field, self.leagues[rows], self.seasons[rows])
+        if 'ra' in needed and 'ra' not in data and self.side == PITCHING:
+            data['ra'] = 27.0 * data['r'] / data['ip_outs']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return compute(metrics, data, self.constants)
+
+    def stat(self, key, metric):
+        """
+        Current value
+        :param key: player-season key
+        :param metric: kept metric
+        :return: value(NaN/inf where a denominator is 0)
+        """
+        return self.values[metric][self._rows[key]]
+
+    def counters(self, key):
+        """
+        :param key: player-season key
+        :return: (dict) counting stat -> value
+        """
+        row = self._rows[key]
+        return OrderedDict((k, v[row].item()) for k, v in self.data.items())
+
+    def league(self, league, season):
+        """
+        :param league: league
+        :param season: season
+        :return: (League) current league context
+        """
+        return self.context.get(league, season)
+
+    def correct(self, key, delta):
+        """
+        Apply one correction
+        :param key: player-season key
+        :param delta: counting stat -> change(e.g. {'h': 1, 'ab': 0} for an error scored a hit)
+        :return: (Changeset) changed metrics and league values
+        """
+        return self.apply([(key, delta)])
+
+    def apply(self, corrections):
+        """
+        Apply a batch of corrections
+        :param corrections: iterable of (key, delta)
+        :return: (Changeset) changed metrics and league values
+        """
+        dirty, totals = set(), OrderedDict()
+        for key, delta in corrections:
+            row = self._rows[key]
+            for name, change in delta.items():
+                if name not in self.data:
+                    raise KeyError('unknown counting stat: {}'.format(name))
+                self.data[name][row] += change
+            dirty.add(row)
+            group_key = (self._league[row], self._season[row])
+            total = totals.setdefault(group_key, {})
+            for name, change in delta.items():
+                if name in FIELDS[self.side]:
+                    total[name] = total.get(name, 0) + change
+        leagues = OrderedDict()
+        for (league, season), total in totals.items():
+            if not any(total.values()):
+                continue
+            before = self.context.get(league, season)
+            self.context.update(league, season, total, self.side)
+            after = self.context.get(league, season)
+            fields = OrderedDict(
+                (field, (getattr(before, field), getattr(after, field))) for field in after._fields[2:]
+                if _changed(getattr(before, field), getattr(after, field))
+            )
+            if fields:
+                leagues[(league, season)] = fields
+        players = OrderedDict()
+        self._refresh([m for m in self.metrics if m not in self._dependent], sorted(dirty), players)
+        moved = {key for key, fields in leagues.items() if any(LEAGUE_INPUTS[n] in fields for n in LEAGUE_INPUTS)}
+        rows = set(dirty)
+        for key in moved:
+            rows.update(self._groups[key].tolist())
+        self._refresh(self._dependent, sorted(rows), players)
+        return Changeset(players, leagues)
+
+    def _refresh(self, metrics, rows, players):
+        if not metrics or not rows:
+            return
+        rows = np.array(rows, dtype=np.int64)
+        values = self._compute(metrics, rows)
+        for metric in metrics:
+            current = self.values[metric]
+            before = current[rows].tolist()
+            current[rows] = values[metric]
+            for row, old, new in zip(rows.tolist(), before, current[rows].tolist()):
+                if _changed(old, new):
+                    players.setdefault(self.keys[row], OrderedDict())[metric] = (old, new)
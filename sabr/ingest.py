@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import csv
+import inspect
+import io
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.vectorized import Stats
+
+__author__ = 'Shinichi Nakagawa'
+
+DEFAULT_CHUNK_SIZE = 65536
+
+# Lahman database column -> Stats parameter name
+LAHMAN_BATTING = {
+    'playerID': 'player',
+    'yearID': 'season',
+    'stint': 'stint',
+    'teamID': 'team',
+    'lgID': 'league',
+    'G': 'g',
+    'AB': 'ab',
+    'R': 'r',
+    'H': 'h',
+    '2B': '_2b',
+    '3B': '_3b',
+    'HR': 'hr',
+    'RBI': 'rbi',
+    'SB': 'sb',
+    'CS': 'cs',
+    'BB': 'bb',
+    'SO': 'so',
+    'IBB': 'ibb',
+    'HBP': 'hbp',
+    'SH': 'sh',
+    'SF': 'sf',
+    'GIDP': 'gidp',
+}
+
+LAHMAN_PITCHING = {
+    'playerID': 'player',
+    'yearID': 'season',
+    'stint': 'stint',
+    'teamID': 'team',
+    'lgID': 'league',
+    'W': 'w',
+    'L': 'l',
+    'G': 'g',
+    'GS': 'gs',
+    'SV': 'sv',
+    'IPouts': 'ip_outs',
+    'H': 'h',
+    'ER': 'er',
+    'HR': 'hr',
+    'BB': 'bb',
+    'SO': 'so',
+    'IBB': 'ibb',
+    'HBP': 'hbp',
+    'BFP': 'bfp',
+    'R': 'r',
+    'SH': 'sh',
+    'SF': 'sf',
+    'GIDP': 'gidp',
+}
+
+# columns kept as strings
+STRINGS = ('player', 'team', 'league')
+# value of a blank counting stat(Lahman leaves stats not recorded in a season blank, e.g. IBB before 1955)
+BLANK = 0
+
+
+def _open(source, mode):
+    if hasattr(source, 'read') or hasattr(source, 'write'):
+        return source, False
+    return io.open(source, mode, encoding='utf-8', newline=''), True
+
+
+def _infer(names, rows, strings):
+    """
+    Column types of an unmapped file from its first chunk
+    :return: (dict) name -> np.int64, np.float64 or None(string)
+    """
+    dtypes = {}
+    for name, values in zip(names, zip(*rows)):
+        dtypes[name] = None
+        if name in strings:
+            continue
+        for dtype in (np.int64, np.float64):
+            try:
+                np.array([v.strip() or '0' for v in values]).astype(dtype)
+            except ValueError:
+                continue
+            dtypes[name] = dtype
+            break
+    return dtypes
+
+
+def _parse(values, dtype, blank, column, lines):
+    """
+    Parse a column chunk
+    :param values: field strings
+    :param dtype: np.int64 or np.float64
+    :param blank: value of a blank field(None: blank is an error)
+    :param column: CSV column name(error messages)
+    :param lines: CSV line number per value(error messages)
+    :return: (ndarray) column
+    """
+    if blank is not None:
+        values = [v if v.strip() else str(blank) for v in values]
+    try:
+        return np.array(values).astype(dtype)
+    except ValueError:
+        kind = 'an integer' if dtype is np.int64 else 'a number'
+        for value, line in zip(values, lines):
+            try:
+                np.array([value]).astype(dtype)
+            except ValueError:
+                raise ValueError('line {}, column {}: {!r} is not {}'.format(line, column, value, kind))
+        raise
+
+
+def _columns(names, sources, dtypes, rows, lines, blank):
+    columns = {}
+    for name, source, values in zip(names, sources, zip(*rows)):
+        dtype = dtypes[name]
+        columns[name] = np.array(values) if dtype is None else _parse(values, dtype, blank, source, lines)
+    return columns
+
+
+def read_csv(source, mapping=None, chunk_size=DEFAULT_CHUNK_SIZE, strings=STRINGS, blank=BLANK):
+    """
+    Stream a CSV file as column chunks
+    Only chunk_size rows are held at a time, so files larger than memory stream in constant memory.
+    With a mapping, every mapped column outside strings is a counting stat and is parsed as int64;
+    a field that is not an integer(NA, 1.5, a typo) raises ValueError with its line and column.
+    Without one, the type of each column(int64, float64 or string) is taken from the first chunk
+    and held for the rest of the file.
+    :param source: path or text file object
+    :param mapping: CSV column -> Stats parameter name, unmapped columns are skipped
+                    (default:None, keep every column under its own name)
+    :param chunk_size: rows per chunk(default:65536)
+    :param strings: columns(after mapping) kept as strings
+    :param blank: value of a blank numeric field(default:0, None: blank fields raise ValueError)
+    :return: (generator) dict of ndarray columns per chunk
+    """
+    f, close = _open(source, 'r')
+    try:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        if mapping is None:
+            positions, names = list(range(len(header))), header
+            dtypes = None
+        else:
+            positions = [i for i, column in enumerate(header) if column in mapping]
+            names = [mapping[header[i]] for i in positions]
+            dtypes = {name: None if name in strings else np.int64 for name in names}
+        sources = [header[i] for i in positions]
+        rows, lines = [], []
+        for row in reader:
+            if not row:
+                continue
+            rows.append([row[i] if i < len(row) else '' for i in positions])
+            lines.append(reader.line_num)
+            if len(rows) == chunk_size:
+                dtypes = dtypes or _infer(names, rows, strings)
+                yield _columns(names, sources, dtypes, rows, lines, blank)
+                rows, lines = [], []
+        if rows:
+            dtypes = dtypes or _infer(names, rows, strings)
+            yield _columns(names, sources, dtypes, rows, lines, blank)
+    finally:
+        if close:
+            f.close()
+
+
+def arguments(method, chunk):
+    """
+    Keyword arguments of a Stats method taken from a chunk
+    :param method: Stats method name(e.g. 'avg', 'babip')
+    :param chunk: dict of columns
+    :return: (dict) parameter -> column for every parameter present in the chunk
+    """
+    parameters = inspect.signature(getattr(Stats, method)).parameters
+    return {name: chunk[name] for name in parameters if name in chunk}
+
+
+def evaluate(chunks, metrics, constants=None, keep=STRINGS):
+    """
+    Derive metrics chunk by chunk
+    :param chunks: iterable of column chunks(e.g. read_csv())
+    :param metrics: metric names
+    :param constants: constant overrides
+    :param keep: input columns passed through(default: id columns)
+    :return: (generator) dict of kept columns and metrics per chunk
+    """
+    for chunk in chunks:
+        data = {k: v for k, v in chunk.items() if v.dtype.kind in 'iuf'}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = compute(metrics, data, constants)
+        result = {k: chunk[k] for k in keep if k in chunk}
+        result.update(values)
+        yield result
+
+
+class CsvWriter(object):
+    """
+    Incremental CSV writer for column chunks
+    """
+
+    def __init__(self, target, columns):
+        """
+        :param target: path or text file object
+        :param columns: column order
+        """
+        self.columns = list(columns)
+        self._file, self._close = _open(target, 'w')
+        self._writer = csv.writer(self._file, lineterminator='\n')
+        self._writer.writerow(self.columns)
+
+    def write(self, chunk):
+        """
+        Append a chunk
+        :param chunk: dict of columns
+        """
+        self._writer.writerows(zip(*[np.asarray(chunk[name]).tolist() for name in self.columns]))
+
+    def close(self):
+        if self._close:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Opt-in hot-path instrumentation
+
+    >>> from sabr import instrument
+    >>> instrument.enable()
+    >>> ... run the job ...
+    >>> instrument.disable()
+    >>> print(instrument.prometheus())
+
+enable() swaps the engine entry points for timed wrappers and disable() puts the original
+functions back, so code that runs with instrumentation off is the untouched code. Memory is
+measured with tracemalloc(numpy reports its data buffers to it), started by enable() when it
+is not tracing already.
+"""
+
+import functools
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import numpy as np
+
+from sabr import compiler, evaluator, lines, parallel, stats, streaming, vectorized
+
+__author__ = 'Shinichi Nakagawa'
+
+DEFAULT_SAMPLE_EVERY = 100
+FIELDS = ('calls', 'rows', 'seconds', 'allocated_bytes', 'retained_bytes', 'peak_bytes')
+
+# (engine, metric) -> [calls, rows, seconds, allocated_bytes, retained_bytes, peak_bytes]
+_COUNTERS = {}
+# (owner, attribute, original) of every installed wrapper
+_PATCHES = []
+_SAMPLER = {'hook': None, 'every': DEFAULT_SAMPLE_EVERY, 'count': 0}
+# True when enable() started tracemalloc, disable() stops it then
+_TRACING = {'started': False}
+# [traced bytes at the start, highest traced bytes seen] per wrapped call in progress, per thread
+_CALLS = threading.local()
+# Python 3.8 has no tracemalloc.reset_peak: the peak of a call is then the bytes held at its end
+_RESET_PEAK = getattr(tracemalloc, 'reset_peak', None)
+
+
+def _size(values):
+    return max([int(np.size(v)) for v in values] or [1])
+
+
+def _record(engine, metric, seconds, rows, allocated, retained):
+    counter = _COUNTERS.get((engine, metric))
+    if counter is None:
+        counter = _COUNTERS[(engine, metric)] = [0, 0, 0.0, 0, 0, 0]
+    counter[0] += 1
+    counter[1] += rows
+    counter[2] += seconds
+    counter[3] += allocated
+    counter[4] += retained
+    counter[5] = max(counter[5], allocated)
+    hook = _SAMPLER['hook']
+    if hook is not None:
+        _SAMPLER['count'] += 1
+        if _SAMPLER['count'] >= _SAMPLER['every']:
+            _SAMPLER['count'] = 0
+            hook(engine, metric, seconds, rows)
+
+
+def _timed(function, engine, metric, rows):
+    """
+    Wrapper recording one call of function
+    :param function: wrapped function
+    :param engine: engine label
+    :param metric: metric(args, kwargs) -> metric label
+    :param rows: rows(args, kwargs) -> rows processed
+    :return: wrapper
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        calls = getattr(_CALLS, 'stack', None)
+        if calls is None:
+            calls = _CALLS.stack = []
+        current, peak = tracemalloc.get_traced_memory()
+        if calls:
+            # the peak is about to be reset: keep the one of the enclosing call
+            calls[-1][1] = max(calls[-1][1], peak)
+        frame = [current, current]
+        calls.append(frame)
+        if _RESET_PEAK is not None:
+            _RESET_PEAK()
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            calls.pop()
+            peak = max(peak if _RESET_PEAK is not None else current, frame[1])
+            if calls:
+                calls[-1][1] = max(calls[-1][1], peak)
+            _record(engine, metric(args, kwargs), seconds, rows(args, kwargs), max(peak - frame[0], 0),
+                    current - frame[0])
+    return wrapper
+
+
+def _name(args, kwargs):
+    return ','.join(args[1])
+
+
+def _data_rows(args, kwargs):
+    return _size(args[2].values())
+
+
+def _stat_name(args, kwargs):
+    return args[2] if len(args) > 2 else kwargs['metric']
+
+
+def _line_name(args, kwargs):
+    return args[1] if len(args) > 1 else kwargs['metric']
+
+
+def _one(args, kwargs):
+    return 1
+
+
+def _args_rows(args, kwargs):
+    return _size(args[1:] + tuple(kwargs.values()))
+
+
+def _targets():
+    """
+    Instrumented entry points
+    :return: (list) (owner, attribute, engine, metric label, rows, wrapped as classmethod)
+    """
+    targets = []
+    for engine, owner in (('scalar', stats.Stats), ('batch', vectorized.Stats)):
+        for name, value in owner.__dict__.items():
+            if isinstance(value, classmethod) and not name.startswith('_'):
+                targets.append((owner, name, engine, (lambda args, kwargs, name=name: name),
+                                _one if engine == 'scalar' else _args_rows, True))
+    targets.extend([
+        (evaluator.Evaluator, '_eval', 'evaluator', lambda args, kwargs: args[1].name,
+         lambda args, kwargs: _size(args[3].values()), False),
+        (evaluator.Evaluator, 'evaluate', 'evaluate', _name, _data_rows, False),
+        (compiler.Kernel, '__call__', 'compiler', lambda args, kwargs: ','.join(args[0].metrics),
+         lambda args, kwargs: _size(args[1].values()), False),
+        (streaming.Accumulator, 'plate_appearance', 'streaming', lambda args, kwargs: 'plate_appearance', _one,
+         False),
+        (streaming.Accumulator, 'stat', 'streaming', _stat_name, _one, False),
+        (lines._Line, 'stat', 'lines', _line_name, _one, False),
+        (parallel, 'recompute', 'parallel', lambda args, kwargs: ','.join(args[0]),
+         lambda args, kwargs: _size([next(iter(args[1].values()))]), False),
+    ])
+    return targets
+
+
+def enabled():
+    """
+    :return: (bool) True while the wrappers are installed
+    """
+    return bool(_PATCHES)
+
+
+def enable(hook=None, sample_every=DEFAULT_SAMPLE_EVERY):
+    """
+    Install the timed wrappers
+    Covers the Stats classmethods(scalar and batch), every formula run by Evaluator.compute
+    and evaluate, Evaluator.evaluate as a whole, compiled kernels, the streaming accumulator, line stats and parallel
+    recompute. Engines nest(compute inside recompute, kernels inside the accumulator), so
+    times and memory are inclusive. Functions imported by name before enable() are not covered:
+    call them through their module(sabr.parallel.recompute) to be counted. tracemalloc is
+    process wide, so calls running at the same time on other threads add to each other's bytes.
+    :param hook: sampling profiler hook(engine, metric, seconds, rows)(default:None)
+    :param sample_every: the hook gets one call out of every sample_every(default:100)
+    """
+    if sample_every < 1:
+        raise ValueError('sample_every must be positive, got {}'.format(sample_every))
+    _SAMPLER.update(hook=hook, every=sample_every, count=0)
+    if _PATCHES:
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _TRACING['started'] = True
+    for owner, name, engine, metric, rows, method in _targets():
+        original = owner.__dict__[name]
+        _PATCHES.append((owner, name, original))
+        if method:
+            setattr(owner, name, classmethod(_timed(original.__func__, engine, metric, rows)))
+        else:
+            setattr(owner, name, _timed(original, engine, metric, rows))
+
+
+def disable():
+    """
+    Restore the original functions and stop tracemalloc if enable() started it(the counters are kept)
+    """
+    while _PATCHES:
+        owner, name, original = _PATCHES.pop()
+        setattr(owner, name, original)
+    if _TRACING['started']:
+        tracemalloc.stop()
+        _TRACING['started'] = False
+    _SAMPLER.update(hook=None, count=0)
+
+
+class instrumented(object):
+    """
+    Context manager: instrumentation on inside the block
+    """
+
+    def __init__(self, hook=None, sample_every=DEFAULT_SAMPLE_EVERY):
+        """
+        :param hook: sampling profiler hook(engine, metric, seconds, rows)(default:None)
+        :param sample_every: the hook gets one call out of every sample_every(default:100)
+        """
+        self.hook = hook
+        self.sample_every = sample_every
+
+    def __enter__(self):
+        enable(self.hook, self.sample_every)
+        return self
+
+    def __exit__(self, *exc):
+        disable()
+        return False
+
+
+def reset():
+    """
+    Clear the counters
+    """
+    _COUNTERS.clear()
+
+
+def snapshot():
+    """
+    Counters as a dict
+    :return: (OrderedDict) (engine, metric) -> {'calls', 'rows', 'seconds', 'allocated_bytes', 'retained_bytes',
+             'peak_bytes'}, slowest first(allocated_bytes: traced peak above the bytes held at the start, summed
+             over the calls, retained_bytes: bytes still held after the calls, peak_bytes: largest allocated_bytes
+             of one call)
+    """
+    items = sorted(_COUNTERS.items(), key=lambda item: (-item[1][2], item[0]))
+    return OrderedDict((key, OrderedDict(zip(FIELDS, values))) for key, values in items)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus(prefix='sabr_metric'):
+    """
+    Counters in the Prometheus text exposition format
+    :param prefix: metric name prefix(default:'sabr_metric')
+    :return: (str) text
+    """
+    help_texts = (
+        ('calls', 'counter', 'Metric evaluation calls'),
+        ('rows', 'counter', 'Rows processed'),
+        ('seconds', 'counter', 'Cumulative wall time in seconds'),
+        ('allocated_bytes', 'counter', 'Traced memory peak of the calls above their starting memory, in bytes'),
+        ('retained_bytes', 'gauge', 'Traced memory still held after the calls, in bytes'),
+        ('peak_bytes', 'gauge', 'Largest traced memory peak of one call above its starting memory, in bytes'),
+    )
+    counters = snapshot()
+    out = []
+    for field, kind, text in help_texts:
+        name = '{}_{}_total'.format(prefix, field) if kind == 'counter' else '{}_{}'.format(prefix, field)
+        out.append('# HELP {} {}'.format(name, text))
+        out.append('# TYPE {} {}'.format(name, kind))
+        for (engine, metric), values in counters.items():
+            value = repr(float(values[field])) if field == 'seconds' else values[field]
+            out.append('{}{{engine="{}",metric="{}"}} {}'.format(name, _escape(engine), _escape(metric), value))
+    return '\n'.join(out) + '\n'
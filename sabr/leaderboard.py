@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left, insort
+from itertools import chain, islice
+
+import numpy as np
+
+from sabr.compiler import compile_metrics
+from sabr.evaluator import compute
+from sabr.league import BATTING, PITCHING
+from sabr.registry import BATTING_STATS, PITCHING_STATS
+from sabr.vectorized import column
+
+__author__ = 'Shinichi Nakagawa'
+
+# qualification: plate appearances / innings pitched per team game
+PA_PER_GAME = 3.1
+IP_PER_GAME = 1.0
+
+# metrics where lower is better
+ASCENDING = frozenset(('era', 'fip', 'whip', 'h9', 'bb9', 'hr9'))
+PITCHING_METRICS = frozenset(('ip', 'era', 'fip', 'whip', 'h9', 'so9', 'bb9', 'hr9', 'adam_dunn_pitcher'))
+# entries per block of the board(a block is split when it grows past twice this)
+LOAD = 64
+
+
+def side_of(metric):
+    """
+    :param metric: metric name
+    :return: (str) 'batting' or 'pitching'
+    """
+    return PITCHING if metric in PITCHING_METRICS else BATTING
+
+
+def qualified(table, games, side=BATTING):
+    """
+    Qualification mask(3.1 PA or 1 IP per team game)
+    :param table: mapping of counting stats, scalars or columns
+    :param games: team games, scalar or per row
+    :param side: 'batting' or 'pitching'(default:'batting')
+    :return: (ndarray or bool) True if qualified
+    """
+    if side == PITCHING:
+        return column(table['ip_outs']) >= 3 * IP_PER_GAME * np.asarray(games)
+    pa = sum(column(table[k]) for k in ('ab', 'bb', 'hbp', 'sf', 'sh') if k in table)
+    return pa >= PA_PER_GAME * np.asarray(games)
+
+
+def _score(metric, value):
+    return value if metric in ASCENDING else -value
+
+
+def top(metric, values, players, k, mask=None):
+    """
+    Top-k by partial selection
+    Ties(values are rounded like the Stats methods) are broken by player id.
+    :param metric: metric name(decides the order)
+    :param values: metric column
+    :param players: player id column
+    :param k: board size
+    :param mask: qualification mask(default:None, every row)
+    :return: (list) (player, value) best first
+    """
+    values, players = np.asarray(values, dtype=np.float64), np.asarray(players)
+    keep = ~np.isnan(values)
+    if mask is not None:
+        keep &= np.asarray(mask, dtype=bool)
+    rows = np.flatnonzero(keep)
+    if not len(rows) or k <= 0:
+        return []
+    scores = _score(metric, values[rows])
+    if k < len(rows):
+        # every row tied with the k-th score stays a candidate for the player id tie break
+        kth = np.partition(scores, k - 1)[k - 1]
+        candidates = scores <= kth
+        rows, scores = rows[candidates], scores[candidates]
+    order = np.lexsort((players[rows], scores))[:k]
+    return [(players[row].item(), values[row].item()) for row in rows[order]]
+
+
+class _Blocks(object):
+    """
+    Sorted list held in blocks of at most 2 * LOAD entries
+    An insert or delete finds its block by binary search over the block maxima and shifts
+    entries of that block only. A Fenwick tree over the block lengths counts the entries
+    ahead of a block in O(log n); it is rebuilt when a block is split or emptied.
+    """
+
+    def __init__(self, items=()):
+        """
+        :param items: sorted entries
+        """
+        items = list(items)
+        self._blocks = [items[i:i + LOAD] for i in range(0, len(items), LOAD)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._size = len(items)
+        self._index()
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return chain.from_iterable(self._blocks)
+
+    def _index(self):
+        tree = [0] * (len(self._blocks) + 1)
+        for i, block in enumerate(self._blocks, 1):
+            tree[i] += len(block)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _grow(self, block, delta):
+        i = block + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _before(self, block):
+        total, i = 0, block
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def add(self, item):
+        self._size += 1
+        if not self._blocks:
+            self._blocks, self._maxes = [[item]], [item]
+            self._index()
+            return
+        b = min(bisect_left(self._maxes, item), len(self._blocks) - 1)
+        block = self._blocks[b]
+        insort(block, item)
+        self._maxes[b] = block[-1]
+        if len(block) > 2 * LOAD:
+            self._blocks[b:b + 1] = [block[:LOAD], block[LOAD:]]
+            self._maxes[b:b + 1] = [block[LOAD - 1], block[-1]]
+            self._index()
+        else:
+            self._grow(b, 1)
+
+    def remove(self, item):
+        b = bisect_left(self._maxes, item)
+        block = self._blocks[b]
+        del block[bisect_left(block, item)]
+        self._size -= 1
+        if block:
+            self._maxes[b] = block[-1]
+            self._grow(b, -1)
+        else:
+            del self._blocks[b]
+            del self._maxes[b]
+            self._index()
+
+    def index(self, item):
+        """
+        :param item: entry(present or not)
+        :return: (int) entries less than item
+        """
+        b = bisect_left(self._maxes, item)
+        if b == len(self._blocks):
+            return self._size
+        return self._before(b) + bisect_left(self._blocks[b], item)
+
+    def head(self, k):
+        """
+        :param k: entries
+        :return: (list) k smallest entries
+        """
+        return list(islice(self, max(k, 0)))
+
+
+class Leaderboard(object):
+    """
+    Incremental leaderboard
+    Qualified players are kept as sorted (score, player) entries in blocks of at most
+    2 * LOAD. A line change removes and inserts one entry: binary searches plus a shift
+    within one block, instead of re-sorting the league or shifting the whole board.
+    Ranks are read through a Fenwick tree of the block lengths.
+    """
+
+    def __init__(self, metric, games, constants=None):
+        """
+        :param metric: metric name(e.g. 'ops', 'era')
+        :param games: team games for qualification
+        :param constants: constants profile(e.g. {'c': 3.10})
+        """
+        self.metric = metric
+        self.side = side_of(metric)
+        self.games = games
+        self.constants = dict(constants or {})
+        self._fields = PITCHING_STATS if self.side == PITCHING else BATTING_STATS
+        self._kernel = compile_metrics([metric], self.constants)
+        self._lines = {}
+        self._entries = {}
+        self._board = _Blocks()
+
+    @classmethod
+    def from_table(cls, metric, players, table, games, constants=None):
+        """
+        Build from a table in one vectorized pass
+        :param metric: metric name
+        :param players: player id column
+        :param table: mapping of counting stat columns
+        :param games: team games for qualification
+        :param constants: constants profile
+        :return: (Leaderboard) board
+        """
+        board = cls(metric, games, constants)
+        players = np.asarray(players)
+        names = [k for k in board._fields if k in table]
+        columns = [column(table[k]).tolist() for k in names]
+        for player, line in zip(players.tolist(), zip(*columns)):
+            board._lines[player] = dict(zip(names, line))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.asarray(compute([metric], table, board.constants)[metric], dtype=np.float64)
+        mask = qualified(table, games, board.side) & ~np.isnan(values)
+        rows = np.flatnonzero(mask)
+        scores = _score(metric, values[rows])
+        order = np.lexsort((players[rows], scores))
+        board._board = _Blocks((scores[i].item(), players[rows[i]].item()) for i in order)
+        board._entries = {entry[1]: entry for entry in board._board}
+        return board
+
+    def __len__(self):
+        return len(self._board)
+
+    def _value(self, line):
+        try:
+            return self._kernel(line)[self.metric]
+        except ZeroDivisionError:
+            return None
+
+    def update(self, player, line):
+        """
+        Replace a player's line
+        :param player: player id
+        :param line: mapping of counting stats, missing ones are 0
+        """
+        line = {k: line.get(k, 0) for k in self._fields}
+        self._lines[player] = line
+        self._place(player, line)
+
+    def add(self, player, delta):
+        """
+        Add a delta to a player's line
+        :param player: player id
+        :param delta: counting stat -> change
+        """
+        line = dict(self._lines.get(player) or dict.fromkeys(self._fields, 0))
+        for name, change in delta.items():
+            line[name] = line.get(name, 0) + change
+        self.update(player, line)
+
+    def _place(self, player, line):
+        entry = self._entries.pop(player, None)
+        if entry is not None:
+            self._board.remove(entry)
+        value = self._value(line) if qualified(line, self.games, self.side) else None
+        if value is not None and value == value:
+            entry = (_score(self.metric, value), player)
+            self._board.add(entry)
+            self._entries[player] = entry
+
+    def set_games(self, games):
+        """
+        New team games(qualification is re-checked for every player)
+        :param games: team games
+        """
+        self.games = games
+        for player, line in self._lines.items():
+            self._place(player, line)
+
+    def top(self, k):
+        """
+        :param k: board size
+        :return: (list) (player, value) best first
+        """
+        return [(player, _score(self.metric, score)) for score, player in self._board.head(k)]
+
+    def rank(self, player):
+        """
+        :param player: player id
+        :return: (int) 1-based rank, ties share the best rank(None: not qualified)
+        """
+        entry = self._entries.get(player)
+        if entry is None:
+            return None
+        return self._board.index((entry[0], )) + 1
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.registry import WOBA_MLB, WOBA_MLB_SCALE
+from sabr.vectorized import Stats, column
+
+__author__ = 'Shinichi Nakagawa'
+
+BATTING = 'batting'
+PITCHING = 'pitching'
+
+# counting stats summed per (league, season)
+FIELDS = {
+    BATTING: ('ab', 'h', '_2b', '_3b', 'hr', 'bb', 'ibb', 'hbp', 'sf', 'sh', 'so', 'r'),
+    PITCHING: ('ip_outs', 'er', 'r', 'h', 'hr', 'bb', 'ibb', 'hbp', 'so'),
+}
+
+League = namedtuple('League', ('league', 'season', 'lg_obp', 'lg_woba', 'woba_scale', 'r_pa', 'era', 'ra9', 'c'))
+
+
+def group(leagues, seasons):
+    """
+    (league, season) groups of a table
+    :param leagues: league column(or scalar)
+    :param seasons: season column(or scalar)
+    :return: (list, ndarray) unique (league, season) keys, group index per row
+    """
+    leagues, seasons = np.broadcast_arrays(np.asarray(leagues), np.asarray(seasons))
+    league_keys, league_index = np.unique(leagues.reshape(-1), return_inverse=True)
+    season_keys, season_index = np.unique(seasons.reshape(-1), return_inverse=True)
+    codes, index = np.unique(league_index * len(season_keys) + season_index, return_inverse=True)
+    keys = [(league_keys[c // len(season_keys)].item(), season_keys[c % len(season_keys)].item()) for c in codes]
+    return keys, index.reshape(leagues.shape)
+
+
+def _ratio(numerator, denominator):
+    return float(numerator) / float(denominator) if denominator else float('nan')
+
+
+class LeagueContext(object):
+    """
+    League context builder
+    Streams league totals once and derives, per (league, season), the FIP constant,
+    lg_wOBA, wOBA scale and run environment. Derived values are cached until the
+    totals of that league-season change.
+    """
+
+    def __init__(self, weights=WOBA_MLB, scale=WOBA_MLB_SCALE):
+        """
+        :param weights: wOBA weights(default:sabr.registry.WOBA_MLB)
+        :param scale: wOBA scale the weights come with(default:sabr.registry.WOBA_MLB_SCALE),
+                      RunExpectancy.weights() gives both as woba and woba_scale
+        """
+        self.weights = dict(weights)
+        # linear weights over an out, the league wOBA scale is measured with these
+        self.run_values = {k: v / float(scale) for k, v in self.weights.items()}
+        self._totals = {}
+        self._cache = {}
+
+    def totals(self, league, season, side=BATTING):
+        """
+        League totals
+        :param league: league
+        :param season: season
+        :param side: 'batting' or 'pitching'(default:'batting')
+        :return: (dict) counting stat -> total
+        """
+        vector = self._totals.get((league, season, side))
+        if vector is None:
+            vector = np.zeros(len(FIELDS[side]), dtype=np.int64)
+        return dict(zip(FIELDS[side], vector.tolist()))
+
+    def keys(self):
+        """
+        (league, season) with totals
+        :return: (list) keys
+        """
+        return sorted({(league, season) for league, season, _ in self._totals})
+
+    def update(self, league, season, table, side=BATTING):
+        """
+        Add a row or a table of one league-season(negative values subtract)
+        :param league: league
+        :param season: season
+        :param table: mapping of counting stats, scalars or columns(missing stats count as 0)
+        :param side: 'batting' or 'pitching'(default:'batting')
+        """
+        delta = np.array([np.sum(column(table[f])) if f in table else 0 for f in FIELDS[side]], dtype=np.int64)
+        self._add(league, season, side, delta)
+
+    def update_grouped(self, leagues, seasons, table, side=BATTING):
+        """
+        Add a table spanning several league-seasons in one pass
+        :param leagues: league column
+        :param seasons: season column
+        :param table: mapping of counting stat columns
+        :param side: 'batting' or 'pitching'(default:'batting')
+        """
+        keys, index = group(leagues, seasons)
+        sums = np.zeros((len(keys), len(FIELDS[side])), dtype=np.int64)
+        for i, field in enumerate(FIELDS[side]):
+            if field in table:
+                sums[:, i] = np.bincount(index, weights=column(table[field]), minlength=len(keys))
+        for (league, season), delta in zip(keys, sums):
+            self._add(league, season, side, delta)
+
+    def _add(self, league, season, side, delta):
+        key = (league, season, side)
+        if key in self._totals:
+            self._totals[key] = self._totals[key] + delta
+        else:
+            self._totals[key] = delta
+        self._cache.pop((league, season), None)
+
+    def get(self, league, season):
+        """
+        Derived league context
+        :param league: league
+        :param season: season
+        :return: (League) lg_obp, lg_woba, woba_scale, r_pa, era, ra9 and FIP constant c
+        """
+        context = self._cache.get((league, season))
+        if context is None:
+            context = self._derive(league, season)
+            self._cache[(league, season)] = context
+        return context
+
+    def _derive(self, league, season):
+        bat = self.totals(league, season, BATTING)
+        pit = self.totals(league, season, PITCHING)
+        nan = float('nan')
+        if bat['ab']:
+            values = compute(['obp', 'woba', 'pa'], bat, self.weights)
+            lg_obp, lg_woba = values['obp'], values['woba']
+            woba_scale, r_pa = self._scale(bat), _ratio(bat['r'], values['pa'])
+        else:
+            lg_obp = lg_woba = woba_scale = r_pa = nan
+        ip = pit['ip_outs'] / 3.0
+        if ip:
+            era = 9.0 * pit['er'] / ip
+            ra9 = 9.0 * pit['r'] / ip
+            c = era - (13.0 * pit['hr'] + 3.0 * (pit['bb'] + pit['hbp'] - pit['ibb']) - 2.0 * pit['so']) / ip
+        else:
+            era = ra9 = c = nan
+        return League(league, season, lg_obp, lg_woba, woba_scale, r_pa, era, ra9, c)
+
+    def _scale(self, bat):
+        """
+        wOBA scale: league OBP over the league wOBA of the unscaled run values(no rounding)
+        """
+        runs = self.run_values
+        single = bat['h'] - bat['_2b'] - bat['_3b'] - bat['hr']
+        numerator = (runs['const_u_bb'] * (bat['bb'] - bat['ibb']) + runs['const_u_hbp'] * bat['hbp']
+                     + runs['const_u_1b'] * single + runs['const_u_2b'] * bat['_2b'] + runs['const_u_3b'] * bat['_3b']
+                     + runs['const_u_hr'] * bat['hr'])
+        on_base = bat['h'] + bat['bb'] + bat['hbp']
+        return _ratio(on_base * (bat['ab'] + bat['bb'] - bat['ibb'] + bat['hbp'] + bat['sf']),
+                      numerator * (bat['ab'] + bat['bb'] + bat['hbp'] + bat['sf']))
+
+    def column(self, name, leagues, seasons):
+        """
+        League context value per row
+        :param name: League field(e.g. 'c', 'lg_woba', 'woba_scale', 'ra9')
+        :param leagues: league column
+        :param seasons: season column
+        :return: (ndarray) value per row
+        """
+        keys, index = group(leagues, seasons)
+        values = np.array([getattr(self.get(league, season), name) for league, season in keys], dtype=np.float64)
+        return values[index]
+
+    def fip(self, leagues, seasons, hr, bb, hbp, so, ip, ibb=0):
+        """
+        Batch FIP with the league-season constant
+        :param leagues: league column
+        :param seasons: season column
+        :param hr: home run
+        :param bb: base on ball
+        :param hbp: hit by pitch
+        :param so: strike out
+        :param ip: inning pitched
+        :param ibb: intentional base on balls(default:0)
+        :return: (ndarray) FIP
+        """
+        return Stats.fip(hr, bb, hbp, so, ip, ibb, c=self.column('c', leagues, seasons))
+
+    def wraa(self, leagues, seasons, woba, pa):
+        """
+        Batch wRAA with league-season lg_wOBA and wOBA scale
+        :param leagues: league column
+        :param seasons: season column
+        :param woba: weighted on-base average
+        :param pa: plate appearance
+        :return: (ndarray) wRAA
+        """
+        keys, index = group(leagues, seasons)
+        contexts = [self.get(league, season) for league, season in keys]
+        lg_woba = np.array([context.lg_woba for context in contexts])[index]
+        woba_scale = np.array([context.woba_scale for context in contexts])[index]
+        return Stats.wraa(woba, lg_woba, pa, woba_scale=woba_scale)
+
+    def rsaa(self, leagues, seasons, ra, ip):
+        """
+        Batch RSAA against the league-season RA/9
+        :param leagues: league column
+        :param seasons: season column
+        :param ra: run average
+        :param ip: inning pitched
+        :return: (ndarray) rsaa
+        """
+        return Stats.rsaa(ra, self.column('ra9', leagues, seasons), ip)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from array import array
+
+import numpy as np
+
+from sabr.compiler import compile_metrics
+from sabr.evaluator import compute
+from sabr.registry import BATTING_STATS, DEFAULTS, PITCHING_STATS
+
+__author__ = 'Shinichi Nakagawa'
+
+# (fields, metric, constants) -> (kernel function, parameter indexes, defaults of the optional parameters a line
+# does not count, indexed after the fields)
+_KERNELS = {}
+
+
+def _kernel(fields, metric, constants):
+    key = (fields, metric, tuple(sorted(constants.items())))
+    entry = _KERNELS.get(key)
+    if entry is None:
+        kernel = compile_metrics([metric], constants)
+        indexes, defaults = [], []
+        for name in kernel.inputs + kernel.optional:
+            if name in fields:
+                indexes.append(fields.index(name))
+            elif name in kernel.optional:
+                indexes.append(len(fields) + len(defaults))
+                defaults.append(DEFAULTS[name])
+            else:
+                raise KeyError(name)
+        entry = (kernel.function, indexes, defaults)
+        _KERNELS[key] = entry
+    return entry
+
+
+class _Line(object):
+    """
+    Counting stats of a player-season
+    Counters live in one int32 vector(an array of its own or a view into a LineTable),
+    derived stats are computed on first access and cached until a counter changes.
+    """
+
+    __slots__ = ('_values', '_cache')
+
+    FIELDS = ()
+    DERIVED = ()
+
+    def __init__(self, **counters):
+        """
+        :param counters: counting stats(e.g. ab=600, h=180), missing ones are 0
+        """
+        self._values = array('i', bytes(4 * len(self.FIELDS)))
+        self._cache = None
+        for name, value in counters.items():
+            if name not in self.FIELDS:
+                raise TypeError('unknown counting stat: {}'.format(name))
+            setattr(self, name, value)
+
+    @classmethod
+    def _view(cls, values):
+        line = cls.__new__(cls)
+        line._values = values
+        line._cache = None
+        return line
+
+    def stat(self, metric, constants=None):
+        """
+        Derived stat(raises ZeroDivisionError like Stats when the denominator is 0)
+        :param metric: metric name(e.g. 'ops', 'rc', 'fip')
+        :param constants: constants profile, results are cached only without one
+        :return: value
+        """
+        if not constants and self._cache is not None and metric in self._cache:
+            return self._cache[metric]
+        function, indexes, defaults = _kernel(self.FIELDS, metric, dict(constants or {}))
+        values = self._values.tolist() + defaults
+        value = function(*[values[i] for i in indexes])[0]
+        if not constants:
+            if self._cache is None:
+                self._cache = {}
+            self._cache[metric] = value
+        return value
+
+    def as_dict(self):
+        """
+        :return: (dict) counting stat -> value
+        """
+        return dict(zip(self.FIELDS, self._values.tolist()))
+
+    def __repr__(self):
+        return '{}({})'.format(
+            type(self).__name__, ', '.join('{}={}'.format(k, v) for k, v in self.as_dict().items() if v)
+        )
+
+
+def _counter(index):
+    def get(self):
+        return int(self._values[index])
+
+    def set(self, value):
+        self._values[index] = value
+        self._cache = None
+    return property(get, set)
+
+
+def _derived(metric):
+    def get(self):
+        return self.stat(metric)
+    return property(get, doc='{}(cached)'.format(metric))
+
+
+def _define(cls):
+    for index, name in enumerate(cls.FIELDS):
+        setattr(cls, name, _counter(index))
+    for metric in cls.DERIVED:
+        setattr(cls, metric, _derived(metric))
+    return cls
+
+
+@_define
+class BattingLine(_Line):
+    """
+    Batting line
+    """
+
+    __slots__ = ()
+
+    FIELDS = BATTING_STATS
+    DERIVED = ('single', 'pa', 'tb', 'avg', 'obp', 'slg', 'ops', 'babip', 'woba_mlb', 'woba_npb', 'rc', 'rc2002',
+               'rc27', 'base_runs', 'adam_dunn_batter')
+
+
+@_define
+class PitchingLine(_Line):
+    """
+    Pitching line
+    """
+
+    __slots__ = ()
+
+    FIELDS = PITCHING_STATS
+    DERIVED = ('ip', 'era', 'whip', 'h9', 'so9', 'bb9', 'hr9', 'fip', 'adam_dunn_pitcher')
+
+
+class LineTable(object):
+    """
+    Array-backed lines
+    One (fields, rows) int32 array: columns are contiguous for the batch engines and
+    table[i] is a line whose counters are a view into row i. Views are created per access,
+    so their cache does not see writes made through column().
+    """
+
+    def __init__(self, kind, size):
+        """
+        :param kind: BattingLine or PitchingLine
+        :param size: rows
+        """
+        self.kind = kind
+        self.values = np.zeros((len(kind.FIELDS), size), dtype=np.int32)
+
+    @classmethod
+    def from_columns(cls, kind, table):
+        """
+        :param kind: BattingLine or PitchingLine
+        :param table: mapping of counting stat columns, missing ones are 0
+        :return: (LineTable) table
+        """
+        size = len(next(iter(table.values())))
+        lines = cls(kind, size)
+        for name, values in table.items():
+            lines.column(name)[:] = values
+        return lines
+
+    def __len__(self):
+        return self.values.shape[1]
+
+    def __getitem__(self, index):
+        """
+        :param index: row
+        :return: (BattingLine or PitchingLine) line backed by the row
+        """
+        return self.kind._view(self.values[:, index])
+
+    def column(self, name):
+        """
+        :param name: counting stat
+        :return: (ndarray) writable int32 view
+        """
+        return self.values[self.kind.FIELDS.index(name)]
+
+    def compute(self, metrics, constants=None):
+        """
+        Metrics for every row(NaN/inf where a denominator is 0)
+        :param metrics: metric names
+        :param constants: constants profile
+        :return: (dict) metric -> ndarray
+        """
+        data = {name: self.values[i] for i, name in enumerate(self.kind.FIELDS)}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return compute(metrics, data, constants)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.league import group
+from sabr.vectorized import column
+
+__author__ = 'Shinichi Nakagawa'
+
+DEFAULT_CHUNK_SIZE = 262144
+
+
+class _Block(object):
+    """
+    Named columns packed into one shared memory block
+    """
+
+    def __init__(self, layout, name=None):
+        """
+        :param layout: list of (name, dtype str, length)
+        :param name: shared memory name to attach to(default:None, create)
+        """
+        self.layout = layout
+        size = sum(np.dtype(dtype).itemsize * length for _, dtype, length in layout)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.columns, offset = {}, 0
+        for key, dtype, length in layout:
+            self.columns[key] = np.ndarray((length, ), dtype=dtype, buffer=self.shm.buf, offset=offset)
+            offset += np.dtype(dtype).itemsize * length
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.columns = {}
+        self.shm.close()
+
+
+def _work(task):
+    """
+    Worker: compute one shard from shared memory into shared memory
+    """
+    source_spec, target_spec, metrics, constants, start, stop = task
+    source, target = _Block(*source_spec), _Block(*target_spec)
+    try:
+        if '__order__' in source.columns:
+            rows = source.columns['__order__'][start:stop]
+        else:
+            # contiguous row range: zero-copy views
+            rows = slice(start, stop)
+        data = {k: v[rows] for k, v in source.columns.items() if k != '__order__'}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = compute(metrics, data, constants)
+        for metric in metrics:
+            target.columns[metric][rows] = values[metric]
+    finally:
+        source.close()
+        target.close()
+    return stop - start
+
+
+def shards(size, chunk_size=DEFAULT_CHUNK_SIZE, leagues=None, seasons=None):
+    """
+    Row order and shard boundaries
+    :param size: number of rows
+    :param chunk_size: maximum rows per shard
+    :param leagues: league column, shard by (league, season) when given with seasons
+    :param seasons: season column
+    :return: (ndarray, list) row order(None: input order), list of (start, stop) into the order
+    """
+    if leagues is None or seasons is None:
+        order = None
+        bounds = [0, size]
+    else:
+        keys, index = group(leagues, seasons)
+        order = np.argsort(index, kind='stable').astype(np.int64)
+        bounds = np.searchsorted(index[order], np.arange(len(keys) + 1)).tolist()
+    ranges = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        ranges.extend((start, min(start + chunk_size, hi)) for start in range(lo, hi, chunk_size))
+    return order, ranges
+
+
+def recompute(metrics, table, constants=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, leagues=None,
+              seasons=None):
+    """
+    Compute metrics for a large table on a process pool
+    Columns are handed to the workers through shared memory and every worker writes its
+    shard straight into shared result columns, so results come back in input order and
+    equal a serial compute().
+    :param metrics: metric names
+    :param table: mapping of counting stat columns
+    :param constants: constant overrides(scalars; per-row values go in the table)
+    :param chunk_size: maximum rows per shard(default:262144)
+    :param workers: worker processes(default:None, os.cpu_count(); 1 computes in process)
+    :param leagues: league column, shard by (league, season) when given with seasons
+    :param seasons: season column
+    :return: (dict) metric -> ndarray
+    """
+    metrics = list(metrics)
+    table = {k: np.ascontiguousarray(column(v)) for k, v in table.items()}
+    size = len(next(iter(table.values())))
+    order, ranges = shards(size, chunk_size, leagues, seasons)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers <= 1 or len(ranges) <= 1:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return compute(metrics, table, constants)
+    # result dtypes from a one row probe
+    with np.errstate(divide='ignore', invalid='ignore'):
+        probe = compute(metrics, {k: v[:1] for k, v in table.items()}, constants)
+    if order is not None:
+        table['__order__'] = order
+    source = _Block([(k, v.dtype.str, size) for k, v in table.items()])
+    target = _Block([(m, probe[m].dtype.str, size) for m in metrics])
+    try:
+        for k, v in table.items():
+            source.columns[k][:] = v
+        tasks = [
+            ((source.layout, source.name), (target.layout, target.name), metrics, constants, start, stop)
+            for start, stop in ranges
+        ]
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            list(executor.map(_work, tasks))
+        return {m: target.columns[m].copy() for m in metrics}
+    finally:
+        for block in (source, target):
+            shm = block.shm
+            block.close()
+            shm.unlink()
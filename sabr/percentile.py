@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.leaderboard import ASCENDING
+from sabr.league import group
+
+__author__ = 'Shinichi Nakagawa'
+
+
+class _Distribution(object):
+    """
+    Values of one league-season: per player rows and one sorted array per metric
+    Non-finite values(NaN, inf: e.g. ERA with 0 IP) are kept per player but left out of the sorted arrays.
+    """
+
+    def __init__(self, metrics):
+        self.players = {}
+        self.values = OrderedDict((metric, []) for metric in metrics)
+        self.sorted = {metric: np.empty(0, dtype=np.float64) for metric in metrics}
+        self._added = {metric: [] for metric in metrics}
+        self._removed = {metric: [] for metric in metrics}
+
+    def set(self, player, values):
+        row = self.players.get(player)
+        if row is None:
+            row = len(self.players)
+            self.players[player] = row
+            for metric in self.values:
+                self.values[metric].append(float('nan'))
+        for metric, value in values.items():
+            old = self.values[metric][row]
+            if math.isfinite(old):
+                self._removed[metric].append(old)
+            if math.isfinite(value):
+                self._added[metric].append(value)
+            self.values[metric][row] = value
+
+    def flush(self):
+        """
+        Merge the pending changes into the sorted arrays
+        """
+        for metric, ordered in self.sorted.items():
+            added, removed = self._added[metric], self._removed[metric]
+            if added:
+                added = np.sort(np.asarray(added, dtype=np.float64))
+                ordered = np.insert(ordered, np.searchsorted(ordered, added), added)
+            if removed:
+                removed = np.sort(np.asarray(removed, dtype=np.float64))
+                # the k-th copy of a repeated value is k slots after the first one
+                copies = np.arange(len(removed)) - np.searchsorted(removed, removed)
+                ordered = np.delete(ordered, np.searchsorted(ordered, removed) + copies)
+            self.sorted[metric] = ordered
+            self._added[metric], self._removed[metric] = [], []
+
+
+class PercentileIndex(object):
+    """
+    Percentile and rank index
+    One sorted array per (league, season, metric), so a rank or percentile is two binary
+    searches. Percentiles count ties as half(100: best in the league) and follow the
+    metric direction(lower is better for ERA, FIP, WHIP...). NaN and infinite values are
+    not part of the distributions.
+    """
+
+    def __init__(self, metrics):
+        """
+        :param metrics: metric names
+        """
+        self.metrics = list(metrics)
+        self._distributions = {}
+
+    @classmethod
+    def from_table(cls, metrics, players, leagues, seasons, table, constants=None, mask=None):
+        """
+        Build from counting stats with the batch formulas
+        :param metrics: metric names
+        :param players: player id column
+        :param leagues: league column
+        :param seasons: season column
+        :param table: mapping of counting stat columns
+        :param constants: constants profile
+        :param mask: rows in the distributions(e.g. sabr.leaderboard.qualified(), default:None, every row)
+        :return: (PercentileIndex) index
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = compute(metrics, table, constants)
+        index = cls(metrics)
+        if mask is not None:
+            rows = np.flatnonzero(mask)
+            players, leagues, seasons = np.asarray(players)[rows], np.asarray(leagues)[rows], np.asarray(seasons)[rows]
+            values = {metric: np.asarray(column)[rows] for metric, column in values.items()}
+        index.update(players, leagues, seasons, values)
+        return index
+
+    def update(self, players, leagues, seasons, values):
+        """
+        Add or replace player values, merged into the sorted arrays of the touched league-seasons
+        :param players: player id column
+        :param leagues: league column
+        :param seasons: season column
+        :param values: metric -> column(batch Stats / compute() output)
+        """
+        keys, index = group(leagues, seasons)
+        players = np.asarray(players).tolist()
+        columns = {metric: np.asarray(values[metric], dtype=np.float64).tolist() for metric in self.metrics
+                   if metric in values}
+        touched = set()
+        for row, g in enumerate(index.tolist()):
+            key = keys[g]
+            distribution = self._distributions.get(key)
+            if distribution is None:
+                distribution = _Distribution(self.metrics)
+                self._distributions[key] = distribution
+            distribution.set(players[row], {metric: column[row] for metric, column in columns.items()})
+            touched.add(key)
+        for key in touched:
+            self._distributions[key].flush()
+
+    def keys(self):
+        """
+        :return: (list) indexed (league, season)
+        """
+        return sorted(self._distributions)
+
+    def _counts(self, league, season, metric, values):
+        distribution = self._distributions.get((league, season))
+        if distribution is None:
+            raise KeyError((league, season))
+        ordered = distribution.sorted[metric]
+        left = np.searchsorted(ordered, values, side='left')
+        right = np.searchsorted(ordered, values, side='right')
+        size = len(ordered)
+        if metric in ASCENDING:
+            worse, better = size - right, left
+        else:
+            worse, better = left, size - right
+        return worse, better, right - left, size
+
+    def percentile(self, league, season, metric, value):
+        """
+        :param league: league
+        :param season: season
+        :param metric: metric name
+        :param value: metric value
+        :return: (float) 0-100 percentile(NaN: no value or empty league)
+        """
+        worse, _, ties, size = self._counts(league, season, metric, value)
+        if not size or value != value:
+            return float('nan')
+        return float(100.0 * (worse + 0.5 * ties) / size)
+
+    def rank(self, league, season, metric, value):
+        """
+        :param league: league
+        :param season: season
+        :param metric: metric name
+        :param value: metric value
+        :return: (int) 1 + players with a better value
+        """
+        _, better, _, _ = self._counts(league, season, metric, value)
+        return int(better) + 1
+
+    def percentiles(self, leagues, seasons, values):
+        """
+        Bulk percentiles, one vectorized search per (league, season, metric)
+        :param leagues: league column
+        :param seasons: season column
+        :param values: metric -> column
+        :return: (dict) metric -> percentile column(NaN for missing values or unknown leagues)
+        """
+        keys, index = group(leagues, seasons)
+        order = np.argsort(index, kind='stable')
+        bounds = np.searchsorted(index[order], np.arange(len(keys) + 1))
+        result = OrderedDict()
+        for metric, column in values.items():
+            column = np.asarray(column, dtype=np.float64)
+            out = np.full(len(column), np.nan)
+            for g, (league, season) in enumerate(keys):
+                if (league, season) not in self._distributions:
+                    continue
+                rows = order[bounds[g]:bounds[g + 1]]
+                worse, _, ties, size = self._counts(league, season, metric, column[rows])
+                if size:
+                    out[rows] = 100.0 * (worse + 0.5 * ties) / size
+            out[np.isnan(column)] = np.nan
+            result[metric] = out
+        return result
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.league import BATTING, PITCHING
+from sabr.registry import BATTING_STATS, PITCHING_STATS
+from sabr.vectorized import column
+
+__author__ = 'Shinichi Nakagawa'
+
+# Marcel the Monkey(Tom Tango): season weights(most recent first), regression amount in
+# playing time units(PA, outs) of league average, playing time(weight of last season,
+# weight of the season before, base)
+WEIGHTS = {BATTING: (5.0, 4.0, 3.0), PITCHING: (3.0, 2.0, 1.0)}
+REGRESSION = {BATTING: 1200.0, PITCHING: 134.0 * 3}
+PLAYING_TIME = {BATTING: (0.5, 0.1, 200.0), PITCHING: (0.5, 0.1, 60.0 * 3)}
+PEAK_AGE = 29
+YOUNGER = 0.006
+OLDER = 0.003
+
+# counting stats projected per playing time unit
+FIELDS = {BATTING: BATTING_STATS, PITCHING: tuple(f for f in PITCHING_STATS if f != 'ip_outs')}
+# aging: NEGATIVE rates move against the others, NEUTRAL rates are not aged
+NEGATIVE = {BATTING: ('so', 'cs', 'gidp'), PITCHING: ('h', 'hr', 'bb', 'ibb', 'hbp', 'er', 'r')}
+NEUTRAL = {BATTING: ('ab', 'sf', 'sh'), PITCHING: ('bfp', )}
+
+
+def _denominator(table, side):
+    """
+    Playing time per row: plate appearances or outs
+    """
+    if side == PITCHING:
+        return column(table['ip_outs']).astype(np.float64)
+    size = len(column(table['ab']))
+    return sum(column(table[f]).astype(np.float64) if f in table else np.zeros(size)
+               for f in ('ab', 'bb', 'hbp', 'sf', 'sh'))
+
+
+def align(players, seasons, table, season, fields, years=3):
+    """
+    Player histories as padded 3-D arrays
+    Rows of the same player-season(stints) are summed, seasons outside the window are dropped.
+    :param players: player id column
+    :param seasons: season column
+    :param table: mapping of counting stat columns
+    :param season: season projected, the window is the years before it
+    :param fields: counting stats
+    :param years: seasons in the window(default:3)
+    :return: (ndarray, ndarray) player keys, (players, years(most recent first), fields) totals(0 where missing)
+    """
+    seasons = np.asarray(seasons, dtype=np.int64)
+    back = season - 1 - seasons
+    rows = np.flatnonzero((back >= 0) & (back < years))
+    keys, index = np.unique(np.asarray(players)[rows], return_inverse=True)
+    cube = np.zeros((len(keys), years, len(fields)))
+    cells = index.reshape(-1) * years + back[rows]
+    for i, field in enumerate(fields):
+        values = column(table[field])[rows] if field in table else np.zeros(len(rows))
+        cube[:, :, i] = np.bincount(cells, weights=values, minlength=len(keys) * years).reshape(len(keys), years)
+    return keys, cube
+
+
+def _ages(players, seasons, ages, season, keys):
+    """
+    Age in the projected season per player key
+    """
+    players, seasons = np.asarray(players), np.asarray(seasons, dtype=np.int64)
+    target = column(ages).astype(np.float64) + (season - seasons)
+    rows = np.flatnonzero(np.isin(players, keys))
+    result = np.full(len(keys), np.nan)
+    np.fmax.at(result, np.searchsorted(keys, players[rows]), target[rows])
+    return result
+
+
+def project(players, seasons, table, season, side=BATTING, ages=None):
+    """
+    Marcel projection of next-season counting stats
+    Rates per playing time unit are the weighted sums of the window regressed to the
+    league rate(weighted by the player's own playing time) and aged from PEAK_AGE;
+    projected playing time is a weighted sum of the last two seasons plus a base.
+    :param players: player id column
+    :param seasons: season column
+    :param table: mapping of counting stat columns
+    :param season: season projected
+    :param side: 'batting' or 'pitching'(default:'batting')
+    :param ages: age per row in that row's season(default:None, no aging)
+    :return: (ndarray, OrderedDict) player keys, projected counting stat columns(float)
+    """
+    fields = FIELDS[side]
+    weights = np.asarray(WEIGHTS[side])
+    data = dict(table)
+    data['_time'] = _denominator(table, side)
+    keys, cube = align(players, seasons, data, season, fields + ('_time', ), years=len(weights))
+    values, time = cube[:, :, :-1], cube[:, :, -1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        league = values.sum(axis=0) / time.sum(axis=0)[:, None]
+    league = np.nan_to_num(league)
+    weighted_time = time.dot(weights)
+    own = np.einsum('pyf,y->pf', values, weights)
+    # league rate weighted like the player's own seasons, plain season weights without playing time
+    share = np.where(weighted_time[:, None] > 0, time * weights, weights)
+    mean = share.dot(league) / share.sum(axis=1)[:, None]
+    regression = REGRESSION[side]
+    rates = (own + regression * mean) / (weighted_time + regression)[:, None]
+    if ages is not None:
+        age = _ages(players, seasons, ages, season, keys)
+        adjustment = np.where(age < PEAK_AGE, (PEAK_AGE - age) * YOUNGER, (PEAK_AGE - age) * OLDER)
+        adjustment = np.nan_to_num(adjustment)
+        direction = np.array([0.0 if f in NEUTRAL[side] else -1.0 if f in NEGATIVE[side] else 1.0 for f in fields])
+        rates = rates * (1.0 + adjustment[:, None] * direction)
+    last, before, base = PLAYING_TIME[side]
+    playing_time = last * time[:, 0] + before * time[:, 1] + base
+    projected = OrderedDict((field, rates[:, i] * playing_time) for i, field in enumerate(fields))
+    if side == PITCHING:
+        projected['ip_outs'] = playing_time
+    return keys, projected
+
+
+def projections(metrics, players, seasons, table, season, side=BATTING, ages=None, constants=None):
+    """
+    Metrics of the Marcel projection(batch formulas over the projected counting stats)
+    :param metrics: metric names(e.g. ['avg', 'obp', 'ops', 'woba_mlb'] or ['era', 'fip'])
+    :param players: player id column
+    :param seasons: season column
+    :param table: mapping of counting stat columns
+    :param season: season projected
+    :param side: 'batting' or 'pitching'(default:'batting')
+    :param ages: age per row in that row's season(default:None, no aging)
+    :param constants: constants profile
+    :return: (ndarray, OrderedDict) player keys, projected counting stats followed by the metrics
+    """
+    keys, projected = project(players, seasons, table, season, side, ages)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = compute(metrics, projected, constants)
+    result = OrderedDict(projected)
+    for metric in metrics:
+        result[metric] = values[metric]
+    return keys, result
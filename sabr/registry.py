@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+__author__ = 'Shinichi Nakagawa'
+
+# names every formula may call; they are bound to round/float(scalar) or py_round/as_float(batch)
+BUILTINS = ('round', 'float')
+
+# optional counting stats, same defaults as the Stats methods
+DEFAULTS = {
+    'ibb': 0,
+    'e_bb': 0,
+}
+
+# counting stats the formulas consume
+BATTING_STATS = ('ab', 'h', '_2b', '_3b', 'hr', 'bb', 'ibb', 'hbp', 'sf', 'sh', 'so', 'sb', 'cs', 'gidp', 'r')
+PITCHING_STATS = ('ip_outs', 'bfp', 'h', 'hr', 'bb', 'ibb', 'hbp', 'so', 'er', 'r')
+
+WOBA_MLB = OrderedDict((
+    ('const_u_bb', 0.69),
+    ('const_u_hbp', 0.72),
+    ('const_u_e_bb', 0),
+    ('const_u_1b', 0.89),
+    ('const_u_2b', 1.27),
+    ('const_u_3b', 1.62),
+    ('const_u_hr', 2.10),
+))
+
+# wOBA scale the WOBA_MLB weights come with(FanGraphs, 2013): weight / scale is the run value of the event over an out
+WOBA_MLB_SCALE = 1.277
+
+WOBA_NPB = OrderedDict((
+    ('const_u_bb', 0.692),
+    ('const_u_hbp', 0.73),
+    ('const_u_e_bb', 0.966),
+    ('const_u_1b', 0.865),
+    ('const_u_2b', 1.334),
+    ('const_u_3b', 1.725),
+    ('const_u_hr', 2.065),
+))
+
+_WOBA = 'round((round(const_u_bb * float(bb - ibb), 3) + round(float(const_u_hbp * hbp), 3)' \
+        ' + round(const_u_e_bb * float(e_bb), 3) + (round(const_u_1b * float(single), 3)' \
+        ' + round(const_u_2b * float(_2b), 3) + round(const_u_3b * _3b, 3) + round(const_u_hr * float(hr), 3)))' \
+        ' / round(float(woba_den), 3), 3)'
+
+
+class Formula(object):
+    """
+    Declarative metric definition
+    The expression is the Stats method body written as a single Python expression over
+    counting stats, other formulas and constants. round() and float() are the only calls.
+    """
+
+    def __init__(self, name, expression, constants=None, doc='', denominators=()):
+        """
+        :param name: metric name
+        :param expression: python expression
+        :param constants: constant name -> default value(None: no default)
+        :param doc: short description
+        :param denominators: expressions over the names of expression that must be positive
+                             for the value to be defined(e.g. ('ab', ) for AVG)
+        """
+        self.name = name
+        self.expression = expression
+        self.constants = OrderedDict(constants or ())
+        self.doc = doc
+        self.code = compile(expression, '<sabr.registry:{}>'.format(name), 'eval')
+        self.names = tuple(n for n in self.code.co_names if n not in BUILTINS)
+        self.inputs = tuple(n for n in self.names if n not in self.constants)
+        self.denominators = tuple(denominators)
+        self.checks = tuple(compile(d, '<sabr.registry:{}:denominator>'.format(name), 'eval') for d in denominators)
+        for check in self.checks:
+            unknown = [n for n in check.co_names if n not in BUILTINS and n not in self.names]
+            if unknown:
+                raise ValueError('{} denominator reads names outside its formula: {}'.format(name, unknown))
+
+    def __repr__(self):
+        return 'Formula({!r}, {!r})'.format(self.name, self.expression)
+
+
+REGISTRY = OrderedDict()
+
+
+def register(name, expression, constants=None, doc='', denominators=()):
+    """
+    Add (or replace) a formula
+    :param name: metric name
+    :param expression: python expression
+    :param constants: constant name -> default value
+    :param doc: short description
+    :param denominators: expressions that must be positive for the value to be defined
+    :return: (Formula) formula
+    """
+    formula = Formula(name, expression, constants, doc, denominators)
+    REGISTRY[name] = formula
+    return formula
+
+
+def dependencies(metrics, available=(), registry=None, strict=True):
+    """
+    Formulas needed for metrics, in evaluation order
+    Names in available (data columns) are never recomputed, every other formula at most once.
+    :param metrics: metric names
+    :param available: names supplied by the caller
+    :param registry: formula registry(default:REGISTRY)
+    :param strict: raise KeyError for names neither available nor registered(default:True),
+                   otherwise they are left as inputs
+    :return: (list) Formula list, dependencies first
+    """
+    registry = REGISTRY if registry is None else registry
+    available = frozenset(available)
+    order, visiting, done = [], set(), set()
+
+    def visit(name):
+        if name in done or name in available:
+            return
+        if name not in registry:
+            if strict or name in metrics:
+                raise KeyError('unknown metric or missing input: {}'.format(name))
+            return
+        if name in visiting:
+            raise ValueError('circular formula: {}'.format(name))
+        visiting.add(name)
+        formula = registry[name]
+        for dependency in formula.inputs:
+            if dependency not in available and dependency not in DEFAULTS:
+                visit(dependency)
+        for constant, value in formula.constants.items():
+            if value is None and constant not in available:
+                visit(constant)
+        visiting.discard(name)
+        done.add(name)
+        order.append(formula)
+
+    for metric in metrics:
+        visit(metric)
+    return order
+
+
+# pitching
+register('ip', 'round(float(ip_outs) / 3, 1)', doc='Inning Pitched')
+register('era', 'round((9 * er) / ip, 2)', doc='Earned run average', denominators=('ip', ))
+register('whip', 'round((bb + h) / ip, 3)', doc='Walks + Hits / IP', denominators=('ip', ))
+register('h9', 'round((9 * h) / ip, 1)', doc='Hits / 9', denominators=('ip', ))
+register('so9', 'round((9 * so) / ip, 1)', doc='Strike out / 9', denominators=('ip', ))
+register('bb9', 'round((9 * bb) / ip, 1)', doc='BB / 9', denominators=('ip', ))
+register('hr9', 'round((9 * hr) / ip, 1)', doc='HR / 9', denominators=('ip', ))
+register(
+    'fip',
+    'round((float(13.0 * hr) + 3.0 * float(bb + hbp - ibb) - 2.0 * float(so)) / float(ip) + c, 2)',
+    constants={'c': 3.12},
+    doc='Fielding Independent Pitching(FIP)',
+    denominators=('ip', )
+)
+register('adam_dunn_pitcher', 'round(((float(hr) + float(bb) + float(hbp) + float(so)) / float(bfp)) * 100, 1)',
+         doc='Adam dunn %(pitcher)', denominators=('bfp', ))
+register('rsaa', 'round(float(league_ra - ra) * ip / 9.0, 1)', doc='Run Saved Above Average')
+
+# batting: shared intermediates
+register('single', 'h - (hr + _2b + _3b)', doc='Single hits')
+register('pa', 'ab + bb + hbp + sf + sh', doc='Plate appearance')
+register('tb', 'hr * 4 + _3b * 3 + _2b * 2 + single', doc='Total bases')
+register('tob', 'h + bb + hbp', doc='Times on base(OBP numerator)')
+register('obp_den', 'ab + bb + hbp + sf', doc='OBP denominator')
+register('woba_den', 'ab + bb - ibb + hbp + sf', doc='wOBA denominator')
+register('rc_a', 'float(h + bb + hbp - cs - gidp)', doc='Runs Created A factor')
+register(
+    'rc_b',
+    'float(tb) + round(0.24 * float(bb + hbp - ibb), 1) + round(0.62 * float(sb), 1)'
+    ' + round(0.5 * float(sh + sf), 1) - round(0.03 * float(so), 1)',
+    doc='Runs Created B factor'
+)
+register(
+    'rc2002_b',
+    'round(1.125 * float(single), 1) + round(1.69 * float(_2b), 1) + round(3.02 * float(_3b), 1)'
+    ' + round(3.73 * float(hr), 1) + round(0.29 * float(bb + hbp - ibb), 1)'
+    ' + round(0.492 * float(sf + sh + sb), 1) - round(0.04 * float(so), 1)',
+    doc='Runs Created(2002) B factor'
+)
+register(
+    'base_runs_b',
+    '(1.4 * tb - 0.6 * h - 3 * hr + 0.1 * (bb + hbp - ibb) + 0.9 * (sb - cs - gidp)) * 1.1',
+    doc='Base Runs B factor'
+)
+
+# batting
+register('avg', 'round(float(h) / float(ab), 3)', doc='Batting average', denominators=('ab', ))
+register('slg', 'round(float(tb) / float(ab), 3)', doc='Slugging', denominators=('ab', ))
+register('obp', 'round(float(tob) / float(obp_den), 3)', doc='On base percentage', denominators=('obp_den', ))
+register('ops', 'round((float(tb) / float(ab) + float(tob) / float(obp_den)), 3)', doc='On the base + slugging',
+         denominators=('ab', 'obp_den'))
+register('babip', 'round(float(h - hr) / float(ab - so - hr + sf), 3)', doc='Batting average on balls in play',
+         denominators=('ab - so - hr + sf', ))
+register('iso', 'round(float(tb - h) / float(ab), 3)', doc='Isolated power', denominators=('ab', ))
+register('bb_rate', 'round(float(bb) / float(pa), 3)', doc='Walk rate(BB%)', denominators=('pa', ))
+register('so_rate', 'round(float(so) / float(pa), 3)', doc='Strikeout rate(K%)', denominators=('pa', ))
+register(
+    'rc',
+    'round(round(rc_a + 2.4 * float(pa)) * (rc_b + 3.0 * float(pa)) / round(9.0 * float(pa), 1)'
+    ' - round(0.9 * float(pa), 1), 2)',
+    doc='Runs Created',
+    denominators=('pa', )
+)
+register(
+    'rc2002',
+    'round(round(rc_a + 2.4 * float(pa), 1) * (rc2002_b + 3.0 * float(pa)) / round(9.0 * float(pa), 1)'
+    ' - round(0.9 * float(pa), 1), 2)',
+    doc='Runs Created of 2002 ver.',
+    denominators=('pa', )
+)
+register('rc27', 'round(27 * rc / (ab - h + sh + sf + cs + gidp), 2)', doc='Runs created 27',
+         denominators=('ab - h + sh + sf + cs + gidp', ))
+register(
+    'base_runs',
+    '(h + bb + hbp - hr - (0.5 * ibb)) * round(base_runs_b / (base_runs_b + (ab - h + cs + gidp)), 3) + hr',
+    doc='Base Runs',
+    denominators=('base_runs_b + (ab - h + cs + gidp)', )
+)
+register('woba', _WOBA, constants=OrderedDict((k, None) for k in WOBA_MLB), doc='Weighted on-base average',
+         denominators=('woba_den', ))
+register('woba_mlb', _WOBA, constants=WOBA_MLB, doc='Weighted on-base average for MLB(wOBA)',
+         denominators=('woba_den', ))
+register('woba_npb', _WOBA, constants=WOBA_NPB, doc='Weighted on-base average for NPB(wOBA)',
+         denominators=('woba_den', ))
+register('wraa', 'round(((woba - lg_woba) / woba_scale) * float(pa), 1)', constants={'woba_scale': 1.24},
+         doc='Weighted Runs Above Average(wRAA)', denominators=('woba_scale', ))
+register('adam_dunn_batter', 'round(((float(hr) + float(bb) + float(so)) / pa) * 100, 1)',
+         doc='Adam dunn %(batter)', denominators=('pa', ))
@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from sabr import events
+from sabr.aggregate import PartialAggregate
+from sabr.registry import BATTING_STATS, PITCHING_STATS
+
+__author__ = 'Shinichi Nakagawa'
+
+DEFAULT_BATCH_SIZE = 4096
+
+# destination of a move: base 1-3, HOME(scores) or OUT; source 0 is the batter
+BATTER = 0
+HOME = 4
+OUT = 0
+
+# decoded play string: plate appearance outcome(or None), runner events((base, 'SB' or 'CS')),
+# moves(source base -> destination), unearned(source bases whose run is unearned)
+Decoded = namedtuple('Decoded', ('outcome', 'runner_events', 'moves', 'unearned'))
+
+Play = namedtuple('Play', ('game', 'inning', 'half', 'batter', 'pitcher', 'event', 'outs', 'bases', 'runs',
+                           'outs_on_play', 'batting', 'pitching'))
+
+_ADVANCE = re.compile(r'([B123])([-X])([123H])((?:\([^)]*\))*)')
+_FORCED = re.compile(r'\(([B123])\)')
+_BASE = {'B': BATTER, '1': 1, '2': 2, '3': 3, 'H': HOME}
+_WALKS = (events.WALK, events.INTENTIONAL_WALK, events.HIT_BY_PITCH)
+# pitcher increments per outcome, outs are counted from the play itself
+_PITCHING = {event: {k: v for k, v in deltas.items() if k != 'ip_outs'} for event, deltas in events.PITCHING.items()}
+# play strings repeat a lot over a season(K, 63/G, 8/F...), decoded ones are kept up to this many
+DECODE_CACHE_SIZE = 65536
+
+
+def _runner_event(text, moves, runner_events):
+    """
+    Decode a runner play(SB2, CS3(25), POCS2(14), PO1(E3), WP, PB...)
+    """
+    if text.startswith('SB'):
+        target = _BASE[text[2:3]]
+        moves[target - 1] = target
+        runner_events.append((target - 1, events.STOLEN_BASE))
+    elif text.startswith(('CS', 'POCS')):
+        code = text[4:] if text.startswith('POCS') else text[2:]
+        target = _BASE[code[:1]]
+        if 'E' in code:
+            moves[target - 1] = target
+        else:
+            moves[target - 1] = OUT
+            runner_events.append((target - 1, events.CAUGHT_STEALING))
+    elif text.startswith('PO'):
+        if 'E' not in text:
+            moves[_BASE[text[2:3]]] = OUT
+
+
+def _sacrifice(modifiers, outcome):
+    """
+    Sacrifice fly or hit when the play carries the SF/SH modifier: no at bat, even if the batter is safe
+    """
+    if 'SF' in modifiers:
+        return events.SACRIFICE_FLY
+    if 'SH' in modifiers:
+        return events.SACRIFICE_HIT
+    return outcome
+
+
+def decode(text):
+    """
+    Decode a Retrosheet play string
+    :param text: play string(e.g. 'S8/G.1-3', '64(1)3/GDP', 'K+SB2', 'W.3-H(UR);1-2')
+    :return: (Decoded) outcome, runner events, moves, unearned runs
+    """
+    text = text.replace('!', '').replace('#', '').replace('?', '')
+    main, _, advances = text.partition('.')
+    parts = main.split('/')
+    play, modifiers = parts[0], parts[1:]
+    primary, _, secondary = play.partition('+')
+    outcome, moves, runner_events, unearned = None, {}, [], set()
+    if primary.startswith('HP'):
+        outcome, moves[BATTER] = events.HIT_BY_PITCH, 1
+    elif primary.startswith('HR') or primary.startswith('H') and not primary[1:2].isalpha():
+        outcome, moves[BATTER] = events.HOME_RUN, HOME
+    elif primary.startswith('S') and not primary.startswith('SB'):
+        outcome, moves[BATTER] = events.SINGLE, 1
+    elif primary.startswith('D') and not primary.startswith('DI'):
+        outcome, moves[BATTER] = events.DOUBLE, 2
+    elif primary.startswith('T'):
+        outcome, moves[BATTER] = events.TRIPLE, 3
+    elif primary.startswith('IW') or primary == 'I':
+        outcome, moves[BATTER] = events.INTENTIONAL_WALK, 1
+    elif primary.startswith('W') and not primary.startswith('WP'):
+        outcome, moves[BATTER] = events.WALK, 1
+    elif primary.startswith('K'):
+        outcome, moves[BATTER] = events.STRIKEOUT, OUT
+    elif primary.startswith('FC'):
+        outcome, moves[BATTER] = _sacrifice(modifiers, events.FIELDERS_CHOICE), 1
+    elif primary.startswith('E'):
+        outcome, moves[BATTER] = _sacrifice(modifiers, events.ERROR), 1
+    elif primary.startswith('C') and not primary.startswith('CS'):
+        # catcher interference: batter awarded first, no at bat
+        moves[BATTER] = 1
+    elif primary[:1].isdigit():
+        forced = _FORCED.findall(primary)
+        for base in forced:
+            moves[_BASE[base]] = OUT
+        if 'E' in primary:
+            outcome, moves[BATTER] = _sacrifice(modifiers, events.ERROR), 1
+        else:
+            if BATTER not in moves:
+                moves[BATTER] = OUT if primary[-1].isdigit() else 1
+            if any(m.startswith(('GDP', 'GTP')) for m in modifiers) and not {'SF', 'SH'} & set(modifiers):
+                outcome = events.DOUBLE_PLAY
+            else:
+                outcome = _sacrifice(modifiers, events.OUT)
+    elif not primary.startswith('FLE'):
+        for item in primary.split(';'):
+            _runner_event(item, moves, runner_events)
+    for item in secondary.split(';') if secondary else ():
+        _runner_event(item, moves, runner_events)
+    for advance in advances.split(';') if advances else ():
+        match = _ADVANCE.match(advance)
+        if match is None:
+            continue
+        source, kind, target, notes = match.groups()
+        safe = kind == '-' or any('E' in note for note in re.findall(r'\(([^)]*)\)', notes))
+        moves[_BASE[source]] = _BASE[target] if safe else OUT
+        if 'UR' in notes:
+            unearned.add(_BASE[source])
+    return Decoded(outcome, tuple(runner_events), moves, frozenset(unearned))
+
+
+def read(source):
+    """
+    Event file records, read lazily
+    :param source: path, text file object or iterable of lines
+    :return: (generator) list of fields per record
+    """
+    if isinstance(source, str):
+        with io.open(source, encoding='latin-1', newline='') as f:
+            for record in csv.reader(f):
+                if record:
+                    yield record
+    else:
+        for record in csv.reader(source):
+            if record:
+                yield record
+
+
+class _Game(object):
+    """
+    State of the game being parsed
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.pitchers = {0: None, 1: None}
+        self.lineups = {0: {}, 1: {}}
+        self.half = None
+        self.outs = 0
+        # (runner, responsible pitcher) per base
+        self.bases = [None, None, None]
+
+    def substitute(self, player, team, order, position):
+        if position == 1:
+            self.pitchers[team] = player
+        replaced = self.lineups[team].get(order)
+        self.lineups[team][order] = player
+        if position == 12 and replaced is not None:
+            # pinch runner takes the base of the player he replaces
+            for i, runner in enumerate(self.bases):
+                if runner is not None and runner[0] == replaced:
+                    self.bases[i] = (player, runner[1])
+
+
+def _credit(table, player, increments):
+    counters = table.setdefault(player, {})
+    for field, delta in increments.items():
+        counters[field] = counters.get(field, 0) + delta
+
+
+def plays(records):
+    """
+    Decode play records into base-out transitions and counting stat increments
+    :param records: event file records(read())
+    :return: (generator) Play per play record(NP plays are skipped)
+    """
+    game, cache = None, {}
+    for record in records:
+        kind = record[0]
+        if kind == 'id':
+            game = _Game(record[1])
+        elif kind in ('start', 'sub') and game is not None:
+            game.substitute(record[1], int(record[3]), int(record[4]), int(record[5]))
+        elif kind == 'play' and game is not None:
+            text = record[6]
+            if text == 'NP':
+                continue
+            inning, team, batter = int(record[1]), int(record[2]), record[3]
+            if game.half != (inning, team):
+                game.half, game.outs, game.bases = (inning, team), 0, [None, None, None]
+            pitcher = game.pitchers[1 - team]
+            decoded = cache.get(text)
+            if decoded is None:
+                decoded = decode(text)
+                if len(cache) < DECODE_CACHE_SIZE:
+                    cache[text] = decoded
+            outs, bases = game.outs, sum(1 << i for i, runner in enumerate(game.bases) if runner is not None)
+            moves = decoded.moves
+            if decoded.outcome in _WALKS or (decoded.outcome is None and moves.get(BATTER) == 1):
+                # runners forced by the batter taking first, when the advances leave them out
+                moves = dict(moves)
+                for base in (1, 2, 3):
+                    if game.bases[base - 1] is None:
+                        break
+                    moves.setdefault(base, base + 1)
+            batting, pitching = {}, {}
+            after, made, runs = [None, None, None], 0, 0
+            for source in (3, 2, 1, BATTER):
+                if source == BATTER:
+                    runner = (batter, pitcher) if BATTER in moves else None
+                else:
+                    runner = game.bases[source - 1]
+                if runner is None:
+                    continue
+                target = moves.get(source, source)
+                if target == OUT:
+                    made += 1
+                elif target == HOME:
+                    runs += 1
+                    _credit(batting, runner[0], {'r': 1})
+                    earned = 0 if source in decoded.unearned else 1
+                    _credit(pitching, runner[1], {'r': 1, 'er': earned})
+                else:
+                    after[target - 1] = runner
+            if decoded.outcome is not None:
+                _credit(batting, batter, events.BATTING[decoded.outcome])
+                _credit(pitching, pitcher, _PITCHING[decoded.outcome])
+            for base, code in decoded.runner_events:
+                runner = game.bases[base - 1]
+                if runner is not None:
+                    _credit(batting, runner[0], events.BATTING[code])
+            if made:
+                _credit(pitching, pitcher, {'ip_outs': made})
+            game.outs, game.bases = outs + made, after
+            event = decoded.outcome or (decoded.runner_events[0][1] if decoded.runner_events else events.OTHER)
+            yield Play(game.game, inning, team, batter, pitcher, event, outs, bases, runs, made, batting, pitching)
+
+
+def _table(credits, fields):
+    players = list(credits)
+    table = {'player': np.array(players, dtype=object)}
+    for field in fields:
+        table[field] = np.array([credits[player].get(field, 0) for player in players], dtype=np.int64)
+    return table
+
+
+def batches(records, size=DEFAULT_BATCH_SIZE):
+    """
+    Plays in column batches
+    Only one batch is held at a time, so a season streams in bounded memory. Batches end at
+    half-inning boundaries(RunExpectancy.add needs whole half-innings), so one can run over
+    size by the rest of the half-inning in progress.
+    :param records: event file records(read())
+    :param size: plays per batch, at least(default:4096)
+    :return: (generator) dict with 'plays'(game, half_inning, inning, batter, pitcher, event, outs, bases,
+             runs, outs_on_play columns, ready for sabr.run_expectancy) and 'batting'/'pitching'
+             (player + counting stat increments summed over the batch, ready for PartialAggregate.update)
+    """
+    columns, batting, pitching, key, half_inning = [], {}, {}, None, -1
+    for play in plays(records):
+        if (play.game, play.inning, play.half) != key:
+            if len(columns) >= size:
+                yield _batch(columns, batting, pitching)
+                columns, batting, pitching = [], {}, {}
+            key, half_inning = (play.game, play.inning, play.half), half_inning + 1
+        columns.append((play.game, half_inning, play.inning, play.batter, play.pitcher, play.event, play.outs,
+                        play.bases, play.runs, play.outs_on_play))
+        for player, increments in play.batting.items():
+            _credit(batting, player, increments)
+        for player, increments in play.pitching.items():
+            _credit(pitching, player, increments)
+    if columns:
+        yield _batch(columns, batting, pitching)
+
+
+def _batch(columns, batting, pitching):
+    names = ('game', 'half_inning', 'inning', 'batter', 'pitcher', 'event', 'outs', 'bases', 'runs', 'outs_on_play')
+    values = list(zip(*columns))
+    table = {}
+    for name, column in zip(names, values):
+        table[name] = np.array(column, dtype=object if name in ('game', 'batter', 'pitcher') else None)
+    return {
+        'plays': table,
+        'batting': _table(batting, BATTING_STATS),
+        'pitching': _table(pitching, PITCHING_STATS),
+    }
+
+
+def aggregate(source, size=DEFAULT_BATCH_SIZE):
+    """
+    Season totals of an event file
+    :param source: path, text file object or iterable of lines
+    :param size: plays per batch
+    :return: (PartialAggregate, PartialAggregate) batting and pitching totals keyed by (player, )
+    """
+    batting, pitching = PartialAggregate(BATTING_STATS), PartialAggregate(PITCHING_STATS)
+    for batch in batches(read(source), size):
+        batting.update(batch['batting'], by=('player', ))
+        pitching.update(batch['pitching'], by=('player', ))
+    return batting, pitching
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from sabr import events
+from sabr.evaluator import compute
+from sabr.registry import WOBA_MLB
+
+__author__ = 'Shinichi Nakagawa'
+
+# event codes, an event column may hold the codes or their index in this tuple
+# (OTHER plays count for the base-out transitions only, they get no linear weight)
+EVENTS = events.PLATE_APPEARANCES + events.RUNNER_EVENTS + events.OTHER_EVENTS
+# base-out states: outs * 8 + bases(bit 1: first, 2: second, 4: third), END is the inning over
+STATES = 24
+END = 24
+
+# outs the linear weights are measured against
+OUTS = (events.STRIKEOUT, events.OUT, events.DOUBLE_PLAY, events.FIELDERS_CHOICE)
+
+# wOBA constant -> event
+WOBA_EVENTS = OrderedDict((
+    ('const_u_bb', events.WALK),
+    ('const_u_hbp', events.HIT_BY_PITCH),
+    ('const_u_e_bb', events.ERROR),
+    ('const_u_1b', events.SINGLE),
+    ('const_u_2b', events.DOUBLE),
+    ('const_u_3b', events.TRIPLE),
+    ('const_u_hr', events.HOME_RUN),
+))
+
+LinearWeights = namedtuple('LinearWeights', ('season', 'runs', 'woba', 'woba_scale', 'lg_obp', 'lg_woba'))
+
+_ORDER = np.argsort(EVENTS)
+_SORTED = np.array(EVENTS)[_ORDER]
+_PLATE_APPEARANCE = np.array([event in events.PLATE_APPEARANCES for event in EVENTS])
+
+
+def encode(values, games=None):
+    """
+    Event codes to indexes into EVENTS
+    :param values: event column(codes like '1B' or indexes)
+    :param games: game id column, named in the error for an unknown code(default:None)
+    :return: (ndarray) int64 indexes
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu':
+        return values.astype(np.int64)
+    positions = np.searchsorted(_SORTED, values)
+    positions = np.minimum(positions, len(_SORTED) - 1)
+    unknown = _SORTED[positions] != values
+    if unknown.any():
+        row = int(np.flatnonzero(unknown)[0])
+        where = 'row {}'.format(row) if games is None else 'game {}, row {}'.format(games[row], row)
+        raise ValueError('unknown event: {!r} at {}'.format(values[row:row + 1].tolist()[0], where))
+    return _ORDER[positions].astype(np.int64)
+
+
+class RunExpectancy(object):
+    """
+    Run expectancy(RE24) and linear weights engine
+    Play-by-play chunks are reduced with bincount into per-season sums: runs to the end of
+    the half-inning per base-out state and (event, start state, end state) transition counts.
+    The RE24 matrix and the run value of every event are read from the sums, so seasons can
+    be fed in any number of chunks(each holding whole half-innings). Weights are cached per
+    season until that season gets more data.
+    """
+
+    def __init__(self):
+        self._sums = {}
+        self._cache = {}
+
+    def seasons(self):
+        """
+        :return: (list) seasons with data
+        """
+        return sorted(self._sums)
+
+    def add(self, season, half_innings, outs, bases, runs, event, outs_on_play=None, games=None):
+        """
+        Add play-by-play events of one season, in game order
+        :param season: season
+        :param half_innings: half-inning id per event(rows of a half-inning are contiguous)
+        :param outs: outs before the event(0-2)
+        :param bases: runners before the event(bit 1: first, 2: second, 4: third)
+        :param runs: runs scored on the event
+        :param event: event code or EVENTS index
+        :param outs_on_play: outs made on the event, half-innings that do not end with 3 outs
+                             (walk-offs, rain) are left out of the RE24 averages(default:None, keep every one)
+        :param games: game id per event, named in the error for an unknown event code(default:None)
+        """
+        half_innings = np.asarray(half_innings)
+        size = len(half_innings)
+        if not size:
+            return
+        state = np.asarray(outs, dtype=np.int64) * 8 + np.asarray(bases, dtype=np.int64)
+        runs = np.asarray(runs, dtype=np.int64)
+        code = encode(event, games)
+        first = np.r_[True, half_innings[1:] != half_innings[:-1]]
+        last = np.r_[first[1:], True]
+        group = np.cumsum(first) - 1
+        # runs from the start of the event to the end of its half-inning
+        before = np.cumsum(runs) - runs
+        rest = np.bincount(group, weights=runs)[group] - (before - before[first][group])
+        following = np.r_[state[1:], END]
+        following[last] = END
+        counted = _PLATE_APPEARANCE[code]
+        if outs_on_play is not None:
+            complete = (np.asarray(outs, dtype=np.int64) + np.asarray(outs_on_play, dtype=np.int64))[last] == 3
+            counted = counted & complete[group]
+        sums = self._sums.get(season)
+        if sums is None:
+            sums = {
+                'state_runs': np.zeros(STATES),
+                'state_count': np.zeros(STATES, dtype=np.int64),
+                'transitions': np.zeros((len(EVENTS), STATES, STATES + 1), dtype=np.int64),
+                'event_runs': np.zeros(len(EVENTS), dtype=np.int64),
+                'event_count': np.zeros(len(EVENTS), dtype=np.int64),
+            }
+            self._sums[season] = sums
+        sums['state_runs'] += np.bincount(state[counted], weights=rest[counted], minlength=STATES)
+        sums['state_count'] += np.bincount(state[counted], minlength=STATES)
+        transitions = (code * STATES + state) * (STATES + 1) + following
+        sums['transitions'] += np.bincount(transitions, minlength=sums['transitions'].size).reshape(
+            sums['transitions'].shape)
+        sums['event_runs'] += np.bincount(code, weights=runs, minlength=len(EVENTS)).astype(np.int64)
+        sums['event_count'] += np.bincount(code, minlength=len(EVENTS))
+        self._cache.pop(season, None)
+
+    def matrix(self, season):
+        """
+        RE24 matrix
+        :param season: season
+        :return: (ndarray) (3 outs, 8 base states) expected runs to the end of the half-inning(NaN: unseen state)
+        """
+        sums = self._sums[season]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (sums['state_runs'] / sums['state_count']).reshape(3, 8)
+
+    def weights(self, season):
+        """
+        Linear weights and wOBA constants of a season
+        :param season: season
+        :return: (LinearWeights) run value per event, const_u_* weights scaled so league wOBA equals
+                 league OBP, wOBA scale, league OBP and wOBA
+        """
+        weights = self._cache.get(season)
+        if weights is None:
+            weights = self._derive(season)
+            self._cache[season] = weights
+        return weights
+
+    def constants(self, season):
+        """
+        Constants profile for sabr.evaluator / sabr.compiler('woba', 'wraa')
+        :param season: season
+        :return: (dict) const_u_* weights and woba_scale
+        """
+        weights = self.weights(season)
+        constants = OrderedDict(weights.woba)
+        constants['woba_scale'] = weights.woba_scale
+        return constants
+
+    def _derive(self, season):
+        sums = self._sums[season]
+        expectancy = np.r_[np.nan_to_num(self.matrix(season).reshape(-1)), 0.0]
+        transitions = sums['transitions']
+        # sum over transitions of RE(end) - RE(start), plus the runs scored
+        values = transitions.dot(expectancy).sum(axis=1) - transitions.sum(axis=2).dot(expectancy[:STATES])
+        values = values + sums['event_runs']
+        count = sums['event_count']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            run_values = values / count
+        runs = OrderedDict(
+            (event, run_values[i].item()) for i, event in enumerate(EVENTS) if event not in events.OTHER_EVENTS)
+        outs = [EVENTS.index(event) for event in OUTS]
+        out = values[outs].sum() / count[outs].sum() if count[outs].sum() else 0.0
+        raw = OrderedDict()
+        for constant, event in WOBA_EVENTS.items():
+            raw[constant] = runs[event] - out if count[EVENTS.index(event)] else 0.0
+        totals = dict.fromkeys(('ab', 'h', '_2b', '_3b', 'hr', 'bb', 'ibb', 'hbp', 'sf', 'sh', 'so'), 0)
+        for i, event in enumerate(EVENTS):
+            for field, delta in events.BATTING[event].items():
+                if field in totals:
+                    totals[field] += int(count[i]) * delta
+        totals['e_bb'] = int(count[EVENTS.index(events.ERROR)])
+        denominator = totals['ab'] + totals['bb'] - totals['ibb'] + totals['hbp'] + totals['sf']
+        if not denominator:
+            nan = float('nan')
+            return LinearWeights(season, runs, OrderedDict((k, nan) for k in WOBA_MLB), nan, nan, nan)
+        numerator = sum(raw[constant] * count[EVENTS.index(event)] for constant, event in WOBA_EVENTS.items())
+        lg_obp = compute(['obp'], totals)['obp']
+        scale = lg_obp / (numerator / denominator)
+        woba = OrderedDict((constant, raw[constant] * scale) for constant in WOBA_MLB)
+        lg_woba = compute(['woba'], totals, woba)['woba']
+        return LinearWeights(season, runs, woba, scale, lg_obp, lg_woba)
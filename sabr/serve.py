@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Micro-batching stats service
+
+    $ python -m sabr.serve --port 8080 --max-batch 256 --max-delay-ms 2
+    $ curl -d '{"metrics": ["avg", "ops"], "data": {"ab": 500, "h": 150, ...}}' localhost:8080/stats
+    $ curl localhost:8080/metrics
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from sabr.evaluator import compute
+
+__author__ = 'Shinichi Nakagawa'
+
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_DELAY = 0.002
+DEFAULT_MAX_PENDING = 10000
+# latencies kept for the percentiles
+LATENCY_WINDOW = 10000
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+
+class Overloaded(Exception):
+    """
+    Pending queue is full(backpressure), the caller should retry later
+    """
+    pass
+
+
+def _json(value):
+    # NaN / inf(0 denominators) are not JSON
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class MicroBatcher(object):
+    """
+    Request coalescing
+    Requests wait in a bounded queue. The worker takes the first one, keeps collecting until
+    max_batch requests or max_delay seconds, evaluates requests of the same shape(input
+    columns, constants) as one batch and fans the values back out to the callers.
+    """
+
+    def __init__(self, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY, max_pending=DEFAULT_MAX_PENDING):
+        """
+        :param max_batch: requests per batch(default:256)
+        :param max_delay: seconds the first request of a batch waits for others(default:0.002)
+        :param max_pending: queued requests before Overloaded is raised(default:10000)
+        """
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.counters = OrderedDict((k, 0) for k in ('requests', 'rejected', 'errors', 'batches', 'evaluations'))
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._queue = None
+        self._full = None
+        self._task = None
+
+    async def start(self):
+        """
+        Start the worker on the running loop
+        """
+        self._queue = asyncio.Queue(self.max_pending)
+        self._full = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """
+        Stop the worker, queued requests are cancelled
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue is not None and not self._queue.empty():
+            self._queue.get_nowait()[3].cancel()
+
+    async def submit(self, metrics, data, constants=None):
+        """
+        Queue a request and wait for its values
+        :param metrics: metric names
+        :param data: mapping of counting stats, scalars(one row) or lists(rows)
+        :param constants: constant overrides
+        :return: (dict) metric -> value(or list of values)
+        """
+        if self._task is None:
+            # nothing would take the request off the queue
+            raise RuntimeError('service not started: await start() first')
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((list(metrics), data, constants or {}, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.counters['rejected'] += 1
+            raise Overloaded('{} requests pending'.format(self.max_pending))
+        if self._queue.qsize() >= self.max_batch:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                while len(batch) < self.max_batch and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                remaining = deadline - loop.time()
+                if len(batch) >= self.max_batch or remaining <= 0:
+                    break
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                self._evaluate(batch)
+            except Exception as e:
+                for request in batch:
+                    self._fail(request, e)
+
+    def _evaluate(self, batch):
+        self.counters['batches'] += 1
+        groups = OrderedDict()
+        for request in batch:
+            metrics, data, constants, future, _ = request
+            if future.cancelled():
+                continue
+            try:
+                key = (tuple(sorted(data)), tuple(sorted(constants.items())))
+                hash(key)
+            except (AttributeError, TypeError) as e:
+                self._fail(request, TypeError('data and constants must be objects of scalars or lists: {}'.format(e)))
+                continue
+            groups.setdefault(key, []).append(request)
+        for (names, constants), requests in groups.items():
+            try:
+                self._group(names, dict(constants), requests)
+            except Exception:
+                # a bad request fails the whole batch: evaluate one by one to find it
+                for request in requests:
+                    if request[3].done():
+                        continue
+                    try:
+                        self._group(names, dict(constants), [request])
+                    except Exception as e:
+                        self._fail(request, e)
+
+    def _group(self, names, constants, requests):
+        self.counters['evaluations'] += 1
+        metrics, sizes, columns = [], [], {name: [] for name in names}
+        for request in requests:
+            for metric in request[0]:
+                if metric not in metrics:
+                    metrics.append(metric)
+            values = {name: np.atleast_1d(np.asarray(request[1][name])) for name in names}
+            size = len(values[names[0]]) if names else 1
+            if any(value.ndim != 1 or len(value) != size for value in values.values()):
+                if len(requests) > 1:
+                    raise ValueError('ragged request')
+                self._fail(request, ValueError('data columns must be scalars or lists of one length'))
+                return
+            sizes.append(size)
+            for name in names:
+                columns[name].append(values[name])
+        try:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = compute(metrics, {name: np.concatenate(columns[name]) for name in names}, constants)
+        except Exception as e:
+            if len(requests) > 1:
+                raise
+            self._fail(requests[0], e)
+            return
+        now, offset = time.perf_counter(), 0
+        for request, size in zip(requests, sizes):
+            scalar = all(np.ndim(request[1][name]) == 0 for name in names)
+            result = OrderedDict()
+            for metric in request[0]:
+                column = np.asarray(values[metric])[offset:offset + size].tolist()
+                result[metric] = _json(column[0]) if scalar else [_json(v) for v in column]
+            offset += size
+            if not request[3].done():
+                request[3].set_result(result)
+            self.counters['requests'] += 1
+            self._latencies.append(now - request[4])
+
+    def _fail(self, request, error):
+        if not request[3].done():
+            self.counters['errors'] += 1
+            request[3].set_exception(error)
+
+    def stats(self):
+        """
+        Counters and latency percentiles
+        :return: (OrderedDict) counters, pending, mean batch size, p50/p99 latency in milliseconds
+        """
+        stats = OrderedDict(self.counters)
+        stats['pending'] = self._queue.qsize() if self._queue is not None else 0
+        stats['mean_batch'] = float(stats['requests']) / stats['batches'] if stats['batches'] else 0.0
+        if self._latencies:
+            p50, p99 = np.percentile(np.array(self._latencies) * 1000.0, [50, 99])
+            stats['p50_ms'], stats['p99_ms'] = float(p50), float(p99)
+        else:
+            stats['p50_ms'] = stats['p99_ms'] = None
+        return stats
+
+
+class Service(object):
+    """
+    JSON endpoints over a MicroBatcher
+        POST /stats    {"metrics": [...], "data": {...}, "constants": {...}} -> {"results": {...}}
+        GET  /metrics  counters and latency percentiles
+    """
+
+    def __init__(self, batcher=None):
+        """
+        :param batcher: MicroBatcher(default:None, default settings)
+        """
+        self.batcher = MicroBatcher() if batcher is None else batcher
+
+    async def handle(self, method, path, body=b''):
+        """
+        Handle one request
+        /stats raises RuntimeError until the batcher is started(serve() or Client)
+        :param method: HTTP method
+        :param path: request path
+        :param body: request body(bytes)
+        :return: (int, dict) status, JSON payload
+        """
+        path = path.split('?', 1)[0]
+        if path == '/metrics':
+            if method != 'GET':
+                return 405, {'error': 'use GET'}
+            return 200, self.batcher.stats()
+        if path != '/stats':
+            return 404, {'error': 'not found: {}'.format(path)}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}
+        try:
+            request = json.loads(body.decode('utf-8') if isinstance(body, bytes) else body)
+            metrics, data = request['metrics'], request.get('data', {})
+            if isinstance(metrics, str) or not isinstance(data, dict):
+                raise ValueError('metrics must be a list, data an object')
+            results = await self.batcher.submit(metrics, data, request.get('constants'))
+        except Overloaded as e:
+            return 503, {'error': str(e)}
+        except (KeyError, ValueError, TypeError) as e:
+            return 400, {'error': '{}: {}'.format(type(e).__name__, e)}
+        return 200, {'results': results}
+
+    async def connection(self, reader, writer):
+        """
+        HTTP/1.1 connection handler(keep-alive, Content-Length bodies)
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path = line.decode('latin-1').split()[:2]
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, payload = await self.handle(method, path, body)
+                content = json.dumps(payload).encode('utf-8')
+                writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n\r\n'.format(
+                    status, REASONS.get(status, ''), len(content)).encode('latin-1') + content)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        """
+        Start the batcher and listen
+        :param host: bind address(default:127.0.0.1)
+        :param port: port(default:8080, 0 picks a free one)
+        :return: (asyncio.Server) server
+        """
+        await self.batcher.start()
+        return await asyncio.start_server(self.connection, host, port)
+
+
+class Client(object):
+    """
+    In-process client: same JSON handling as the HTTP endpoints without a socket
+
+        async with Client(Service()) as client:
+            status, payload = await client.post('/stats', {'metrics': ['avg'], 'data': {'h': 3, 'ab': 10}})
+    """
+
+    def __init__(self, service=None):
+        """
+        :param service: Service(default:None, default settings)
+        """
+        self.service = Service() if service is None else service
+
+    async def __aenter__(self):
+        await self.service.batcher.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.service.batcher.stop()
+
+    async def post(self, path, payload):
+        """
+        :param path: request path
+        :param payload: JSON-serializable request
+        :return: (int, dict) status, JSON payload
+        """
+        status, result = await self.service.handle('POST', path, json.dumps(payload).encode('utf-8'))
+        return status, json.loads(json.dumps(result))
+
+    async def get(self, path):
+        """
+        :param path: request path
+        :return: (int, dict) status, JSON payload
+        """
+        status, result = await self.service.handle('GET', path)
+        return status, json.loads(json.dumps(result))
+
+    async def stats(self, metrics, data, constants=None):
+        """
+        Metric values of a request
+        :param metrics: metric names
+        :param data: mapping of counting stats
+        :param constants: constant overrides
+        :return: (dict) metric -> value
+        """
+        status, payload = await self.post('/stats', {'metrics': metrics, 'data': data, 'constants': constants})
+        if status != 200:
+            raise (Overloaded if status == 503 else ValueError)(payload['error'])
+        return payload['results']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sabr.serve', description='sabr micro-batching stats service')
+    parser.add_argument('--host', default='127.0.0.1', help='bind address')
+    parser.add_argument('--port', type=int, default=8080, help='port')
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH, help='requests per batch')
+    parser.add_argument('--max-delay-ms', type=float, default=DEFAULT_MAX_DELAY * 1000.0,
+                        help='milliseconds a request waits for its batch')
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help='queued requests before 503 responses')
+    args = parser.parse_args(argv)
+    service = Service(MicroBatcher(args.max_batch, args.max_delay_ms / 1000.0, args.max_pending))
+
+    async def run():
+        server = await service.serve(args.host, args.port)
+        sys.stdout.write('serving on {}\n'.format(', '.join(str(s.getsockname()) for s in server.sockets)))
+        sys.stdout.flush()
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sabr import events
+from sabr.bootstrap import OUTCOMES, outcomes
+from sabr.league import BATTING
+
+__author__ = 'Shinichi Nakagawa'
+
+DEFAULT_INNINGS = 9
+DEFAULT_GAMES = 10000
+# games played side by side, the state arrays of a chunk stay in cache
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# simulated plate appearance outcomes
+EVENTS = (events.OUT, events.WALK, events.SINGLE, events.DOUBLE, events.TRIPLE, events.HOME_RUN)
+# batting outcome(sabr.bootstrap.OUTCOMES) -> simulated event
+_EVENT = {
+    'single': events.SINGLE, '_2b': events.DOUBLE, '_3b': events.TRIPLE, 'hr': events.HOME_RUN,
+    'ubb': events.WALK, 'ibb': events.WALK, 'hbp': events.WALK,
+    'so': events.OUT, 'sf': events.OUT, 'sh': events.OUT, 'out': events.OUT,
+}
+# bases advanced by the batter on a hit(runners advance one more base on a single or double)
+_HITS = {events.SINGLE: 1, events.DOUBLE: 2, events.TRIPLE: 3, events.HOME_RUN: 4}
+
+
+def _transitions():
+    """
+    (event, bases) -> bases after, runs scored; bases bit 1: first, 2: second, 4: third
+    """
+    following = np.zeros((len(EVENTS), 8), dtype=np.int64)
+    runs = np.zeros((len(EVENTS), 8), dtype=np.int64)
+    for e, event in enumerate(EVENTS):
+        for bases in range(8):
+            runners = [base for base in (1, 2, 3) if bases & (1 << (base - 1))]
+            if event == events.OUT:
+                targets = runners
+            elif event == events.WALK:
+                targets, forced = [], 1
+                for base in (1, 2, 3):
+                    if base not in runners:
+                        break
+                    forced = base + 1
+                targets = [base + 1 if base < forced else base for base in runners] + [1]
+            else:
+                advance = _HITS[event]
+                targets = [base + advance + 1 for base in runners] + [advance]
+            following[e, bases] = sum(1 << (base - 1) for base in targets if base < 4)
+            runs[e, bases] = sum(1 for base in targets if base >= 4)
+    return following, runs
+
+
+FOLLOWING, RUNS = _transitions()
+OUTS = np.array([1 if event == events.OUT else 0 for event in EVENTS], dtype=np.int64)
+
+
+def profiles(table):
+    """
+    Plate appearance outcome probabilities per player
+    :param table: mapping of batting counting stat columns(ab, h, _2b, _3b, hr, bb, ibb, hbp, sf, sh, so)
+    :return: (ndarray) (players, EVENTS) probabilities(a player without a plate appearance always makes an out)
+    """
+    counts = outcomes(table, BATTING)
+    grouped = np.zeros((len(counts), len(EVENTS)))
+    for i, outcome in enumerate(OUTCOMES[BATTING]):
+        grouped[:, EVENTS.index(_EVENT[outcome])] += counts[:, i]
+    trials = grouped.sum(axis=1)
+    grouped[trials == 0, EVENTS.index(events.OUT)] = 1.0
+    return grouped / np.maximum(trials, 1)[:, None]
+
+
+def _lineup(probabilities, lineup):
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    lineup = np.asarray(lineup, dtype=np.int64)
+    if not len(lineup):
+        raise ValueError('empty lineup')
+    probabilities = probabilities[lineup]
+    if not np.any(probabilities.dot(OUTS) > 0):
+        # an inning would never end
+        raise ValueError('no batter of the lineup can make an out: {}'.format(lineup.tolist()))
+    return probabilities
+
+
+def _simulate(probabilities, games, innings, seed):
+    """
+    Simulate games side by side: one lane per game, lanes leave the arrays when their game is over
+    """
+    rng = np.random.default_rng(seed)
+    cumulative = np.cumsum(probabilities, axis=1)
+    cumulative[:, -1] = np.inf
+    cumulative = cumulative[:, :-1]
+    size = len(probabilities)
+    total = np.zeros(games, dtype=np.int64)
+    lane = np.arange(games)
+    outs = np.zeros(games, dtype=np.int64)
+    bases = np.zeros(games, dtype=np.int64)
+    batter = np.zeros(games, dtype=np.int64)
+    inning = np.zeros(games, dtype=np.int64)
+    runs = np.zeros(games, dtype=np.int64)
+    while len(lane):
+        event = (rng.random(len(lane))[:, None] >= cumulative[batter]).sum(axis=1)
+        runs += RUNS[event, bases]
+        bases = FOLLOWING[event, bases]
+        outs += OUTS[event]
+        batter += 1
+        batter[batter == size] = 0
+        over = outs == 3
+        if over.any():
+            outs[over] = 0
+            bases[over] = 0
+            inning += over
+            done = inning == innings
+            if done.any():
+                total[lane[done]] = runs[done]
+                keep = ~done
+                lane, outs, bases, batter, inning, runs = (
+                    lane[keep], outs[keep], bases[keep], batter[keep], inning[keep], runs[keep])
+    return total
+
+
+def simulate(probabilities, lineup, games=DEFAULT_GAMES, innings=DEFAULT_INNINGS, seed=None,
+             chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Monte Carlo runs per game of a lineup
+    Games run side by side as base-out state arrays, chunk_size games at a time; chunks get
+    child seeds of one SeedSequence so the result depends on the seed only.
+    :param probabilities: (players, EVENTS) probabilities(profiles())
+    :param lineup: batting order as row indexes of probabilities
+    :param games: games to play(default:10000)
+    :param innings: innings per game, every one is played(default:9; 1 gives runs per inning)
+    :param seed: RNG seed(int or numpy SeedSequence)
+    :param chunk_size: games per chunk(default:65536)
+    :return: (ndarray) runs per game
+    """
+    probabilities = _lineup(probabilities, lineup)
+    sizes = [min(chunk_size, games - start) for start in range(0, games, chunk_size)]
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(len(sizes))
+    if not sizes:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate([_simulate(probabilities, size, innings, child) for size, child in zip(sizes, seeds)])
+
+
+def _solve(probabilities):
+    """
+    Absorbing chain over (outs, bases, batter): expected runs to the end of the inning and the
+    probability of each next-inning leadoff hitter, from every state
+    """
+    size = len(probabilities)
+    states = 24 * size
+    outs, bases, batter, event = (a.ravel() for a in np.meshgrid(
+        np.arange(3), np.arange(8), np.arange(size), np.arange(len(EVENTS)), indexing='ij'))
+    p = probabilities[batter, event]
+    state = (outs * 8 + bases) * size + batter
+    following = (batter + 1) % size
+    after = outs + OUTS[event]
+    over = after == 3
+    reward = np.bincount(state, weights=p * RUNS[event, bases], minlength=states)
+    absorbed = np.bincount(state[over] * size + following[over], weights=p[over], minlength=states * size)
+    target = (after * 8 + FOLLOWING[event, bases]) * size + following
+    transient = np.bincount(state[~over] * states + target[~over], weights=p[~over], minlength=states * states)
+    system = np.eye(states) - transient.reshape(states, states)
+    solution = np.linalg.solve(system, np.column_stack([reward, absorbed.reshape(states, size)]))
+    return solution[:size, 0], solution[:size, 1:]
+
+
+def inning_runs(probabilities, lineup):
+    """
+    Exact expected runs per inning(Markov chain solver)
+    :param probabilities: (players, EVENTS) probabilities(profiles())
+    :param lineup: batting order as row indexes of probabilities
+    :return: (ndarray) expected runs of an inning led off by each lineup slot
+    """
+    probabilities = _lineup(probabilities, lineup)
+    return _solve(probabilities)[0]
+
+
+def expected_runs(probabilities, lineup, innings=DEFAULT_INNINGS):
+    """
+    Exact expected runs per game(Markov chain solver, the leadoff slot is carried from inning to inning)
+    :param probabilities: (players, EVENTS) probabilities(profiles())
+    :param lineup: batting order as row indexes of probabilities
+    :param innings: innings per game(default:9)
+    :return: (float) expected runs per game
+    """
+    probabilities = _lineup(probabilities, lineup)
+    runs, leadoff = _solve(probabilities)
+    distribution = np.zeros(len(runs))
+    distribution[0] = 1.0
+    total = 0.0
+    for _ in range(innings):
+        total += distribution.dot(runs)
+        distribution = distribution.dot(leadoff)
+    return float(total)
+
+
+def _evaluate(task):
+    """
+    Worker: runs per game of a chunk of lineups
+    """
+    probabilities, lineups, method, games, innings, seeds = task
+    if method == 'exact':
+        return [expected_runs(probabilities, lineup, innings) for lineup in lineups]
+    return [float(simulate(probabilities, lineup, games, innings, seed).mean()) for lineup, seed in zip(lineups, seeds)]
+
+
+def search(probabilities, lineups, method='exact', games=DEFAULT_GAMES, innings=DEFAULT_INNINGS, seed=None, workers=1,
+           chunk_size=64):
+    """
+    Runs per game of many lineups(e.g. itertools.permutations of nine players)
+    :param probabilities: (players, EVENTS) probabilities(profiles())
+    :param lineups: batting orders as row indexes of probabilities
+    :param method: 'exact'(Markov chain) or 'simulate'(Monte Carlo)(default:'exact')
+    :param games: games per lineup for 'simulate'(default:10000)
+    :param innings: innings per game(default:9)
+    :param seed: RNG seed, every lineup gets its own child seed
+    :param workers: worker processes(default:1, in process; None: os.cpu_count())
+    :param chunk_size: lineups per task(default:64)
+    :return: (ndarray) runs per game in lineups order
+    """
+    if method not in ('exact', 'simulate'):
+        raise ValueError('unknown method: {}'.format(method))
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    lineups = [tuple(lineup) for lineup in lineups]
+    seeds = np.random.SeedSequence(seed).spawn(len(lineups))
+    tasks = [(probabilities, lineups[start:start + chunk_size], method, games, innings, seeds[start:start + chunk_size])
+             for start in range(0, len(lineups), chunk_size)]
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers <= 1 or len(tasks) <= 1:
+        chunks = [_evaluate(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            chunks = list(executor.map(_evaluate, tasks))
+    return np.array([value for chunk in chunks for value in chunk], dtype=np.float64)
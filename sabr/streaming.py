@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from array import array
+
+from sabr.compiler import compile_metrics
+from sabr.events import BATTING_INCREMENTS, PITCHING_INCREMENTS
+from sabr.registry import BATTING_STATS, PITCHING_STATS
+
+__author__ = 'Shinichi Nakagawa'
+
+BATTER = 'batter'
+PITCHER = 'pitcher'
+
+_FIELDS = {BATTER: BATTING_STATS, PITCHER: PITCHING_STATS}
+
+
+class Accumulator(object):
+    """
+    Play-by-play accumulator
+    Each event updates a compact int32 counter vector per player in constant time.
+    Metrics are read on demand from the counters and memoized until that player's
+    next update.
+    """
+
+    def __init__(self, constants=None):
+        """
+        :param constants: constants profile for the formulas(e.g. {'c': 3.10})
+        """
+        self.constants = dict(constants or {})
+        self._counters = {BATTER: {}, PITCHER: {}}
+        self._memo = {}
+
+    def _vector(self, role, player):
+        counters = self._counters[role]
+        vector = counters.get(player)
+        if vector is None:
+            vector = array('i', bytes(4 * len(_FIELDS[role])))
+            counters[player] = vector
+        return vector
+
+    def _apply(self, role, player, deltas):
+        vector = self._vector(role, player)
+        for index, delta in deltas:
+            vector[index] += delta
+        self._memo.pop((role, player), None)
+
+    def plate_appearance(self, batter, pitcher, event):
+        """
+        Record a plate appearance
+        :param batter: batter id
+        :param pitcher: pitcher id
+        :param event: outcome code(sabr.events.PLATE_APPEARANCES)
+        """
+        self._apply(BATTER, batter, BATTING_INCREMENTS[event])
+        self._apply(PITCHER, pitcher, PITCHING_INCREMENTS[event])
+
+    def runner(self, runner, pitcher, event):
+        """
+        Record a runner event
+        :param runner: runner id
+        :param pitcher: pitcher id
+        :param event: 'SB' or 'CS'
+        """
+        self._apply(BATTER, runner, BATTING_INCREMENTS[event])
+        self._apply(PITCHER, pitcher, PITCHING_INCREMENTS[event])
+
+    def score(self, runner, pitcher, earned=True):
+        """
+        Record a run
+        :param runner: runner id(scores the run)
+        :param pitcher: pitcher id(charged with the run)
+        :param earned: earned run(default:True)
+        """
+        self._apply(BATTER, runner, ((BATTING_STATS.index('r'), 1), ))
+        deltas = ((PITCHING_STATS.index('r'), 1), )
+        if earned:
+            deltas += ((PITCHING_STATS.index('er'), 1), )
+        self._apply(PITCHER, pitcher, deltas)
+
+    def players(self, role=BATTER):
+        """
+        Players with counters
+        :param role: 'batter' or 'pitcher'(default:'batter')
+        :return: (list) player ids
+        """
+        return list(self._counters[role])
+
+    def counters(self, player, role=BATTER):
+        """
+        Counting stats of a player
+        :param player: player id
+        :param role: 'batter' or 'pitcher'(default:'batter')
+        :return: (dict) counting stat -> value
+        """
+        vector = self._counters[role].get(player)
+        if vector is None:
+            return dict.fromkeys(_FIELDS[role], 0)
+        return dict(zip(_FIELDS[role], vector))
+
+    def stat(self, player, metric, role=BATTER):
+        """
+        Current value of a metric(raises ZeroDivisionError like Stats when the denominator is 0)
+        :param player: player id
+        :param metric: metric name(e.g. 'ops', 'woba_mlb', 'fip', 'whip')
+        :param role: 'batter' or 'pitcher'(default:'batter')
+        :return: (float) value
+        """
+        memo = self._memo.setdefault((role, player), {})
+        if metric not in memo:
+            kernel = compile_metrics([metric], self.constants)
+            memo[metric] = kernel(self.counters(player, role))[metric]
+        return memo[metric]
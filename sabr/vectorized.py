@@ -0,0 +1,519 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+__author__ = 'Shinichi Nakagawa'
+
+# Veltkamp splitter for float64 (2 ** 27 + 1)
+_SPLITTER = 134217729.0
+
+
+def _product_error(a, b):
+    """
+    Rounding error of a * b (Dekker's two-product)
+    :param a: float64 array
+    :param b: float64 scalar
+    :return: (ndarray) exact value of a * b minus its float64 product
+    """
+    p = a * b
+    t = _SPLITTER * a
+    a_hi = t - (t - a)
+    a_lo = a - a_hi
+    t = _SPLITTER * b
+    b_hi = t - (t - b)
+    b_lo = b - b_hi
+    return ((a_hi * b_hi - p) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo
+
+
+def py_round(x, ndigits=None):
+    """
+    Python's built-in round() for arrays
+    numpy.round scales by 10 ** ndigits before rounding, so a product landing
+    exactly on .5 can round the other way from round(). Those ties are settled
+    with the exact rounding error of the scaling.
+    :param x: values
+    :param ndigits: number of decimal digits(default:None, round to integer)
+    :return: (ndarray) rounded values
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if not ndigits:
+        return np.rint(x)
+    shape = x.shape
+    x = x.reshape(-1)
+    scale = 10.0 ** ndigits
+    scaled = x * scale
+    rounded = np.rint(scaled)
+    distance = np.subtract(scaled, rounded)
+    tie = np.abs(distance, out=distance) == 0.5
+    if tie.any():
+        error = _product_error(x[tie], scale)
+        rounded[tie] = np.where(
+            error > 0,
+            np.ceil(scaled[tie]),
+            np.where(error < 0, np.floor(scaled[tie]), rounded[tie])
+        )
+    return np.divide(rounded, scale, out=rounded).reshape(shape)
+
+
+def as_float(x):
+    """
+    float() for arrays
+    :param x: values
+    :return: (ndarray) float64 values
+    """
+    return np.asarray(x, dtype=np.float64)
+
+
+def column(x):
+    """
+    Counting stat column as ndarray (zero-copy where possible)
+    Unsigned and boolean columns are widened to int64 so differences can go negative.
+    :param x: ndarray, buffer-protocol object, sequence or scalar
+    :return: (ndarray) column
+    """
+    x = np.asarray(x)
+    if x.dtype.kind in 'ub':
+        return x.astype(np.int64)
+    return x
+
+
+class Stats(object):
+    """
+    Batch counterpart of sabr.stats.Stats
+    Every method takes NumPy arrays (or buffer-protocol columns, sequences, scalars)
+    and returns an ndarray with the same values the scalar method returns row by row.
+    Zero denominators follow NumPy semantics(inf / nan with a RuntimeWarning).
+    """
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def ip(cls, ip_outs):
+        """
+        Inning Pitched
+        :param ip_outs: inning pitched outs
+        :return: (ndarray) ip
+        """
+        return py_round(as_float(column(ip_outs)) / 3, 1)
+
+    @classmethod
+    def era(cls, er, ip):
+        """
+        Earned run average
+        :param er: earned run
+        :param ip: inning pitched
+        :return: (ndarray) era
+        """
+        return py_round((9 * column(er)) / column(ip), 2)
+
+    @classmethod
+    def whip(cls, bb, h, ip):
+        """
+        Walks + Hits / IP
+        :param bb: base on ball
+        :param h: hits
+        :param ip: inning pitched
+        :return: (ndarray) whip
+        """
+        return py_round((column(bb) + column(h)) / column(ip), 3)
+
+    @classmethod
+    def h9(cls, h, ip):
+        """
+        Hits / 9
+        :param h: hits
+        :param ip: inning pitched
+        :return: (ndarray) h9
+        """
+        return py_round((9 * column(h)) / column(ip), 1)
+
+    @classmethod
+    def so9(cls, so, ip):
+        """
+        Strike out / 9
+        :param so: strike out
+        :param ip: inning pitched
+        :return: (ndarray) so9
+        """
+        return py_round((9 * column(so)) / column(ip), 1)
+
+    @classmethod
+    def bb9(cls, bb, ip):
+        """
+        BB / 9
+        :param bb: base on ball
+        :param ip: inning pitched
+        :return: (ndarray) b9
+        """
+        return py_round((9 * column(bb)) / column(ip), 1)
+
+    @classmethod
+    def hr9(cls, hr, ip):
+        """
+        HR / 9
+        :param hr: home run
+        :param ip: inning pitched
+        :return: (ndarray) hr9
+        """
+        return py_round((9 * column(hr)) / column(ip), 1)
+
+    @classmethod
+    def fip(cls, hr, bb, hbp, so, ip, ibb=0, c=3.12):
+        """
+        Fielding Independent Pitching(FIP)
+        :param hr: home run
+        :param bb: base on ball
+        :param hbp: hit by pitch
+        :param so: strike out
+        :param ip: inning pitched
+        :param ibb: intentional base on balls(default:0)
+        :param c: league constant, scalar or per row(default:3.12)
+        :return: (ndarray)FIP
+        """
+        _13hr = as_float(13.0 * column(hr))
+        _3bb = 3.0 * as_float(column(bb) + column(hbp) - column(ibb))
+        _2so = 2.0 * as_float(column(so))
+        return py_round((_13hr + _3bb - _2so) / as_float(column(ip)) + column(c), 2)
+
+    @classmethod
+    def single(cls, h, hr, _2b, _3b):
+        """
+        Single hits
+        :param h: hits(all)
+        :param hr: home run
+        :param _2b: double
+        :param _3b: triple
+        :return: (ndarray)single hits
+        """
+        return column(h) - (column(hr) + column(_2b) + column(_3b))
+
+    @classmethod
+    def pa(cls, ab, bb, hbp, sf, sh):
+        """
+        Plate appearance
+        :param ab: at bat
+        :param bb: base on ball
+        :param hbp: hit by pitch
+        :param sf: sacrifice fly
+        :param sh: sacrifice hit
+        :return: (ndarray)Plate appearance
+        """
+        return column(ab) + column(bb) + column(hbp) + column(sf) + column(sh)
+
+    @classmethod
+    def tb(cls, single, hr, _2b, _3b):
+        """
+        Total bases
+        :param single: single hits
+        :param hr: home run
+        :param _2b: double
+        :param _3b: triple
+        :return: (ndarray)total bases
+        """
+        return column(hr) * 4 + column(_3b) * 3 + column(_2b) * 2 + column(single)
+
+    @classmethod
+    def avg(cls, h, ab):
+        """
+        Batting average
+        :param h: hits
+        :param ab: at bat
+        :return: (ndarray)avg
+        """
+        return py_round(as_float(column(h)) / as_float(column(ab)), 3)
+
+    @classmethod
+    def slg(cls, tb, ab):
+        """
+        Slugging
+        :param tb: total bases
+        :param ab: at bat
+        :return: (ndarray)slugging
+        """
+        return py_round(as_float(column(tb)) / as_float(column(ab)), 3)
+
+    @classmethod
+    def obp(cls, h, bb, hbp, ab, sf):
+        """
+        On base percentage
+        :param h: hits
+        :param bb: base on ball
+        :param hbp: hit by pitch
+        :param ab: at bat
+        :param sf: sacrifice fly
+        :return: (ndarray)obp
+        """
+        h, bb, hbp = column(h), column(bb), column(hbp)
+        return py_round(as_float(h + bb + hbp) / as_float(column(ab) + bb + hbp + column(sf)), 3)
+
+    @classmethod
+    def ops(cls, h, bb, hbp, ab, sf, tb):
+        """
+        On the base + slugging
+        :param h: hits
+        :param bb: base on ball
+        :param hbp: hit by pitch
+        :param ab: at bat
+        :param sf: sacrifice fly
+        :param tb: total bases
+        :return: (ndarray) ops
+        """
+        h, bb, hbp, ab = column(h), column(bb), column(hbp), column(ab)
+        return py_round(
+            as_float(column(tb)) / as_float(ab) + as_float(h + bb + hbp) / as_float(ab + bb + hbp + column(sf)), 3
+        )
+
+    @classmethod
+    def babip(cls, h, hr, ab, so, sf):
+        """
+        Batting average on balls in play(BABIP)
+        :param h: hits
+        :param hr: home run
+        :param ab: at bat
+        :param so: strike out
+        :param sf: sacrifice fly
+        :return: (ndarray) babip
+        """
+        hr = column(hr)
+        return py_round(as_float(column(h) - hr) / as_float(column(ab) - column(so) - hr + column(sf)), 3)
+
+    @classmethod
+    def rc(cls, tb, h, bb, hbp, cs, gidp, sf, sh, sb, so, ab, ibb):
+        """
+        Runs Created
+        :param tb: total bases
+        :param h: hits
+        :param bb: base on ball
+        :param hbp: hit by pitch
+        :param cs: caught stealing
+        :param gidp: ground into duble play
+        :param sf: sacrifice fly
+        :param sh: sacrifice hit
+        :param sb: stolen base
+        :param so: strike out
+        :param ab: at bat
+        :param ibb: intentional base on balls
+        :return: (ndarray) run created
+        """
+        bb, hbp, sf, sh = column(bb), column(hbp), column(sf), column(sh)
+        a = as_float(column(h) + bb + hbp - column(cs) - column(gidp))
+        b = as_float(column(tb)) + py_round(0.24 * as_float(bb + hbp - column(ibb)), 1) \
+            + py_round(0.62 * as_float(column(sb)), 1) \
+            + py_round(0.5 * as_float(sh + sf), 1) - py_round(0.03 * as_float(column(so)), 1)
+        c = as_float(column(ab) + bb + hbp + sf + sh)
+        a_b = py_round(a + 2.4 * c) * (b + 3.0 * c)
+        _9c = py_round(9.0 * c, 1)
+        _09c = py_round(0.9 * c, 1)
+        return py_round(a_b / _9c - _09c, 2)
+
+    @classmethod
+    def rc2002(cls, h, bb, hbp, cs, gidp, sf, sh, sb, so, ab, ibb, single, _2b, _3b, hr):
+        """
+        Runs Created of 2002 ver.
+        [note]
+        http://en.wikipedia.org/wiki/Runs_created#2002_version_of_runs_created
+        :param h: hits
+        :param bb: base on ball
+        :param hbp: hit by pitch
+        :param cs: caught stealing
+        :param gidp: ground into duble play
+        :param sf: sacrifice fly
+        :param sh: sacrifice hit
+        :param sb: stolen base
+        :param so: strike out
+        :param ab: at bat
+        :param ibb: intentional base on balls
+        :param single: single hits
+        :param _2b: double
+        :param _3b: triple
+        :param hr: home run
+        :return: (ndarray) run created
+        """
+        bb, hbp, sf, sh = column(bb), column(hbp), column(sf), column(sh)
+        custom_tb = py_round(1.125 * as_float(column(single)), 1) + py_round(1.69 * as_float(column(_2b)), 1) \
+            + py_round(3.02 * as_float(column(_3b)), 1) + py_round(3.73 * as_float(column(hr)), 1)
+        a = as_float(column(h) + bb + hbp - column(cs) - column(gidp))
+        b = custom_tb + py_round(0.29 * as_float(bb + hbp - column(ibb)), 1) \
+            + py_round(0.492 * as_float(sf + sh + column(sb)), 1) - py_round(0.04 * as_float(column(so)), 1)
+        c = as_float(column(ab) + bb + hbp + sf + sh)
+        a_b = py_round(a + 2.4 * c, 1) * (b + 3.0 * c)
+        _9c = py_round(9.0 * c, 1)
+        _09c = py_round(0.9 * c, 1)
+        return py_round(a_b / _9c - _09c, 2)
+
+    @classmethod
+    def rc27(cls, rc, ab, h, sh, sf, cs, gidp):
+        """
+        Runs created 27
+        :param rc: run created
+        :param ab: at bat
+        :param h: hits
+        :param sh: sacrifice hit
+        :param sf: sacrifice fly
+        :param cs: caught stealing
+        :param gidp: ground into duble play
+        :return: (ndarray) run created 27
+        """
+        to = column(ab) - column(h) + column(sh) + column(sf) + column(cs) + column(gidp)
+        return py_round(27 * column(rc) / to, 2)
+
+    @classmethod
+    def base_runs(cls, ab, tb, h, hr, bb, hbp, sb, cs, gidp, ibb=0):
+        """
+        Base Runs
+        https://en.wikipedia.org/wiki/Base_runs
+        :param ab: at bat
+        :param tb: total bases
+        :param h: hits
+        :param hr: home run
+        :param bb: base on ball
+        :param hbp: hit by pitch
+        :param sb: stolen base
+        :param cs: caught stealing
+        :param gidp: ground into duble play
+        :param ibb: intentional base on balls
+        :return: (ndarray) Base Runs
+        """
+        h, hr, bb, hbp, ibb = column(h), column(hr), column(bb), column(hbp), column(ibb)
+        cs, gidp = column(cs), column(gidp)
+        a = h + bb + hbp - hr - (0.5 * ibb)
+        b = (1.4 * column(tb) - 0.6 * h - 3 * hr + 0.1 * (bb + hbp - ibb) + 0.9 * (column(sb) - cs - gidp)) * 1.1
+        c = column(ab) - h + cs + gidp
+        d = hr
+        return a * py_round(b / (b + c), 3) + d
+
+    @classmethod
+    def woba(cls, bb, hbp, _1b, _2b, _3b, hr, ab, sf, ibb=0, e_bb=0, **kwargs):
+        """
+        Weighted on-base average
+        :param bb: base on ball
+        :param hbp: hit by pitch
+        :param _1b: single
+        :param _2b: double
+        :param _3b: triple
+        :param hr: home run
+        :param ab: at bat
+        :param sf: sacrifice fly
+        :param ibb: intentional base on balls(default:0)
+        :param e_bb: base on ball for error(default:0)
+        :return: (ndarray) wOBA
+        """
+        bb, hbp, ibb = column(bb), column(hbp), column(ibb)
+        u_bb = py_round(kwargs.get('const_u_bb') * as_float(bb - ibb), 3)
+        u_hbp = py_round(as_float(kwargs.get('const_u_hbp') * hbp), 3)
+        u_e_bb = py_round(kwargs.get('const_u_e_bb') * as_float(column(e_bb)), 3)
+        u_h = py_round(kwargs.get('const_u_1b') * as_float(column(_1b)), 3) \
+            + py_round(kwargs.get('const_u_2b') * as_float(column(_2b)), 3) \
+            + py_round(kwargs.get('const_u_3b') * column(_3b), 3) \
+            + py_round(kwargs.get('const_u_hr') * as_float(column(hr)), 3)
+        u_pa = py_round(as_float(column(ab) + bb - ibb + hbp + column(sf)), 3)
+        return py_round((u_bb + u_hbp + u_e_bb + u_h) / u_pa, 3)
+
+    @classmethod
+    def woba_npb(cls, bb, hbp, _1b, _2b, _3b, hr, ab, sf, ibb=0, e_bb=0):
+        """
+        Weighted on-base average for NPB(wOBA)
+        http://1point02.jp/
+        :param bb: base on ball
+        :param hbp: hit by pitch
+        :param _1b: single
+        :param _2b: double
+        :param _3b: triple
+        :param hr: home run
+        :param ab: at bat
+        :param sf: sacrifice fly
+        :param ibb: intentional base on balls(default:0)
+        :param e_bb: base on ball for error(default:0)
+        :return: (ndarray) wOBA
+        """
+        _calc_params = {
+            'const_u_bb': 0.692,
+            'const_u_hbp': 0.73,
+            'const_u_e_bb': 0.966,
+            'const_u_1b': 0.865,
+            'const_u_2b': 1.334,
+            'const_u_3b': 1.725,
+            'const_u_hr': 2.065
+        }
+        return cls.woba(bb, hbp, _1b, _2b, _3b, hr, ab, sf, ibb, e_bb, **_calc_params)
+
+    @classmethod
+    def woba_mlb(cls, bb, hbp, _1b, _2b, _3b, hr, ab, sf, ibb=0):
+        """
+        Weighted on-base average for MLB(wOBA)
+        http://www.fangraphs.com/library/offense/woba/
+        :param bb: base on ball
+        :param hbp: hit by pitch
+        :param _1b: single
+        :param _2b: double
+        :param _3b: triple
+        :param hr: home run
+        :param ab: at bat
+        :param sf: sacrifice fly
+        :param ibb: intentional base on balls(default:0)
+        :return: (ndarray) wOBA
+        """
+        _calc_params = {
+            'const_u_bb': 0.69,
+            'const_u_hbp': 0.72,
+            'const_u_e_bb': 0,
+            'const_u_1b': 0.89,
+            'const_u_2b': 1.27,
+            'const_u_3b': 1.62,
+            'const_u_hr': 2.10,
+        }
+        return cls.woba(bb, hbp, _1b, _2b, _3b, hr, ab, sf, ibb, e_bb=0, **_calc_params)
+
+    @classmethod
+    def wraa(cls, woba, lg_woba, pa, woba_scale=1.24):
+        """
+        Weighted Runs Above Average(wRAA)
+        http://1point02.jp/
+        :param woba: weighted on-base average
+        :param lg_woba: weighted on-base average(league average), scalar or per row
+        :param pa: plate appearance
+        :param woba_scale: weighted on-base average scale, scalar or per row(default:1.24)
+        :return: (ndarray) wRAA
+        """
+        return py_round(((column(woba) - column(lg_woba)) / column(woba_scale)) * as_float(column(pa)), 1)
+
+    @classmethod
+    def adam_dunn_batter(cls, hr, bb, so, pa):
+        """
+        Adam dunn %(batter)
+        :param hr: home run
+        :param bb: base on ball
+        :param so: strike out
+        :param pa: plate appearance
+        :return: (ndarray) adam dunn
+        """
+        return py_round(((as_float(column(hr)) + as_float(column(bb)) + as_float(column(so))) / column(pa)) * 100, 1)
+
+    @classmethod
+    def adam_dunn_pitcher(cls, hr, bb, hbp, so, bfp):
+        """
+        Adam dunn %(pitcher)
+        :param hr: home run
+        :param bb: base on ball
+        :param hbp: hit by pitch
+        :param so: strike out
+        :param bfp: batters faced
+        :return: (ndarray) adam dunn
+        """
+        return py_round(
+            ((as_float(column(hr)) + as_float(column(bb)) + as_float(column(hbp)) + as_float(column(so)))
+             / as_float(column(bfp))) * 100, 1
+        )
+
+    @classmethod
+    def rsaa(cls, ra, league_ra, ip):
+        """
+        Run Saved Above Average
+        :param ra: run average
+        :param league_ra: league run average, scalar or per row
+        :param ip: inning pitched
+        :return: (ndarray) rsaa
+        """
+        return py_round(as_float(column(league_ra) - column(ra)) * column(ip) / 9.0, 1)
@@ -29,8 +29,14 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Natural Language :: English',
         'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
     packages=find_packages(),
+    python_requires='>=3.8',
+    install_requires=['numpy>=1.20'],
     include_package_data=True,
     keywords=['baseball', 'MLB', 'SABRmetrics', 'SABR', 'Major league baseball'],
     license='MIT License',
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+
+import numpy as np
+
+from sabr.aggregate import PartialAggregate
+from sabr.registry import BATTING_STATS, PITCHING_STATS
+from sabr.stats import Stats
+
+
+class TestPartialAggregate(unittest.TestCase):
+    """
+    PartialAggregate Tests
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(12)
+        size = 3000
+        table = {k: rng.randint(0, 20, size) for k in BATTING_STATS}
+        table['ab'] += table['h'] + 1
+        table['player'] = np.array(['p{}'.format(i) for i in rng.randint(0, 40, size)])
+        table['season'] = rng.randint(2001, 2004, size)
+        table['split'] = np.array(['vsL', 'vsR'])[rng.randint(0, 2, size)]
+        self.table = table
+        self.by = ('player', 'season', 'split')
+        self.whole = PartialAggregate()
+        self.whole.update(table, self.by)
+
+    def tearDown(self):
+        pass
+
+    def partials(self, chunk_size):
+        for start in range(0, len(self.table['ab']), chunk_size):
+            partial = PartialAggregate()
+            partial.update({k: v[start:start + chunk_size] for k, v in self.table.items()}, self.by)
+            yield partial
+
+    def test_update(self):
+        """
+        totals per key
+        :return:
+        """
+        key = self.whole.keys()[0]
+        mask = np.ones(len(self.table['ab']), dtype=bool)
+        for name, value in zip(self.by, key):
+            mask &= self.table[name] == value
+        counters = self.whole.counters(key)
+        for field in BATTING_STATS:
+            self.assertEqual(counters[field], int(self.table[field][mask].sum()))
+        self.assertEqual(len(self.whole), 40 * 3 * 2)
+
+    def test_merge(self):
+        """
+        merged partials equal the single node totals
+        :return:
+        """
+        merged = PartialAggregate()
+        for partial in reversed(list(self.partials(700))):
+            merged.merge(partial)
+        self.assertEqual(sorted(merged.keys()), sorted(self.whole.keys()))
+        for key in self.whole.keys():
+            self.assertEqual(merged.counters(key), self.whole.counters(key))
+            self.assertEqual(merged.stat(key, 'woba_mlb'), self.whole.stat(key, 'woba_mlb'))
+        self.assertRaises(ValueError, merged.merge, PartialAggregate(PITCHING_STATS))
+
+    def test_bytes(self):
+        """
+        binary round trip
+        :return:
+        """
+        data = self.whole.to_bytes()
+        restored = PartialAggregate.from_bytes(data)
+        self.assertEqual(restored.keys(), self.whole.keys())
+        np.testing.assert_array_equal(restored.values, self.whole.values)
+        self.assertRaises(ValueError, PartialAggregate.from_bytes, b'X' * len(data))
+        partial = PartialAggregate()
+        players, seasons = np.unique(['b', 'a', 'b']), np.unique([2004, 2003])
+        partial.add((players[0], seasons[1]), {'ab': 4, 'h': 1})
+        partial.add(('a', 2004), {'ab': 3})
+        restored = PartialAggregate.from_bytes(partial.to_bytes())
+        self.assertEqual(restored.keys(), [('a', 2004)])
+        self.assertIs(type(restored.keys()[0][1]), int)
+        self.assertEqual(restored.counters(('a', 2004))['ab'], 7)
+
+    def test_stat(self):
+        """
+        metrics from the totals
+        :return:
+        """
+        a = PartialAggregate()
+        a.add(('suzukic01', 2004), {'ab': 300, 'h': 100})
+        a.add(('suzukic01', 2004), {'ab': 404, 'h': 162})
+        self.assertEqual(a.stat(('suzukic01', 2004), 'avg'), Stats.avg(262, 704))
+        self.assertRaises(ZeroDivisionError, a.stat, ('unknown', 2004), 'avg')
+        keys, values = self.whole.compute(['avg', 'ops'])
+        for key, avg in zip(keys, values['avg']):
+            self.assertEqual(avg, self.whole.stat(key, 'avg'))
+
+    def test_rollup(self):
+        """
+        coarser keys
+        :return:
+        """
+        seasons = self.whole.rollup((1, ))
+        self.assertEqual(sorted(seasons.keys()), [(2001, ), (2002, ), (2003, )])
+        self.assertEqual(sum(seasons.counters(k)['h'] for k in seasons.keys()), int(self.table['h'].sum()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from sabr.benchmark import CASES, compare, load, main, overhead, run, save, stats_methods
+
+
+class TestBenchmark(unittest.TestCase):
+    """
+    Benchmark harness Tests
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_cases(self):
+        """
+        every public Stats method has a scalar and a batch case
+        :return:
+        """
+        methods = stats_methods()
+        self.assertIn('rc27', methods)
+        self.assertIn('woba', methods)
+        for method in methods:
+            self.assertIn('scalar.{}'.format(method), CASES)
+            self.assertIn('batch.{}'.format(method), CASES)
+
+    def test_run(self):
+        """
+        scalar cases run once, batch cases once per size
+        :return:
+        """
+        results = run(sizes=(10, 20), pattern='.avg', min_time=0.001, repeat=1)
+        self.assertEqual(list(results), ['scalar.avg', 'batch.avg@10', 'batch.avg@20'])
+        for measurement in results.values():
+            self.assertGreater(measurement['rows_per_sec'], 0)
+            self.assertGreater(measurement['calls_per_sec'], 0)
+            self.assertGreaterEqual(measurement['peak_bytes'], 0)
+
+    def test_compare(self):
+        """
+        throughput loss beyond the threshold is a regression
+        :return:
+        """
+        baseline = {'a': {'rows_per_sec': 100.0}, 'b': {'rows_per_sec': 100.0}}
+        results = {'a': {'rows_per_sec': 85.0}, 'b': {'rows_per_sec': 75.0}, 'c': {'rows_per_sec': 1.0}}
+        self.assertEqual(compare(results, baseline, threshold=0.2), [('b', 100.0, 75.0)])
+        self.assertEqual(compare(results, baseline, threshold=0.1), [('a', 100.0, 85.0), ('b', 100.0, 75.0)])
+
+    def test_save_load(self):
+        """
+        JSON baseline round trip
+        :return:
+        """
+        path = os.path.join(self.path, 'baseline.json')
+        results = run(sizes=(10, ), pattern='batch.obp', min_time=0.001, repeat=1)
+        save(path, results)
+        self.assertEqual(load(path), results)
+
+    def test_main(self):
+        """
+        exit code 1 against a faster baseline
+        :return:
+        """
+        path = os.path.join(self.path, 'baseline.json')
+        argv = ['--sizes', '10', '-k', 'batch.slg', '--min-time', '0.001', '--repeat', '1']
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(main(argv + ['--save', path]), 0)
+        results = load(path)
+        for measurement in results.values():
+            measurement['rows_per_sec'] *= 1000
+        save(path, results)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.assertEqual(main(argv + ['--baseline', path]), 1)
+        self.assertIn('REGRESSION batch.slg@10', out.getvalue())
+
+    def test_overhead(self):
+        """
+        instrumentation is measured on and off and left off
+        :return:
+        """
+        from sabr import instrument
+        ratios = overhead(min_time=0.001, repeat=1)
+        self.assertEqual(list(ratios), ['disabled', 'enabled'])
+        self.assertTrue(all(ratio > 0 for ratio in ratios.values()))
+        self.assertFalse(instrument.enabled())
+        self.assertEqual(instrument.snapshot(), {})
+        self.assertIn('instrument.disabled', CASES)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+
+import numpy as np
+
+from sabr.bootstrap import counting_stats, intervals, outcomes, resample
+from sabr.league import PITCHING
+
+
+class TestBootstrap(unittest.TestCase):
+    """
+    Bootstrap Tests
+    """
+
+    def setUp(self):
+        self.batting = {
+            'ab': np.array([550, 300, 20, 0]),
+            'h': np.array([170, 75, 4, 0]),
+            '_2b': np.array([35, 15, 1, 0]),
+            '_3b': np.array([3, 1, 0, 0]),
+            'hr': np.array([30, 8, 0, 0]),
+            'bb': np.array([70, 25, 2, 0]),
+            'ibb': np.array([8, 1, 0, 0]),
+            'hbp': np.array([5, 2, 0, 0]),
+            'sf': np.array([6, 2, 0, 0]),
+            'sh': np.array([0, 3, 1, 0]),
+            'so': np.array([120, 80, 9, 0]),
+        }
+        self.pitching = {
+            'ip_outs': np.array([600, 180]),
+            'bfp': np.array([820, 260]),
+            'h': np.array([180, 60]),
+            'hr': np.array([20, 9]),
+            'bb': np.array([50, 30]),
+            'ibb': np.array([3, 2]),
+            'hbp': np.array([6, 3]),
+            'so': np.array([210, 55]),
+        }
+
+    def tearDown(self):
+        pass
+
+    def test_outcomes(self):
+        """
+        outcome counts rebuild the observed counting stats
+        :return:
+        """
+        counts = outcomes(self.batting)
+        self.assertEqual(counts.sum(axis=1).tolist(), [631, 332, 23, 0])
+        stats = counting_stats(counts, self.batting)
+        for field in self.batting:
+            self.assertEqual(stats[field].tolist(), self.batting[field].tolist(), field)
+        counts = outcomes(self.pitching, PITCHING)
+        self.assertEqual(counts.sum(axis=1).tolist(), [820, 260])
+        stats = counting_stats(counts, self.pitching, PITCHING)
+        for field in self.pitching:
+            self.assertEqual(stats[field].tolist(), self.pitching[field].tolist(), field)
+        broken = dict(self.batting, h=np.array([600, 75, 4, 0]))
+        self.assertRaises(ValueError, outcomes, broken)
+
+    def test_reproducible(self):
+        """
+        the seed fixes the result whatever the chunking
+        :return:
+        """
+        metrics = ['avg', 'obp', 'babip', 'woba_mlb']
+        a = resample(metrics, self.batting, replicates=250, seed=19, chunk_size=50)
+        b = resample(metrics, self.batting, replicates=250, seed=19, chunk_size=50)
+        c = resample(metrics, self.batting, replicates=250, seed=20, chunk_size=50)
+        for metric in metrics:
+            self.assertEqual(a[metric].shape, (250, 4))
+            np.testing.assert_equal(a[metric], b[metric])
+            self.assertFalse(np.array_equal(a[metric][:, :2], c[metric][:, :2]))
+        self.assertTrue(np.all(np.isnan(a['avg'][:, 3])))
+
+    def test_workers(self):
+        """
+        process pool gives the same replicates as the in-process run
+        :return:
+        """
+        a = resample(['avg'], self.batting, replicates=60, seed=7, chunk_size=20)
+        b = resample(['avg'], self.batting, replicates=60, seed=7, chunk_size=20, workers=2)
+        np.testing.assert_equal(a['avg'], b['avg'])
+
+    def test_intervals(self):
+        """
+        intervals bracket the estimate and narrow with playing time
+        :return:
+        """
+        result = intervals(['avg', 'obp', 'babip', 'woba_mlb'], self.batting, replicates=400, seed=1)
+        for metric, interval in result.items():
+            self.assertTrue(np.all(interval.lower[:3] <= interval.estimate[:3]), metric)
+            self.assertTrue(np.all(interval.estimate[:3] <= interval.upper[:3]), metric)
+            width = interval.upper - interval.lower
+            self.assertLess(width[0], width[2], metric)
+            self.assertTrue(np.isnan(interval.lower[3]) and np.isnan(interval.upper[3]), metric)
+        self.assertAlmostEqual(result['avg'].estimate[0], 0.309, places=3)
+        narrow = intervals(['avg'], self.batting, level=0.5, replicates=400, seed=1)['avg']
+        self.assertTrue(np.all(narrow.upper[:3] - narrow.lower[:3] < result['avg'].upper[:3] - result['avg'].lower[:3]))
+        fip = intervals(['fip'], self.pitching, side=PITCHING, replicates=400, seed=1)['fip']
+        self.assertTrue(np.all(fip.lower <= fip.estimate) and np.all(fip.estimate <= fip.upper))
+
+
+if __name__ == '__main__':
+    unittest.main()
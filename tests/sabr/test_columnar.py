@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from sabr.columnar import ColumnStore, ColumnWriter, COUNTING_STATS
+from sabr.evaluator import compute
+
+
+class TestColumnStore(unittest.TestCase):
+    """
+    ColumnStore Tests
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        rng = np.random.RandomState(8)
+        size = 1000
+        table = {k: rng.randint(0, 30, size) for k in COUNTING_STATS}
+        table['h'] = table['_2b'] + table['_3b'] + table['hr'] + rng.randint(0, 150, size)
+        table['ab'] = table['h'] + table['so'] + rng.randint(1, 300, size)
+        table['player'] = np.array(['p{}'.format(i % 37) for i in range(size)])
+        self.table = table
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_round_trip(self):
+        """
+        chunked write, mapped read
+        :return:
+        """
+        store_path = os.path.join(self.path, 'batting')
+        with ColumnWriter(store_path, COUNTING_STATS, strings=['player']) as writer:
+            for start in range(0, 1000, 300):
+                writer.append({k: v[start:start + 300] for k, v in self.table.items()})
+        store = ColumnStore(store_path)
+        self.assertEqual(len(store), 1000)
+        self.assertEqual(store.keys(), COUNTING_STATS)
+        for name in COUNTING_STATS:
+            self.assertEqual(store[name].dtype, np.dtype('<i4'))
+            np.testing.assert_array_equal(store[name], self.table[name])
+        self.assertIsInstance(store['ab'], np.memmap)
+        self.assertFalse(store['ab'].flags.writeable)
+        np.testing.assert_array_equal(store.decode('player'), self.table['player'])
+        self.assertEqual(len(store.dictionary('player')), 37)
+        self.assertIn('player', store)
+        self.assertRaises(KeyError, store.__getitem__, 'war')
+
+    def test_compute(self):
+        """
+        zero-copy views go straight into the batch formulas
+        :return:
+        """
+        store = ColumnStore.write(os.path.join(self.path, 'batting'), self.table, strings=['player'])
+        metrics = ['ops', 'rc', 'woba_mlb', 'fip', 'era']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected = compute(metrics, {k: v for k, v in self.table.items() if k != 'player'})
+            result = compute(metrics, store)
+        for metric in metrics:
+            np.testing.assert_array_equal(result[metric], expected[metric])
+
+    def test_errors(self):
+        """
+        overflow, empty store and foreign directory
+        :return:
+        """
+        writer = ColumnWriter(os.path.join(self.path, 'big'), ['ab'])
+        self.assertRaises(ValueError, writer.append, {'ab': np.array([2 ** 31])})
+        writer.close()
+        store = ColumnStore.write(os.path.join(self.path, 'empty'), {'ab': np.array([], dtype=int)})
+        self.assertEqual(len(store['ab']), 0)
+        self.assertRaises(IOError, ColumnStore, os.path.join(self.path, 'nothing'))
+
+    def test_rejected_chunk(self):
+        """
+        a bad column leaves every column file as it was
+        :return:
+        """
+        path = os.path.join(self.path, 'chunks')
+        writer = ColumnWriter(path, ['ab', 'h'], strings=['player'])
+        writer.append({'ab': np.array([4, 5]), 'h': np.array([1, 2]), 'player': np.array(['a', 'b'])})
+        self.assertRaises(ValueError, writer.append,
+                          {'ab': np.array([4]), 'h': np.array([2 ** 31]), 'player': np.array(['c'])})
+        self.assertRaises(ValueError, writer.append,
+                          {'ab': np.array([4]), 'h': np.array([1.5]), 'player': np.array(['c'])})
+        self.assertRaises(ValueError, writer.append,
+                          {'ab': np.array([4]), 'h': np.array([1, 1]), 'player': np.array(['c'])})
+        writer.append({'ab': np.array([6]), 'h': np.array([3]), 'player': np.array(['d'])})
+        writer.close()
+        store = ColumnStore(path)
+        self.assertEqual(store.rows, 3)
+        self.assertEqual(store['h'].tolist(), [1, 2, 3])
+        self.assertEqual(store.decode('player').tolist(), ['a', 'b', 'd'])
+        for name in ('ab', 'h', 'player'):
+            self.assertEqual(os.path.getsize(os.path.join(path, '{}.i32'.format(name))), 12)
+
+    def test_failed_write(self):
+        """
+        no header after an exception inside the writer block
+        :return:
+        """
+        path = os.path.join(self.path, 'failed')
+        with self.assertRaises(ValueError):
+            with ColumnWriter(path, ['ab']) as writer:
+                writer.append({'ab': np.array([1, 2])})
+                writer.append({'ab': np.array([0.5])})
+        self.assertFalse(os.path.exists(os.path.join(path, 'header.json')))
+        self.assertRaises(IOError, ColumnStore, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from sabr.comparables import FEATURES, ComparablesIndex
+from sabr.evaluator import compute
+
+
+class TestComparablesIndex(unittest.TestCase):
+    """
+    ComparablesIndex Tests
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(22)
+        size = 1500
+        table = {
+            'h': rng.randint(0, 180, size),
+            '_2b': rng.randint(0, 30, size),
+            '_3b': rng.randint(0, 5, size),
+            'hr': rng.randint(0, 30, size),
+            'bb': rng.randint(0, 80, size),
+            'ibb': rng.randint(0, 5, size),
+            'hbp': rng.randint(0, 10, size),
+            'sf': rng.randint(0, 8, size),
+            'sh': rng.randint(0, 8, size),
+            'so': rng.randint(0, 150, size),
+        }
+        table['h'] += table['_2b'] + table['_3b'] + table['hr']
+        table['ab'] = table['h'] + table['so'] + rng.randint(0, 300, size)
+        table['ab'][:3] = 0
+        self.table = table
+        self.keys = [('p{}'.format(i // 5), 2010 + i % 5) for i in range(size)]
+        self.index = ComparablesIndex.from_table(self.keys, table)
+        values = compute(FEATURES['batting'], {k: v[3:] for k, v in table.items()})
+        self.vectors = (np.column_stack([values[f] for f in FEATURES['batting']]) - self.index.mean) / self.index.scale
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def brute(self, vector, k, exclude=None):
+        distances = np.sqrt(((self.vectors - vector) ** 2).sum(axis=1))
+        if exclude is not None:
+            distances[exclude] = np.inf
+        return np.sort(distances)[:k]
+
+    def test_build(self):
+        """
+        rows without an at bat are left out
+        :return:
+        """
+        self.assertEqual(len(self.index), 1497)
+        self.assertNotIn(self.keys[0], self.index)
+        self.assertIn(self.keys[3], self.index)
+        self.assertEqual(self.index.features, FEATURES['batting'])
+
+    def test_query(self):
+        """
+        k-NN queries agree with a brute-force scan
+        :return:
+        """
+        values = {'avg': .300, 'obp': .380, 'slg': .500, 'iso': .200, 'bb_rate': .09, 'so_rate': .18,
+                  'woba_mlb': .370}
+        result = self.index.query(values, k=5)
+        self.assertEqual(len(result), 5)
+        expected = self.brute(self.index.normalize(values)[0], 5)
+        np.testing.assert_allclose([d for _, d in result], expected)
+        comps = self.index.comparables(self.keys[10], k=8)
+        self.assertNotIn(self.keys[10], [key for key, _ in comps])
+        np.testing.assert_allclose([d for _, d in comps], self.brute(self.vectors[7], 8, exclude=7))
+
+    def test_neighbors(self):
+        """
+        bulk comparables for everyone
+        :return:
+        """
+        rows, distances = self.index.neighbors(k=6)
+        self.assertEqual(rows.shape, (1497, 6))
+        for row in (0, 100, 777, 1496):
+            np.testing.assert_allclose(distances[row], self.brute(self.vectors[row], 6, exclude=row), atol=1e-6)
+            self.assertNotIn(row, rows[row].tolist())
+        comps = self.index.comparables(self.index.keys[100], k=6)
+        np.testing.assert_allclose([d for _, d in comps], distances[100], atol=1e-6)
+        small = ComparablesIndex(self.keys[:3], self.vectors[:3], FEATURES['batting'])
+        rows, distances = small.neighbors(k=4)
+        self.assertEqual(rows[0, 2:].tolist(), [-1, -1])
+        self.assertTrue(np.all(np.isinf(distances[:, 2:])))
+
+    def test_persist(self):
+        """
+        saved index answers like the built one
+        :return:
+        """
+        path = os.path.join(self.directory, 'comps.npz')
+        self.index.save(path)
+        loaded = ComparablesIndex.load(path)
+        self.assertEqual(loaded.keys, self.index.keys)
+        self.assertEqual(loaded.comparables(self.keys[42], k=5), self.index.comparables(self.keys[42], k=5))
+        np.testing.assert_equal(loaded.neighbors(k=3), self.index.neighbors(k=3))
+        path = os.path.join(self.directory, 'comps')
+        self.index.save(path)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['comps', 'comps.npz'])
+        self.assertEqual(ComparablesIndex.load(path).keys, self.index.keys)
+
+    def test_pitching(self):
+        """
+        pitcher comparables
+        :return:
+        """
+        rng = np.random.RandomState(2)
+        table = {k: rng.randint(1, 80, 200) for k in ('h', 'hr', 'bb', 'ibb', 'hbp', 'so', 'er')}
+        table['ip_outs'] = rng.randint(30, 600, 200)
+        index = ComparablesIndex.from_table(list(range(200)), table, side='pitching')
+        self.assertEqual(index.features, FEATURES['pitching'])
+        self.assertEqual(len(index.comparables(5, k=10)), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+
+import numpy as np
+
+from sabr.compiler import Compiler, compile_metrics
+from sabr.evaluator import compute
+from sabr.registry import WOBA_NPB, REGISTRY
+from sabr.stats import Stats
+
+
+# ichiro suzuki(2004)
+ICHIRO = {
+    'ab': 704, 'h': 262, '_2b': 24, '_3b': 5, 'hr': 8, 'bb': 49, 'ibb': 19, 'hbp': 4, 'sf': 3, 'sh': 2,
+    'so': 63, 'sb': 36, 'cs': 11, 'gidp': 6,
+}
+
+
+class TestCompiler(unittest.TestCase):
+    """
+    Compiler Tests
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(11)
+        size = 2000
+        table = {k: rng.randint(0, 30, size) for k in ('_2b', '_3b', 'hr', 'bb', 'ibb', 'hbp', 'sf', 'sh', 'so',
+                                                       'sb', 'cs', 'gidp', 'e_bb', 'er')}
+        table['h'] = table['_2b'] + table['_3b'] + table['hr'] + rng.randint(0, 150, size)
+        table['ab'] = table['h'] + table['so'] + rng.randint(1, 300, size)
+        table['ip_outs'] = rng.randint(1, 700, size)
+        self.table = table
+
+    def tearDown(self):
+        pass
+
+    def test_scalar(self):
+        """
+        scalar kernel
+        :return:
+        """
+        kernel = compile_metrics(['ops', 'rc', 'rc2002', 'rc27', 'woba_mlb', 'babip'])
+        result = kernel(ICHIRO)
+        self.assertEqual(result, compute(kernel.metrics, ICHIRO))
+        self.assertEqual(result['rc'], 132.09)
+        self.assertEqual(result['rc2002'], 136.7)
+        args = [ICHIRO[name] for name in kernel.inputs + kernel.optional if name in ICHIRO]
+        self.assertEqual(kernel.function(*args), tuple(result[m] for m in kernel.metrics))
+
+    def test_batch(self):
+        """
+        batch kernel against the evaluator
+        :return:
+        """
+        metrics = ['avg', 'obp', 'slg', 'ops', 'rc', 'base_runs', 'woba_npb', 'era', 'fip', 'whip']
+        kernel = compile_metrics(metrics, batch=True)
+        result = kernel(self.table)
+        expected = compute(metrics, self.table)
+        for metric in metrics:
+            self.assertEqual(result[metric].tolist(), expected[metric].tolist(), metric)
+
+    def test_constants(self):
+        """
+        constants profile is inlined
+        :return:
+        """
+        kernel = compile_metrics(['woba', 'fip'], dict(WOBA_NPB, c=3.05), inputs=['ip'])
+        self.assertNotIn('const_u_', kernel.source)
+        self.assertIn('3.05', kernel.source)
+        # hayato sakamoto(2016)
+        row = {'bb': 81, 'hbp': 0, 'h': 168, '_2b': 28, '_3b': 3, 'hr': 23, 'ab': 488, 'sf': 6, 'ibb': 2, 'e_bb': 2,
+               'so': 67, 'ip': 100.0}
+        result = kernel(row)
+        self.assertEqual(result['woba'], 0.428)
+        self.assertEqual(result['fip'], Stats.fip(23, 81, 0, 67, 100.0, 2, c=3.05))
+        self.assertNotIn('e_bb', compile_metrics(['woba_mlb']).source.split('\n', 1)[1])
+
+    def test_inputs(self):
+        """
+        per row constants and supplied intermediates stay parameters
+        :return:
+        """
+        kernel = compile_metrics(['fip'], batch=True, inputs=['c', 'ip'])
+        self.assertIn('c', kernel.inputs)
+        self.assertIn('ip', kernel.inputs)
+        self.assertNotIn('ip_outs', kernel.inputs)
+        c = np.linspace(2.9, 3.3, len(self.table['hr']))
+        result = kernel(dict(self.table, c=c, ip=self.table['ip_outs'] / 3.0))
+        expected = compute(['fip'], dict(self.table, c=c, ip=self.table['ip_outs'] / 3.0))
+        self.assertEqual(result['fip'].tolist(), expected['fip'].tolist())
+
+    def test_cache(self):
+        """
+        kernels are cached by metric set and constants
+        :return:
+        """
+        compiler = Compiler()
+        kernel = compiler.compile(['avg', 'ops'])
+        self.assertIs(compiler.compile(['avg', 'ops']), kernel)
+        self.assertIsNot(compiler.compile(['avg', 'ops'], batch=True), kernel)
+        self.assertIsNot(compiler.compile(['fip'], {'c': 3.0}), compiler.compile(['fip'], {'c': 3.1}))
+
+    def test_all_metrics(self):
+        """
+        every registered formula compiles
+        :return:
+        """
+        for name, formula in REGISTRY.items():
+            if name == 'woba':
+                compile_metrics([name], WOBA_NPB)
+            else:
+                compile_metrics([name])
+        self.assertRaises(KeyError, compile_metrics, ['war'])
+        # constants without a profile become parameters
+        self.assertIn('const_u_hr', compile_metrics(['woba']).inputs)
+
+
+if __name__ == '__main__':
+    unittest.main()
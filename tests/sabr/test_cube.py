@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+
+import numpy as np
+
+from sabr.cube import HOME_AWAY, MONTHS, PLATOON, SplitCube
+from sabr.evaluator import compute
+from sabr.registry import BATTING_STATS
+
+
+class TestSplitCube(unittest.TestCase):
+    """
+    SplitCube Tests
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(18)
+        size = 5000
+        table = {k: rng.randint(0, 3, size) for k in BATTING_STATS}
+        table['ab'] += table['h'] + 1
+        table['player'] = np.array(['p{}'.format(i) for i in rng.randint(0, 20, size)])
+        table['hand'] = np.array(PLATOON)[rng.randint(0, 2, size)]
+        table['site'] = np.array(HOME_AWAY)[rng.randint(0, 2, size)]
+        table['month'] = np.array(MONTHS)[rng.randint(0, len(MONTHS), size)]
+        self.table = table
+        self.cube = SplitCube({'hand': PLATOON, 'site': HOME_AWAY, 'month': MONTHS})
+        half = size // 2
+        self.cube.add({k: v[:half] for k, v in table.items()})
+        self.cube.add({k: v[half:] for k, v in table.items()})
+
+    def tearDown(self):
+        pass
+
+    def scan(self, player, **selection):
+        mask = self.table['player'] == player
+        for name, value in selection.items():
+            mask &= np.isin(self.table[name], value)
+        return {field: int(self.table[field][mask].sum()) for field in BATTING_STATS}
+
+    def test_counters(self):
+        """
+        slices and rollups equal a rescan
+        :return:
+        """
+        self.assertEqual(len(self.cube), 20)
+        for selection in ({}, {'hand': 'L'}, {'hand': 'R', 'site': 'home'}, {'month': [4, 5, 6]},
+                          {'hand': 'L', 'site': 'away', 'month': 9}):
+            self.assertEqual(self.cube.counters('p3', **selection), self.scan('p3', **selection))
+        self.assertEqual(self.cube.counters('unknown')['ab'], 0)
+        self.assertRaises(ValueError, self.cube.counters, 'p3', hand='S')
+
+    def test_stats(self):
+        """
+        formulas on a slice
+        :return:
+        """
+        counters = self.scan('p5', hand='L', month=[7, 8])
+        expected = compute(['avg', 'ops'], counters)
+        self.assertEqual(self.cube.stats('p5', ['avg', 'ops'], hand='L', month=[7, 8]), expected)
+
+    def test_page(self):
+        """
+        every split of a player
+        :return:
+        """
+        page = self.cube.page('p7', ['avg', 'obp', 'slg', 'ops'])
+        self.assertEqual(list(page), ['hand', 'site', 'month'])
+        self.assertEqual(list(page['month']), list(MONTHS))
+        self.assertEqual(page['site']['home'], compute(['avg', 'obp', 'slg', 'ops'], self.scan('p7', site='home')))
+        self.assertEqual(page['month'][10]['avg'], compute(['avg'], self.scan('p7', month=10))['avg'])
+
+    def test_compute(self):
+        """
+        a slice for every player
+        :return:
+        """
+        players, values = self.cube.compute(['avg'], hand='R')
+        for player, avg in zip(players, values['avg']):
+            self.assertEqual(avg, compute(['avg'], self.scan(player, hand='R'))['avg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
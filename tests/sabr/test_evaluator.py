@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+
+import numpy as np
+
+from sabr.evaluator import Evaluator, compute, evaluate
+from sabr.registry import REGISTRY, WOBA_NPB, Formula
+from sabr.stats import Stats
+from sabr.vectorized import Stats as BatchStats
+
+
+# ichiro suzuki(2004)
+ICHIRO = {
+    'ab': 704, 'h': 262, '_2b': 24, '_3b': 5, 'hr': 8, 'bb': 49, 'ibb': 19, 'hbp': 4, 'sf': 3, 'sh': 2,
+    'so': 63, 'sb': 36, 'cs': 11, 'gidp': 6,
+}
+# Yu Darvish(2013)
+DARVISH = {'ip_outs': 629, 'er': 66, 'h': 145, 'hr': 26, 'bb': 80, 'ibb': 1, 'hbp': 8, 'so': 277}
+
+
+class TestEvaluator(unittest.TestCase):
+    """
+    Evaluator Tests
+    """
+
+    def setUp(self):
+        self.evaluator = Evaluator()
+
+    def tearDown(self):
+        pass
+
+    def test_batting_row(self):
+        """
+        full stat line for one row
+        :return:
+        """
+        i = ICHIRO
+        result = compute(['single', 'tb', 'pa', 'avg', 'slg', 'obp', 'ops', 'babip', 'woba_mlb', 'rc', 'rc2002',
+                          'rc27', 'base_runs'], i)
+        single = Stats.single(i['h'], i['hr'], i['_2b'], i['_3b'])
+        tb = Stats.tb(single, i['hr'], i['_2b'], i['_3b'])
+        rc = Stats.rc(tb, i['h'], i['bb'], i['hbp'], i['cs'], i['gidp'], i['sf'], i['sh'], i['sb'], i['so'],
+                      i['ab'], i['ibb'])
+        self.assertEqual(result['single'], 225)
+        self.assertEqual(result['tb'], 320)
+        self.assertEqual(result['pa'], 762)
+        self.assertEqual(result['avg'], Stats.avg(i['h'], i['ab']))
+        self.assertEqual(result['slg'], Stats.slg(tb, i['ab']))
+        self.assertEqual(result['obp'], Stats.obp(i['h'], i['bb'], i['hbp'], i['ab'], i['sf']))
+        self.assertEqual(result['ops'], Stats.ops(i['h'], i['bb'], i['hbp'], i['ab'], i['sf'], tb))
+        self.assertEqual(result['babip'], 0.399)
+        self.assertEqual(result['woba_mlb'], Stats.woba_mlb(i['bb'], i['hbp'], single, i['_2b'], i['_3b'], i['hr'],
+                                                            i['ab'], i['sf'], i['ibb']))
+        self.assertEqual(result['rc'], rc)
+        self.assertEqual(rc, 132.09)
+        self.assertEqual(result['rc2002'], 136.7)
+        self.assertEqual(result['rc27'], 7.69)
+        self.assertEqual(result['base_runs'], 129.38)
+
+    def test_pitching_row(self):
+        """
+        ip is derived from outs unless supplied
+        :return:
+        """
+        result = compute(['ip', 'era', 'whip', 'so9', 'fip'], DARVISH)
+        self.assertEqual(result['ip'], 209.7)
+        self.assertEqual(result['era'], 2.83)
+        self.assertEqual(result['whip'], 1.073)
+        self.assertEqual(result['so9'], 11.9)
+        self.assertEqual(result['fip'], Stats.fip(26, 80, 8, 277, 209.7, 1))
+        row = dict(DARVISH, ip=209.2)
+        self.assertEqual(compute(['fip'], row)['fip'], 3.34)
+        self.assertEqual(compute(['fip'], row, {'c': 3.0})['fip'], Stats.fip(26, 80, 8, 277, 209.2, 1, c=3.0))
+
+    def test_table(self):
+        """
+        columns in, columns out
+        :return:
+        """
+        rng = np.random.RandomState(7)
+        table = {k: rng.randint(0, 30, 1000) for k in ('_2b', '_3b', 'hr', 'bb', 'ibb', 'hbp', 'sf', 'sh', 'so')}
+        table['h'] = table['_2b'] + table['_3b'] + table['hr'] + rng.randint(0, 150, 1000)
+        table['ab'] = table['h'] + table['so'] + rng.randint(1, 300, 1000)
+        result = compute(['ops', 'woba_npb', 'babip'], table)
+        single = BatchStats.single(table['h'], table['hr'], table['_2b'], table['_3b'])
+        tb = BatchStats.tb(single, table['hr'], table['_2b'], table['_3b'])
+        self.assertEqual(
+            result['ops'].tolist(),
+            BatchStats.ops(table['h'], table['bb'], table['hbp'], table['ab'], table['sf'], tb).tolist()
+        )
+        self.assertEqual(
+            result['woba_npb'].tolist(),
+            BatchStats.woba_npb(table['bb'], table['hbp'], single, table['_2b'], table['_3b'], table['hr'],
+                                table['ab'], table['sf'], table['ibb']).tolist()
+        )
+        self.assertEqual(
+            result['babip'].tolist(),
+            BatchStats.babip(table['h'], table['hr'], table['ab'], table['so'], table['sf']).tolist()
+        )
+
+    def test_plan(self):
+        """
+        shared intermediates appear once, supplied inputs never
+        :return:
+        """
+        plan = [f.name for f in self.evaluator.plan(['ops', 'rc', 'woba_mlb', 'babip', 'obp'], ICHIRO.keys())]
+        self.assertEqual(len(plan), len(set(plan)))
+        for intermediate in ('single', 'tb', 'pa', 'tob', 'obp_den'):
+            self.assertIn(intermediate, plan)
+        self.assertLess(plan.index('tb'), plan.index('ops'))
+        plan = [f.name for f in self.evaluator.plan(['ops'], tuple(ICHIRO.keys()) + ('tb', ))]
+        self.assertNotIn('tb', plan)
+        self.assertNotIn('single', plan)
+
+    def test_woba_constants(self):
+        """
+        generic wOBA needs a constants profile
+        :return:
+        """
+        # hayato sakamoto(2016)
+        row = {'bb': 81, 'hbp': 0, 'single': 114, '_2b': 28, '_3b': 3, 'hr': 23, 'ab': 488, 'sf': 6, 'ibb': 2,
+               'e_bb': 2}
+        self.assertEqual(compute(['woba'], row, WOBA_NPB)['woba'], 0.428)
+        self.assertEqual(compute(['woba_npb'], row)['woba_npb'], 0.428)
+        self.assertRaises(KeyError, compute, ['woba'], row)
+        self.assertEqual(compute(['wraa'], dict(row, pa=576, woba=0.428, lg_woba=0.323))['wraa'], 48.8)
+
+    def test_unknown(self):
+        """
+        unknown metric or missing input
+        :return:
+        """
+        self.assertRaises(KeyError, compute, ['war'], ICHIRO)
+        self.assertRaises(KeyError, compute, ['era'], {'er': 66})
+        self.assertIn('ops', REGISTRY)
+
+    def test_evaluate(self):
+        """
+        zero or negative denominators give NaN and error bits, never an exception
+        :return:
+        """
+        metrics = ['avg', 'obp', 'slg', 'babip', 'rc27', 'woba_mlb']
+        table = {k: np.array([v, 0, v, v]) for k, v in ICHIRO.items()}
+        table['so'] = np.array([63, 0, 63, 800])
+        table['h'][2] = 262
+        result = evaluate(metrics, table)
+        expected = compute(metrics, ICHIRO)
+        for i, metric in enumerate(metrics):
+            self.assertEqual(result.values[metric][0], expected[metric])
+            self.assertTrue(np.isnan(result.values[metric][1]))
+        self.assertEqual(result.errors.dtype, np.uint8)
+        self.assertEqual(result.errors.tolist(), [0, 0b111111, 0, 0b001000])
+        self.assertRaises(ZeroDivisionError, Stats.avg, 0, 0)
+        row = evaluate(['avg', 'era', 'whip', 'adam_dunn_pitcher'], {'h': 0, 'ab': 0, 'bb': 0, 'er': 0,
+                                                                     'ip_outs': 0, 'hr': 0, 'hbp': 0, 'so': 0,
+                                                                     'bfp': 0})
+        self.assertTrue(all(np.isnan(v) for v in row.values.values()))
+        self.assertEqual(row.errors, 0b1111)
+        pitching = evaluate(['era', 'fip'], {k: np.array([v, v]) for k, v in DARVISH.items()})
+        self.assertEqual(pitching.values['era'][0], compute(['era'], DARVISH)['era'])
+        self.assertEqual(pitching.errors.tolist(), [0, 0])
+        masked = evaluate(['avg'], {'h': [1, 0], 'ab': [4, 0]}, masked=True).values['avg']
+        self.assertEqual(masked.mask.tolist(), [False, True])
+        self.assertEqual(masked[0], 0.25)
+        self.assertRaises(ValueError, evaluate, ['avg'] * 65, ICHIRO)
+        self.assertEqual(evaluate(['avg'] * 9, ICHIRO).errors, 0)
+        self.assertRaises(ValueError, Formula, 'bad', 'h / ab', denominators=('pa', ))
+
+
+if __name__ == '__main__':
+    unittest.main()
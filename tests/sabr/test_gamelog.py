@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.gamelog import GameLogIndex
+
+
+class TestGameLogIndex(unittest.TestCase):
+    """
+    GameLogIndex Tests
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(15)
+        players, dates = [], []
+        for player in ('bonds', 'ichiro', 'matsui'):
+            days = np.sort(rng.choice(np.arange(20040401, 20040431), 25, replace=False))
+            players.extend([player] * len(days))
+            dates.extend(days.tolist())
+        size = len(players)
+        # shuffled on purpose, the index sorts by (player, date)
+        order = rng.permutation(size)
+        self.players = np.array(players)[order]
+        self.dates = np.array(dates)[order]
+        table = {k: rng.randint(0, 2, size) for k in ('_2b', '_3b', 'hr', 'bb', 'hbp', 'sf', 'sh', 'so')}
+        table['h'] = table['_2b'] + table['_3b'] + table['hr'] + rng.randint(0, 3, size)
+        table['ab'] = table['h'] + table['so'] + rng.randint(1, 4, size)
+        self.table = table
+        self.index = GameLogIndex(self.players, self.dates, table)
+
+    def tearDown(self):
+        pass
+
+    def brute(self, player, start, end):
+        mask = (self.players == player) & (self.dates >= start) & (self.dates <= end)
+        return {k: int(v[mask].sum()) for k, v in self.table.items()}
+
+    def test_counts(self):
+        """
+        date range counting stats against a rescan
+        :return:
+        """
+        for player in ('bonds', 'ichiro', 'matsui'):
+            for start, end in ((20040401, 20040430), (20040410, 20040420), (20040415, 20040415),
+                               (20040420, 20040410)):
+                self.assertEqual(self.index.counts(player, start, end), self.brute(player, start, end))
+        self.assertEqual(self.index.counts('ichiro'), self.brute('ichiro', 0, 99999999))
+        self.assertRaises(KeyError, self.index.counts, 'ruth')
+
+    def test_stats(self):
+        """
+        window metrics go through the registry formulas
+        :return:
+        """
+        counts = self.brute('bonds', 20040405, 20040425)
+        self.assertEqual(self.index.stats('bonds', ['ops', 'avg'], 20040405, 20040425),
+                         compute(['ops', 'avg'], counts))
+
+    def test_last(self):
+        """
+        last n games
+        :return:
+        """
+        mask = self.players == 'matsui'
+        last = np.sort(self.dates[mask])[-15]
+        self.assertEqual(self.index.last('matsui', 15), self.brute('matsui', last, 99999999))
+        self.assertEqual(self.index.last('matsui', 100), self.brute('matsui', 0, 99999999))
+
+    def test_window(self):
+        """
+        one window for every player
+        :return:
+        """
+        players, values = self.index.window(['ops', 'pa'], 20040410, 20040420)
+        self.assertEqual(players.tolist(), ['bonds', 'ichiro', 'matsui'])
+        for i, player in enumerate(players):
+            expected = compute(['ops', 'pa'], self.brute(player, 20040410, 20040420))
+            self.assertEqual(values['ops'][i], expected['ops'])
+            self.assertEqual(values['pa'][i], expected['pa'])
+
+    def test_window_range(self):
+        """
+        windows starting before the first game or ending after the last one
+        :return:
+        """
+        index = GameLogIndex(['a', 'a', 'b', 'b'], [20130801, 20130802, 20130801, 20130802],
+                             {'h': [1, 2, 1, 1], 'ab': [4, 4, 2, 2]})
+        players, values = index.window(['avg'], start=20130701)
+        self.assertEqual(values['avg'].tolist(), [0.375, 0.5])
+        players, values = index.window(['avg'], start=20130701, end=20130901)
+        self.assertEqual(values['avg'].tolist(), [0.375, 0.5])
+        players, values = index.window(['h'], start=20130701, end=20130731)
+        self.assertEqual(values['h'].tolist(), [0, 0])
+        players, values = index.window(['h'], start=20130901, end=20131001)
+        self.assertEqual(values['h'].tolist(), [0, 0])
+        self.assertEqual(index.counts('b', 20130101, 20131231), {'h': 2, 'ab': 4})
+        self.assertEqual(index.counts('b', 20130802, 20131231), {'h': 1, 'ab': 2})
+
+    def test_rolling(self):
+        """
+        rolling n games for every player-game
+        :return:
+        """
+        players, dates, values = self.index.rolling(5, ['ops'])
+        self.assertEqual(len(players), len(self.index))
+        for i in (0, 3, 4, 10, 30, 74):
+            player = players[i]
+            played = np.sort(self.dates[self.players == player])
+            position = np.searchsorted(played, dates[i])
+            if position < 4:
+                self.assertTrue(np.isnan(values['ops'][i]))
+            else:
+                expected = compute(['ops'], self.brute(player, played[position - 4], dates[i]))['ops']
+                self.assertEqual(values['ops'][i], expected)
+
+    def test_datetime(self):
+        """
+        datetime64 dates
+        :return:
+        """
+        dates = np.array(['2004-04-01', '2004-04-02', '2004-04-05'], dtype='datetime64[D]')
+        index = GameLogIndex(['a', 'a', 'a'], dates, {'h': [1, 2, 3], 'ab': [4, 4, 4]})
+        self.assertEqual(index.counts('a', np.datetime64('2004-04-02'), np.datetime64('2004-04-30')),
+                         {'h': 5, 'ab': 8})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+
+import numpy as np
+
+from sabr.incremental import IncrementalTable
+from sabr.league import PITCHING
+from sabr.registry import BATTING_STATS, PITCHING_STATS
+
+
+class TestIncrementalTable(unittest.TestCase):
+    """
+    IncrementalTable Tests
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(13)
+        size = 400
+        batting = {k: rng.randint(0, 30, size) for k in BATTING_STATS}
+        batting['h'] += batting['_2b'] + batting['_3b'] + batting['hr']
+        batting['ab'] += batting['h'] + batting['so'] + 50
+        pitching = {k: rng.randint(0, 40, size) for k in PITCHING_STATS}
+        pitching['ip_outs'] += 30
+        self.batting, self.pitching = batting, pitching
+        self.keys = [('p{}'.format(i), 2004) for i in range(size)]
+        self.leagues = np.array(['AL', 'NL'])[np.arange(size) % 2]
+        self.seasons = np.full(size, 2004)
+        self.batting_metrics = ['avg', 'obp', 'babip', 'woba_mlb', 'rc', 'wraa']
+        self.pitching_metrics = ['era', 'whip', 'fip', 'rsaa']
+
+    def tearDown(self):
+        pass
+
+    def build(self, table, metrics, side='batting'):
+        return IncrementalTable(self.keys, self.leagues, self.seasons, table, metrics, side=side)
+
+    def assertRebuilt(self, incremental, table, metrics, side='batting'):
+        rebuilt = self.build(table, metrics, side)
+        for metric in metrics:
+            np.testing.assert_array_equal(incremental.values[metric], rebuilt.values[metric])
+        for league in ('AL', 'NL'):
+            np.testing.assert_equal(tuple(incremental.league(league, 2004)), tuple(rebuilt.league(league, 2004)))
+
+    def test_batting(self):
+        """
+        corrections equal a full rebuild
+        :return:
+        """
+        incremental = self.build(self.batting, self.batting_metrics)
+        changes = incremental.correct(self.keys[2], {'h': 1})
+        changes = incremental.apply([(self.keys[5], {'h': -1, 'so': 1}), (self.keys[7], {'bb': 150})])
+        table = {k: v.copy() for k, v in self.batting.items()}
+        table['h'][2] += 1
+        table['h'][5] -= 1
+        table['so'][5] += 1
+        table['bb'][7] += 150
+        self.assertRebuilt(incremental, table, self.batting_metrics)
+        self.assertIn(self.keys[5], changes.players)
+        self.assertIn('avg', changes.players[self.keys[5]])
+        self.assertIn(('NL', 2004), changes.leagues)
+        self.assertNotIn(('AL', 2004), changes.leagues)
+        # wraa of the other NL rows moved with lg_woba and the wOBA scale, AL rows were not touched
+        others = [key for key in changes.players if key not in (self.keys[5], self.keys[7])]
+        self.assertGreater(len(others), 50)
+        for key in others:
+            self.assertEqual(int(key[0][1:]) % 2, 1)
+            self.assertEqual(list(changes.players[key]), ['wraa'])
+
+    def test_pitching(self):
+        """
+        FIP constant and league RA follow the corrections
+        :return:
+        """
+        incremental = self.build(self.pitching, self.pitching_metrics, PITCHING)
+        before = incremental.league('AL', 2004)
+        changes = incremental.correct(self.keys[0], {'er': 60, 'r': 60})
+        table = {k: v.copy() for k, v in self.pitching.items()}
+        table['er'][0] += 60
+        table['r'][0] += 60
+        self.assertRebuilt(incremental, table, self.pitching_metrics, PITCHING)
+        self.assertNotEqual(incremental.league('AL', 2004).c, before.c)
+        self.assertIn('c', changes.leagues[('AL', 2004)])
+        self.assertIn('fip', changes.players[self.keys[2]])
+
+    def test_noop(self):
+        """
+        a zero delta changes nothing
+        :return:
+        """
+        incremental = self.build(self.batting, self.batting_metrics)
+        changes = incremental.correct(self.keys[0], {'h': 0})
+        self.assertEqual(changes.players, {})
+        self.assertEqual(changes.leagues, {})
+        self.assertRaises(KeyError, incremental.correct, self.keys[0], {'rbi': 1})
+        self.assertEqual(incremental.counters(self.keys[0])['h'], self.batting['h'][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import io
+import unittest
+
+import numpy as np
+
+from sabr.ingest import read_csv, evaluate, arguments, CsvWriter, LAHMAN_BATTING, LAHMAN_PITCHING
+from sabr.stats import Stats
+from sabr.vectorized import Stats as BatchStats
+
+BATTING_CSV = u"""playerID,yearID,stint,teamID,lgID,G,AB,R,H,2B,3B,HR,RBI,SB,CS,BB,SO,IBB,HBP,SH,SF,GIDP
+bondsba01,2004,1,SFN,NL,147,373,129,135,27,3,45,101,6,1,232,41,120,9,0,3,5
+suzukic01,2004,1,SEA,AL,161,704,101,262,24,5,8,60,36,11,49,63,19,4,2,3,6
+ruthba01,1927,1,NYA,AL,151,540,158,192,29,8,60,165,7,6,137,89,,0,14,,
+"""
+
+PITCHING_CSV = (u"playerID,yearID,stint,teamID,lgID,W,L,G,GS,CG,SHO,SV,IPouts,H,ER,HR,BB,SO,BAOpp,ERA,IBB,WP,HBP,"
+                u"BK,BFP,GF,R,SH,SF,GIDP\n"
+                u"darviyu01,2013,1,TEX,AL,13,9,32,32,0,0,0,629,145,66,26,80,277,0.194,2.83,1,9,8,1,836,0,68,4,2,10\n")
+
+
+class TestIngest(unittest.TestCase):
+    """
+    CSV ingest Tests
+    """
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_read_csv(self):
+        """
+        column mapping and chunking
+        :return:
+        """
+        chunks = list(read_csv(io.StringIO(BATTING_CSV), LAHMAN_BATTING, chunk_size=2))
+        self.assertEqual([len(c['ab']) for c in chunks], [2, 1])
+        first = chunks[0]
+        self.assertEqual(first['player'].tolist(), ['bondsba01', 'suzukic01'])
+        self.assertEqual(first['_2b'].tolist(), [27, 24])
+        self.assertEqual(first['gidp'].tolist(), [5, 6])
+        self.assertEqual(first['ab'].dtype, np.int64)
+        # blanks(pre-1955 seasons) are 0
+        self.assertEqual(chunks[1]['ibb'].tolist(), [0])
+        self.assertNotIn('2B', first)
+
+    def test_arguments(self):
+        """
+        chunk columns to Stats parameters
+        :return:
+        """
+        chunk = next(read_csv(io.StringIO(BATTING_CSV), LAHMAN_BATTING))
+        self.assertEqual(BatchStats.obp(**arguments('obp', chunk)).tolist()[:2],
+                         [0.609, Stats.obp(262, 49, 4, 704, 3)])
+        pitching = next(read_csv(io.StringIO(PITCHING_CSV), LAHMAN_PITCHING))
+        self.assertEqual(pitching['ip_outs'].tolist(), [629])
+        self.assertEqual(BatchStats.ip(**arguments('ip', pitching)).tolist(), [209.7])
+
+    def test_unmapped(self):
+        """
+        every column under its own name
+        :return:
+        """
+        chunk = next(read_csv(io.StringIO(PITCHING_CSV), strings=('playerID', 'teamID', 'lgID')))
+        self.assertEqual(chunk['ERA'].tolist(), [2.83])
+        self.assertEqual(chunk['IPouts'].tolist(), [629])
+
+    def test_evaluate_and_write(self):
+        """
+        derived metrics written incrementally
+        :return:
+        """
+        out = io.StringIO()
+        chunks = read_csv(io.StringIO(BATTING_CSV), LAHMAN_BATTING, chunk_size=1)
+        with CsvWriter(out, ['player', 'season', 'avg', 'rc']) as writer:
+            for result in evaluate(chunks, ['avg', 'rc'], keep=('player', 'season')):
+                writer.write(result)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'player,season,avg,rc')
+        self.assertEqual(lines[1].split(',')[:3], ['bondsba01', '2004', '0.362'])
+        self.assertEqual(lines[2], 'suzukic01,2004,0.372,132.09')
+        self.assertEqual(len(lines), 4)
+
+    def test_bad_values(self):
+        """
+        counting stats that are not integers raise with their line and column
+        :return:
+        """
+        text = BATTING_CSV + u"mattido01,1987,1,NYA,AL,141,569,93,186,38,2,30,115,1,0,51,38,13,1,0,8,NA\n"
+        with self.assertRaises(ValueError) as context:
+            list(read_csv(io.StringIO(text), LAHMAN_BATTING, chunk_size=2))
+        self.assertEqual(str(context.exception), "line 5, column GIDP: 'NA' is not an integer")
+        with self.assertRaises(ValueError) as context:
+            list(read_csv(io.StringIO(BATTING_CSV.replace('373', '37.3')), LAHMAN_BATTING))
+        self.assertEqual(str(context.exception), "line 2, column AB: '37.3' is not an integer")
+        with self.assertRaises(ValueError) as context:
+            list(read_csv(io.StringIO(BATTING_CSV), LAHMAN_BATTING, blank=None))
+        self.assertEqual(str(context.exception), "line 4, column IBB: '' is not an integer")
+        # the types of an unmapped file come from its first chunk
+        with self.assertRaises(ValueError):
+            list(read_csv(io.StringIO(u'AB,H\n3,1\n4,x\n'), chunk_size=1))
+
+    def test_empty(self):
+        """
+        header only
+        :return:
+        """
+        self.assertEqual(list(read_csv(io.StringIO(u'AB,H\n'), LAHMAN_BATTING)), [])
+        self.assertEqual(list(read_csv(io.StringIO(u''))), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import tracemalloc
+import unittest
+
+import numpy as np
+
+from sabr import instrument, parallel
+from sabr.compiler import Kernel
+from sabr.evaluator import Evaluator, compute, evaluate
+from sabr.events import PLATE_APPEARANCES
+from sabr.stats import Stats
+from sabr.streaming import Accumulator
+from sabr.vectorized import Stats as BatchStats
+
+
+class TestInstrument(unittest.TestCase):
+    """
+    Instrumentation Tests
+    """
+
+    def setUp(self):
+        instrument.reset()
+        self.table = {'ab': np.array([10, 20, 0]), 'h': np.array([3, 5, 0])}
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def test_disabled(self):
+        """
+        disable() puts back the very same functions
+        :return:
+        """
+        originals = [Stats.__dict__['avg'], BatchStats.__dict__['rc'], Evaluator.__dict__['_eval'],
+                     Evaluator.__dict__['evaluate'], Kernel.__dict__['__call__'],
+                     Accumulator.__dict__['plate_appearance'], parallel.recompute]
+        instrument.enable()
+        self.assertTrue(instrument.enabled())
+        self.assertIsNot(Stats.__dict__['avg'], originals[0])
+        instrument.disable()
+        self.assertFalse(instrument.enabled())
+        restored = [Stats.__dict__['avg'], BatchStats.__dict__['rc'], Evaluator.__dict__['_eval'],
+                    Evaluator.__dict__['evaluate'], Kernel.__dict__['__call__'],
+                    Accumulator.__dict__['plate_appearance'], parallel.recompute]
+        for original, current in zip(originals, restored):
+            self.assertIs(current, original)
+        Stats.avg(3, 10)
+        self.assertEqual(instrument.snapshot(), {})
+
+    def test_engines(self):
+        """
+        calls, rows and time per engine and metric
+        :return:
+        """
+        with instrument.instrumented(), np.errstate(divide='ignore', invalid='ignore'):
+            self.assertEqual(Stats.avg(3, 10), 0.3)
+            with self.assertRaises(ZeroDivisionError):
+                Stats.avg(0, 0)
+            BatchStats.avg(self.table['h'][:2], self.table['ab'][:2])
+            compute(['avg'], self.table)
+            evaluate(['avg', 'slg'], {'ab': [10, 0], 'h': [3, 0], '_2b': [1, 0], '_3b': [0, 0], 'hr': [1, 0]})
+            accumulator = Accumulator()
+            for event in PLATE_APPEARANCES[:4]:
+                accumulator.plate_appearance('b', 'p', event)
+            parallel.recompute(['avg'], self.table, workers=1)
+        counters = instrument.snapshot()
+        self.assertEqual(counters[('scalar', 'avg')]['calls'], 2)
+        self.assertEqual(counters[('scalar', 'avg')]['rows'], 2)
+        self.assertEqual(counters[('batch', 'avg')]['rows'], 2)
+        # formulas run by compute() directly, inside recompute() and by evaluate()
+        self.assertEqual(counters[('evaluator', 'avg')]['calls'], 3)
+        self.assertEqual(counters[('evaluator', 'avg')]['rows'], 8)
+        self.assertEqual(counters[('evaluator', 'slg')]['rows'], 2)
+        self.assertEqual(counters[('evaluate', 'avg,slg')]['rows'], 2)
+        self.assertEqual(counters[('streaming', 'plate_appearance')]['calls'], 4)
+        self.assertEqual(counters[('parallel', 'avg')]['rows'], 3)
+        for values in counters.values():
+            self.assertEqual(list(values), ['calls', 'rows', 'seconds', 'allocated_bytes', 'retained_bytes',
+                                            'peak_bytes'])
+            self.assertGreater(values['seconds'], 0)
+            self.assertGreaterEqual(values['allocated_bytes'], values['peak_bytes'])
+            self.assertGreaterEqual(values['peak_bytes'], 0)
+        seconds = [values['seconds'] for values in counters.values()]
+        self.assertEqual(seconds, sorted(seconds, reverse=True))
+
+    def test_results(self):
+        """
+        instrumented engines return what they return without it
+        :return:
+        """
+        data = {'ab': [500, 0], 'h': [150, 0], '_2b': [30, 0], '_3b': [2, 0], 'hr': [20, 0], 'bb': [60, 0],
+                'hbp': [4, 0], 'sf': [5, 0]}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected = compute(['ops', 'slg'], data)
+        with instrument.instrumented(), np.errstate(divide='ignore', invalid='ignore'):
+            result = compute(['ops', 'slg'], data)
+            self.assertEqual(Stats.rc27.__name__, 'rc27')
+        np.testing.assert_equal(result, expected)
+        self.assertIn(('evaluator', 'tb'), instrument.snapshot())
+
+    def test_memory(self):
+        """
+        numpy buffers are traced: temporaries count in the peak, results held by the caller are retained
+        :return:
+        """
+        size = 100000
+        columns = [np.ones(size, dtype=np.int64) for _ in range(12)]
+        self.assertFalse(tracemalloc.is_tracing())
+        with instrument.instrumented():
+            self.assertTrue(tracemalloc.is_tracing())
+            results = [BatchStats.rc(*columns) for _ in range(5)]
+            evaluate(['avg'], {'ab': np.full(size, 4), 'h': np.ones(size, dtype=np.int64)})
+        self.assertFalse(tracemalloc.is_tracing())
+        counters = instrument.snapshot()
+        rc = counters[('batch', 'rc')]
+        # every call holds at least its float64 result and frees its temporaries
+        self.assertGreaterEqual(rc['retained_bytes'], 5 * size * 8)
+        self.assertGreater(rc['allocated_bytes'], rc['retained_bytes'])
+        self.assertGreaterEqual(rc['peak_bytes'], size * 8)
+        # the enclosing call sees the peaks of the formulas it runs
+        self.assertGreaterEqual(counters[('evaluate', 'avg')]['peak_bytes'],
+                                counters[('evaluator', 'avg')]['peak_bytes'])
+        self.assertEqual(len(results), 5)
+        tracemalloc.start()
+        try:
+            with instrument.instrumented():
+                Stats.avg(3, 10)
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+    def test_hook(self):
+        """
+        the profiler hook gets one call in sample_every
+        :return:
+        """
+        samples = []
+        with instrument.instrumented(hook=lambda *sample: samples.append(sample), sample_every=3):
+            for _ in range(10):
+                Stats.avg(3, 10)
+        self.assertEqual(len(samples), 3)
+        self.assertEqual(samples[0][:2], ('scalar', 'avg'))
+        self.assertEqual(samples[0][3], 1)
+        with self.assertRaises(ValueError):
+            instrument.enable(sample_every=0)
+
+    def test_prometheus(self):
+        """
+        text exposition format
+        :return:
+        """
+        with instrument.instrumented():
+            Stats.avg(3, 10)
+            Stats.avg(4, 10)
+        text = instrument.prometheus()
+        self.assertIn('# TYPE sabr_metric_calls_total counter\n', text)
+        self.assertIn('sabr_metric_calls_total{engine="scalar",metric="avg"} 2\n', text)
+        self.assertIn('sabr_metric_rows_total{engine="scalar",metric="avg"} 2\n', text)
+        self.assertIn('sabr_metric_seconds_total{engine="scalar",metric="avg"} ', text)
+        self.assertIn('sabr_metric_allocated_bytes_total{engine="scalar",metric="avg"} ', text)
+        self.assertIn('# TYPE sabr_metric_peak_bytes gauge\n', text)
+        self.assertIn('sabr_metric_retained_bytes{engine="scalar",metric="avg"} ', text)
+        self.assertTrue(instrument.prometheus(prefix='x').startswith('# HELP x_calls_total'))
+
+
+if __name__ == '__main__':
+    unittest.main()
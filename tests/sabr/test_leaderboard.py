@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.leaderboard import Leaderboard, qualified, top
+from sabr.league import PITCHING
+from sabr.registry import BATTING_STATS, PITCHING_STATS
+
+
+class TestLeaderboard(unittest.TestCase):
+    """
+    Leaderboard Tests
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(14)
+        size = 600
+        batting = {k: rng.randint(0, 40, size) for k in BATTING_STATS}
+        batting['h'] += batting['_2b'] + batting['_3b'] + batting['hr'] + rng.randint(0, 100, size)
+        batting['ab'] += batting['h'] + batting['so'] + rng.randint(0, 400, size)
+        pitching = {k: rng.randint(0, 60, size) for k in PITCHING_STATS}
+        pitching['ip_outs'] += rng.randint(0, 600, size)
+        self.batting, self.pitching = batting, pitching
+        self.players = np.array(['p{:03d}'.format(i) for i in range(size)])
+
+    def tearDown(self):
+        pass
+
+    def expected(self, metric, table, k, games, side='batting'):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = compute([metric], table)[metric]
+        mask = qualified(table, games, side)
+        reverse = metric not in ('era', 'fip', 'whip')
+        rows = [i for i in np.flatnonzero(mask) if values[i] == values[i]]
+        rows.sort(key=lambda i: ((-values[i] if reverse else values[i]), self.players[i]))
+        return [(self.players[i], values[i]) for i in rows[:k]]
+
+    def test_qualified(self):
+        """
+        3.1 PA / 1 IP per team game
+        :return:
+        """
+        self.assertTrue(qualified({'ab': 450, 'bb': 50, 'hbp': 3}, 162))
+        self.assertFalse(qualified({'ab': 450, 'bb': 50, 'hbp': 1}, 162))
+        self.assertTrue(qualified({'ip_outs': 486}, 162, PITCHING))
+        self.assertFalse(qualified({'ip_outs': 485}, 162, PITCHING))
+
+    def test_top(self):
+        """
+        partial selection equals a full sort
+        :return:
+        """
+        for metric in ('avg', 'ops', 'woba_mlb'):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = compute([metric], self.batting)[metric]
+            mask = qualified(self.batting, 100)
+            self.assertEqual(top(metric, values, self.players, 20, mask), self.expected(metric, self.batting, 20, 100))
+        for metric in ('era', 'fip', 'whip'):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = compute([metric], self.pitching)[metric]
+            mask = qualified(self.pitching, 100, PITCHING)
+            self.assertEqual(top(metric, values, self.players, 20, mask),
+                             self.expected(metric, self.pitching, 20, 100, PITCHING))
+
+    def test_ties(self):
+        """
+        ties broken by player id
+        :return:
+        """
+        values = [0.300, 0.300, 0.310, 0.300]
+        self.assertEqual(top('avg', values, ['c', 'a', 'd', 'b'], 3), [('d', 0.31), ('a', 0.3), ('b', 0.3)])
+
+    def test_incremental(self):
+        """
+        updates equal a rebuild
+        :return:
+        """
+        board = Leaderboard.from_table('ops', self.players, self.batting, 100)
+        self.assertEqual(board.top(15), self.expected('ops', self.batting, 15, 100))
+        table = {k: v.copy() for k, v in self.batting.items()}
+        leader = board.top(1)[0][0]
+        row = self.players.tolist().index(leader)
+        board.add(leader, {'ab': 60})
+        table['ab'][row] += 60
+        row = 7
+        board.add(self.players[row].item(), {'hr': 30, 'h': 30, 'ab': 500})
+        table['hr'][row] += 30
+        table['h'][row] += 30
+        table['ab'][row] += 500
+        self.assertEqual(board.top(15), self.expected('ops', table, 15, 100))
+        self.assertEqual(len(board), len(self.expected('ops', table, 10 ** 6, 100)))
+        best = board.top(1)[0][0]
+        self.assertEqual(board.rank(best), 1)
+        board.set_games(10 ** 6)
+        self.assertEqual(board.top(5), [])
+        self.assertIsNone(board.rank(best))
+
+    def test_many_updates(self):
+        """
+        ranks and top k stay exact through many updates(blocks split and empty)
+        :return:
+        """
+        rng = np.random.RandomState(4)
+        board = Leaderboard.from_table('avg', self.players, self.batting, 0)
+        table = {k: v.copy() for k, v in self.batting.items()}
+        for _ in range(1500):
+            row = rng.randint(len(self.players))
+            hits = int(rng.randint(0, 5))
+            delta = {'h': hits, 'ab': hits + int(rng.randint(0, 10))}
+            if rng.rand() < 0.1:
+                delta['ab'] = -int(table['ab'][row])
+                delta['h'] = -int(table['h'][row])
+            board.add(self.players[row].item(), delta)
+            table['h'][row] += delta['h']
+            table['ab'][row] += delta['ab']
+        expected = self.expected('avg', table, 10 ** 6, 0)
+        self.assertEqual(len(board), len(expected))
+        self.assertEqual(board.top(len(expected)), expected)
+        for position in (0, 1, 100, len(expected) - 1):
+            player, value = expected[position]
+            self.assertEqual(board.rank(player), [v for _, v in expected].index(value) + 1)
+
+    def test_pitching(self):
+        """
+        lower is better
+        :return:
+        """
+        board = Leaderboard.from_table('era', self.players, self.pitching, 50)
+        self.assertEqual(board.top(10), self.expected('era', self.pitching, 10, 50, PITCHING))
+        board.update('new', {'ip_outs': 600, 'er': 0})
+        self.assertEqual(board.top(1), [('new', 0.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+
+import numpy as np
+
+from sabr.league import LeagueContext, BATTING, PITCHING, group
+from sabr.registry import WOBA_MLB, WOBA_MLB_SCALE
+from sabr.stats import Stats
+
+
+class TestLeagueContext(unittest.TestCase):
+    """
+    LeagueContext Tests
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(5)
+        size = 600
+        self.leagues = np.array(['AL', 'NL'])[rng.randint(0, 2, size)]
+        self.seasons = rng.randint(2012, 2015, size)
+        batting = {k: rng.randint(0, 30, size) for k in ('_2b', '_3b', 'hr', 'bb', 'ibb', 'hbp', 'sf', 'sh', 'so',
+                                                         'r')}
+        batting['h'] = batting['_2b'] + batting['_3b'] + batting['hr'] + rng.randint(0, 120, size)
+        batting['ab'] = batting['h'] + batting['so'] + rng.randint(1, 300, size)
+        pitching = {k: rng.randint(0, 60, size) for k in ('er', 'hr', 'bb', 'ibb', 'hbp', 'so', 'h')}
+        pitching['r'] = pitching['er'] + rng.randint(0, 10, size)
+        pitching['ip_outs'] = rng.randint(30, 600, size)
+        self.batting, self.pitching = batting, pitching
+        self.context = LeagueContext()
+        self.context.update_grouped(self.leagues, self.seasons, batting, BATTING)
+        self.context.update_grouped(self.leagues, self.seasons, pitching, PITCHING)
+
+    def tearDown(self):
+        pass
+
+    def test_totals(self):
+        """
+        grouped totals equal per league-season sums
+        :return:
+        """
+        context = LeagueContext()
+        for league, season in self.context.keys():
+            mask = (self.leagues == league) & (self.seasons == season)
+            context.update(league, season, {k: v[mask] for k, v in self.batting.items()})
+            self.assertEqual(context.totals(league, season), self.context.totals(league, season))
+            self.assertEqual(self.context.totals(league, season)['hr'], int(self.batting['hr'][mask].sum()))
+        self.assertEqual(len(self.context.keys()), 6)
+
+    def test_constants(self):
+        """
+        FIP constant, lg_wOBA, wOBA scale and run environment
+        :return:
+        """
+        league = self.context.get('AL', 2013)
+        pit = self.context.totals('AL', 2013, PITCHING)
+        ip = pit['ip_outs'] / 3.0
+        self.assertAlmostEqual(league.era, 9.0 * pit['er'] / ip)
+        self.assertAlmostEqual(league.ra9, 9.0 * pit['r'] / ip)
+        # FIP of the league as a whole equals its ERA
+        fip = (13.0 * pit['hr'] + 3.0 * (pit['bb'] + pit['hbp'] - pit['ibb']) - 2.0 * pit['so']) / ip + league.c
+        self.assertAlmostEqual(fip, league.era)
+        bat = self.context.totals('AL', 2013)
+        single = Stats.single(bat['h'], bat['hr'], bat['_2b'], bat['_3b'])
+        lg_woba = Stats.woba_mlb(bat['bb'], bat['hbp'], single, bat['_2b'], bat['_3b'], bat['hr'], bat['ab'],
+                                 bat['sf'], bat['ibb'])
+        lg_obp = Stats.obp(bat['h'], bat['bb'], bat['hbp'], bat['ab'], bat['sf'])
+        self.assertEqual(league.lg_woba, lg_woba)
+        self.assertEqual(league.lg_obp, lg_obp)
+        # league OBP over the league wOBA of the unscaled run values(weights / WOBA_MLB_SCALE), unrounded
+        runs = {k: v / WOBA_MLB_SCALE for k, v in WOBA_MLB.items()}
+        numerator = (runs['const_u_bb'] * (bat['bb'] - bat['ibb']) + runs['const_u_hbp'] * bat['hbp']
+                     + runs['const_u_1b'] * single + runs['const_u_2b'] * bat['_2b']
+                     + runs['const_u_3b'] * bat['_3b'] + runs['const_u_hr'] * bat['hr'])
+        raw_woba = numerator / (bat['ab'] + bat['bb'] - bat['ibb'] + bat['hbp'] + bat['sf'])
+        raw_obp = (bat['h'] + bat['bb'] + bat['hbp']) / float(bat['ab'] + bat['bb'] + bat['hbp'] + bat['sf'])
+        self.assertAlmostEqual(league.woba_scale, raw_obp / raw_woba)
+        pa = Stats.pa(bat['ab'], bat['bb'], bat['hbp'], bat['sf'], bat['sh'])
+        self.assertAlmostEqual(league.r_pa, bat['r'] / float(pa))
+
+    def test_woba_scale(self):
+        """
+        wOBA scale of real league totals, and of weights on another scale
+        :return:
+        """
+        mlb_2013 = {'ab': 165705, 'h': 42093, '_2b': 8222, '_3b': 772, 'hr': 4661, 'bb': 14640, 'ibb': 1014,
+                    'hbp': 1536, 'sf': 1197, 'sh': 1239, 'r': 20255}
+        context = LeagueContext()
+        context.update('MLB', 2013, mlb_2013)
+        # published: 1.277
+        self.assertAlmostEqual(context.get('MLB', 2013).woba_scale, 1.28, delta=0.02)
+        doubled = LeagueContext({k: 2 * v for k, v in WOBA_MLB.items()}, 2 * WOBA_MLB_SCALE)
+        doubled.update('MLB', 2013, mlb_2013)
+        self.assertAlmostEqual(doubled.get('MLB', 2013).woba_scale, context.get('MLB', 2013).woba_scale)
+
+    def test_batch(self):
+        """
+        batch fip, wraa and rsaa with per-row league context
+        :return:
+        """
+        p = self.pitching
+        ip = np.round(p['ip_outs'] / 3.0, 1)
+        fip = self.context.fip(self.leagues, self.seasons, p['hr'], p['bb'], p['hbp'], p['so'], ip, p['ibb'])
+        rsaa = self.context.rsaa(self.leagues, self.seasons, np.full(len(ip), 3.5), ip)
+        woba = np.linspace(0.25, 0.45, len(ip))
+        wraa = self.context.wraa(self.leagues, self.seasons, woba, np.full(len(ip), 500))
+        for i in (0, 17, 250, 599):
+            league = self.context.get(self.leagues[i].item(), self.seasons[i].item())
+            self.assertEqual(fip[i], Stats.fip(p['hr'][i].item(), p['bb'][i].item(), p['hbp'][i].item(),
+                                               p['so'][i].item(), ip[i].item(), p['ibb'][i].item(), c=league.c))
+            self.assertEqual(rsaa[i], Stats.rsaa(3.5, league.ra9, ip[i].item()))
+            self.assertEqual(wraa[i], Stats.wraa(woba[i].item(), league.lg_woba, 500, league.woba_scale))
+
+    def test_cache(self):
+        """
+        cached until that league-season changes
+        :return:
+        """
+        league = self.context.get('NL', 2014)
+        self.assertIs(self.context.get('NL', 2014), league)
+        other = self.context.get('AL', 2014)
+        self.context.update('NL', 2014, {'er': 10}, PITCHING)
+        self.assertIsNot(self.context.get('NL', 2014), league)
+        self.assertGreater(self.context.get('NL', 2014).era, league.era)
+        self.assertIs(self.context.get('AL', 2014), other)
+
+    def test_group(self):
+        """
+        (league, season) grouping
+        :return:
+        """
+        keys, index = group(['NL', 'AL', 'NL'], [2004, 2004, 2004])
+        self.assertEqual(keys, [('AL', 2004), ('NL', 2004)])
+        self.assertEqual(index.tolist(), [1, 0, 1])
+        self.assertTrue(np.isnan(LeagueContext().get('CL', 2016).c))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import sys
+import unittest
+
+from sabr.lines import BattingLine, LineTable, PitchingLine
+from sabr.stats import Stats
+
+
+class TestLines(unittest.TestCase):
+    """
+    BattingLine / PitchingLine Tests
+    """
+
+    def setUp(self):
+        # 2004 Ichiro Suzuki
+        self.batting = dict(ab=704, h=262, _2b=24, _3b=5, hr=8, bb=49, ibb=19, hbp=4, sf=3, sh=2, so=63, sb=36,
+                            cs=11, gidp=6)
+        # 2013 Yu Darvish
+        self.pitching = dict(ip_outs=629, h=145, hr=26, bb=80, ibb=1, hbp=8, so=277, er=65, bfp=841)
+
+    def tearDown(self):
+        pass
+
+    def test_batting(self):
+        """
+        derived stats equal Stats
+        :return:
+        """
+        b = BattingLine(**self.batting)
+        single = Stats.single(262, 8, 24, 5)
+        tb = Stats.tb(single, 8, 24, 5)
+        self.assertEqual(b.single, single)
+        self.assertEqual(b.tb, tb)
+        self.assertEqual(b.pa, Stats.pa(704, 49, 4, 3, 2))
+        self.assertEqual(b.obp, Stats.obp(262, 49, 4, 704, 3))
+        self.assertEqual(b.slg, Stats.slg(tb, 704))
+        self.assertEqual(b.woba_mlb, Stats.woba_mlb(49, 4, single, 24, 5, 8, 704, 3, 19))
+        self.assertEqual(b.rc, Stats.rc(tb, 262, 49, 4, 11, 6, 3, 2, 36, 63, 704, 19))
+        self.assertEqual(b.rc2002, Stats.rc2002(262, 49, 4, 11, 6, 3, 2, 36, 63, 704, 19, single, 24, 5, 8))
+
+    def test_pitching(self):
+        """
+        derived stats equal Stats
+        :return:
+        """
+        p = PitchingLine(**self.pitching)
+        ip = Stats.ip(629)
+        self.assertEqual(p.ip, ip)
+        self.assertEqual(p.era, Stats.era(65, ip))
+        self.assertEqual(p.fip, Stats.fip(26, 80, 8, 277, ip, ibb=1))
+        self.assertEqual(p.stat('fip', {'c': 3.05}), Stats.fip(26, 80, 8, 277, ip, ibb=1, c=3.05))
+        self.assertEqual(p.fip, Stats.fip(26, 80, 8, 277, ip, ibb=1))
+
+    def test_cache(self):
+        """
+        cached until a counter changes
+        :return:
+        """
+        b = BattingLine(**self.batting)
+        self.assertIsNone(b._cache)
+        avg = b.avg
+        self.assertEqual(b._cache, {'avg': avg})
+        b.h += 1
+        self.assertIsNone(b._cache)
+        self.assertEqual(b.avg, Stats.avg(263, 704))
+
+    def test_zero_division(self):
+        """
+        raises like Stats
+        :return:
+        """
+        self.assertRaises(ZeroDivisionError, lambda: BattingLine().avg)
+        self.assertRaises(ZeroDivisionError, lambda: PitchingLine().era)
+
+    def test_unknown(self):
+        """
+        unknown counting stat
+        :return:
+        """
+        self.assertRaises(TypeError, BattingLine, ip_outs=3)
+        self.assertRaises(AttributeError, setattr, BattingLine(), 'rbi', 1)
+
+    def test_memory(self):
+        """
+        smaller than a dict
+        :return:
+        """
+        b = BattingLine(**self.batting)
+        self.assertLess(sys.getsizeof(b) + sys.getsizeof(b._values), sys.getsizeof(dict(self.batting)))
+        self.assertFalse(hasattr(b, '__dict__'))
+
+    def test_table(self):
+        """
+        array-backed lines
+        :return:
+        """
+        table = LineTable.from_columns(BattingLine, {k: [v, 0] for k, v in self.batting.items()})
+        self.assertEqual(len(table), 2)
+        line = table[0]
+        self.assertEqual(line.as_dict(), dict(BattingLine(**self.batting).as_dict()))
+        self.assertEqual(line.rc, BattingLine(**self.batting).rc)
+        line.h = 100
+        self.assertEqual(table.column('h').tolist(), [100, 0])
+        values = table.compute(['avg', 'woba_mlb'])
+        self.assertEqual(values['avg'][0], Stats.avg(100, 704))
+        self.assertTrue(values['avg'][1] != values['avg'][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
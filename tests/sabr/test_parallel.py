@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.parallel import recompute, shards
+
+
+class TestParallel(unittest.TestCase):
+    """
+    Sharded recompute Tests
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(21)
+        size = 5000
+        table = {k: rng.randint(0, 30, size).astype(np.int32) for k in (
+            '_2b', '_3b', 'hr', 'bb', 'ibb', 'hbp', 'sf', 'sh', 'so', 'sb', 'cs', 'gidp'
+        )}
+        table['h'] = table['_2b'] + table['_3b'] + table['hr'] + rng.randint(0, 150, size).astype(np.int32)
+        table['ab'] = table['h'] + table['so'] + rng.randint(0, 300, size).astype(np.int32)
+        self.table = table
+        self.leagues = np.array(['AL', 'NL', 'CL', 'PL'])[rng.randint(0, 4, size)]
+        self.seasons = rng.randint(1990, 2000, size)
+        self.metrics = ['avg', 'ops', 'rc', 'woba_mlb', 'pa']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.serial = compute(self.metrics, table)
+
+    def tearDown(self):
+        pass
+
+    def assertSerial(self, result):
+        for metric in self.metrics:
+            self.assertEqual(result[metric].dtype, self.serial[metric].dtype)
+            np.testing.assert_array_equal(result[metric], self.serial[metric])
+
+    def test_row_ranges(self):
+        """
+        row range shards
+        :return:
+        """
+        self.assertSerial(recompute(self.metrics, self.table, chunk_size=700, workers=2))
+
+    def test_league_season(self):
+        """
+        (league, season) shards, results in input order
+        :return:
+        """
+        self.assertSerial(recompute(self.metrics, self.table, chunk_size=300, workers=2, leagues=self.leagues,
+                                    seasons=self.seasons))
+
+    def test_serial(self):
+        """
+        one worker computes in process
+        :return:
+        """
+        self.assertSerial(recompute(self.metrics, self.table, workers=1))
+
+    def test_shards(self):
+        """
+        shard boundaries
+        :return:
+        """
+        order, ranges = shards(10, 4)
+        self.assertIsNone(order)
+        self.assertEqual(ranges, [(0, 4), (4, 8), (8, 10)])
+        order, ranges = shards(5, 2, ['NL', 'AL', 'NL', 'AL', 'NL'], [2004] * 5)
+        self.assertEqual(order.tolist(), [1, 3, 0, 2, 4])
+        self.assertEqual(ranges, [(0, 2), (2, 4), (4, 5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
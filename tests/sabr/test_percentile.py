@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.percentile import PercentileIndex
+from sabr.registry import BATTING_STATS
+
+
+class TestPercentileIndex(unittest.TestCase):
+    """
+    PercentileIndex Tests
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(15)
+        size = 800
+        table = {k: rng.randint(0, 40, size) for k in BATTING_STATS}
+        table['h'] += table['_2b'] + table['_3b'] + table['hr'] + rng.randint(0, 100, size)
+        table['ab'] += table['h'] + table['so'] + rng.randint(0, 400, size)
+        self.table = table
+        self.players = np.arange(size)
+        self.leagues = np.array(['AL', 'NL'])[rng.randint(0, 2, size)]
+        self.seasons = rng.randint(2003, 2005, size)
+        self.metrics = ['avg', 'ops', 'woba_mlb']
+        self.index = PercentileIndex.from_table(self.metrics, self.players, self.leagues, self.seasons, table)
+        self.values = compute(self.metrics, table)
+
+    def tearDown(self):
+        pass
+
+    def scan(self, league, season, metric, value, lower=False):
+        rows = (self.leagues == league) & (self.seasons == season)
+        values = self.values[metric][rows]
+        worse = np.sum(values > value) if lower else np.sum(values < value)
+        return 100.0 * (worse + 0.5 * np.sum(values == value)) / len(values)
+
+    def test_percentile(self):
+        """
+        binary search equals a league scan
+        :return:
+        """
+        for row in range(0, 800, 37):
+            league, season = self.leagues[row].item(), self.seasons[row].item()
+            for metric in self.metrics:
+                value = self.values[metric][row]
+                self.assertAlmostEqual(self.index.percentile(league, season, metric, value),
+                                       self.scan(league, season, metric, value))
+        self.assertEqual(self.index.keys(), [('AL', 2003), ('AL', 2004), ('NL', 2003), ('NL', 2004)])
+
+    def test_rank(self):
+        """
+        1 + better values, lower is better for ERA
+        :return:
+        """
+        ops = self.values['ops'][(self.leagues == 'AL') & (self.seasons == 2004)]
+        self.assertEqual(self.index.rank('AL', 2004, 'ops', ops.max()), 1)
+        self.assertEqual(self.index.rank('AL', 2004, 'ops', ops.min()), len(ops) - np.sum(ops == ops.min()) + 1)
+        index = PercentileIndex(['era'])
+        index.update([1, 2, 3], ['AL'] * 3, [2004] * 3, {'era': [2.5, 3.0, 4.0]})
+        self.assertEqual(index.rank('AL', 2004, 'era', 2.5), 1)
+        self.assertEqual(index.percentile('AL', 2004, 'era', 4.0), 100.0 * 0.5 / 3)
+
+    def test_bulk(self):
+        """
+        percentiles for every player and metric
+        :return:
+        """
+        result = self.index.percentiles(self.leagues, self.seasons, self.values)
+        for row in range(0, 800, 53):
+            league, season = self.leagues[row].item(), self.seasons[row].item()
+            for metric in self.metrics:
+                self.assertAlmostEqual(result[metric][row], self.scan(league, season, metric, self.values[metric][row]))
+        result = self.index.percentiles(['CL', 'AL'], [2004, 2004], {'avg': [0.3, np.nan]})
+        self.assertTrue(np.isnan(result['avg']).all())
+
+    def test_update(self):
+        """
+        new games refresh the touched league-season
+        :return:
+        """
+        rows = np.flatnonzero((self.leagues == 'NL') & (self.seasons == 2003))[:5]
+        self.table['h'][rows] += 50
+        self.values = compute(self.metrics, self.table)
+        self.index.update(self.players[rows], self.leagues[rows], self.seasons[rows],
+                          {m: v[rows] for m, v in self.values.items()})
+        fresh = PercentileIndex.from_table(self.metrics, self.players, self.leagues, self.seasons, self.table)
+        for metric in self.metrics:
+            np.testing.assert_array_equal(self.index.percentiles(self.leagues, self.seasons, self.values)[metric],
+                                          fresh.percentiles(self.leagues, self.seasons, self.values)[metric])
+
+    def test_non_finite(self):
+        """
+        inf and NaN stay out of the distributions
+        :return:
+        """
+        index = PercentileIndex(['era'])
+        index.update([1, 2, 3, 4], ['AL'] * 4, [2004] * 4, {'era': [2.5, 3.0, np.inf, np.nan]})
+        self.assertEqual(index.percentile('AL', 2004, 'era', 3.0), 100.0 * 0.5 / 2)
+        self.assertEqual(index.rank('AL', 2004, 'era', 3.0), 2)
+        index.update([3, 1], ['AL'] * 2, [2004] * 2, {'era': [2.0, np.inf]})
+        self.assertEqual(index.percentile('AL', 2004, 'era', 2.0), 100.0 * 1.5 / 2)
+
+    def test_repeated(self):
+        """
+        sorted insertion equals a fresh build after repeated and tied updates
+        :return:
+        """
+        rng = np.random.RandomState(3)
+        index = PercentileIndex(['avg'])
+        latest = {}
+        for _ in range(20):
+            players = rng.randint(0, 30, 15)
+            avg = rng.randint(0, 5, 15) / 4.0
+            avg[rng.rand(15) < 0.1] = np.inf
+            index.update(players, ['AL'] * 15, [2004] * 15, {'avg': avg})
+            latest.update(zip(players.tolist(), avg.tolist()))
+        values = np.array(sorted(v for v in latest.values() if np.isfinite(v)))
+        np.testing.assert_array_equal(index._distributions[('AL', 2004)].sorted['avg'], values)
+
+
+if __name__ == '__main__':
+    unittest.main()
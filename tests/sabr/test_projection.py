@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+
+import numpy as np
+
+from sabr.evaluator import compute
+from sabr.projection import align, project, projections
+from sabr.registry import BATTING_STATS, PITCHING_STATS
+
+
+class TestProjection(unittest.TestCase):
+    """
+    Marcel projection Tests
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(21)
+        size = 120
+        self.players = np.array(['p{}'.format(i) for i in rng.randint(0, 30, size)])
+        self.seasons = rng.randint(2011, 2016, size)
+        self.ages = 20 + np.array([int(p[1:]) for p in self.players]) + (self.seasons - 2011)
+        table = {k: rng.randint(0, 20, size) for k in BATTING_STATS + PITCHING_STATS}
+        table['ab'] = table['h'] + table['so'] + rng.randint(50, 300, size)
+        table['h'] = table['h'] + table['hr'] + table['_2b'] + table['_3b']
+        table['bb'] = table['bb'] + table['ibb']
+        table['ip_outs'] = rng.randint(0, 300, size)
+        self.table = table
+
+    def tearDown(self):
+        pass
+
+    def marcel(self, player, season, fields, weights, regression, playing_time, time, age=None, directions=None):
+        """
+        player by player reference
+        """
+        rows = [(self.seasons == season - 1 - y) for y in range(3)]
+        league = []
+        for mask in rows:
+            total = time[mask].sum()
+            league.append({f: self.table[f][mask].sum() / total for f in fields})
+        mine = [mask & (self.players == player) for mask in rows]
+        times = [time[mask].sum() for mask in mine]
+        weighted = sum(w * t for w, t in zip(weights, times))
+        result = {}
+        for f in fields:
+            own = sum(w * self.table[f][mask].sum() for w, mask in zip(weights, mine))
+            mean = sum(w * t * lg[f] for w, t, lg in zip(weights, times, league)) / weighted
+            rate = (own + regression * mean) / (weighted + regression)
+            if age is not None:
+                adjustment = (29 - age) * (0.006 if age < 29 else 0.003)
+                rate *= 1 + adjustment * directions.get(f, 1)
+            result[f] = rate * (playing_time[0] * times[0] + playing_time[1] * times[1] + playing_time[2])
+        return result
+
+    def test_align(self):
+        """
+        padded player x season x stat arrays
+        :return:
+        """
+        keys, cube = align(self.players, self.seasons, self.table, 2016, ('h', 'hr'))
+        self.assertEqual(cube.shape, (len(keys), 3, 2))
+        player = keys[0]
+        for y in range(3):
+            mask = (self.players == player) & (self.seasons == 2015 - y)
+            self.assertEqual(cube[0, y, 0], self.table['h'][mask].sum())
+        self.assertEqual(cube.sum(), sum(self.table[f][(self.seasons >= 2013)].sum() for f in ('h', 'hr')))
+
+    def test_batting(self):
+        """
+        batting projection against the player by player reference
+        :return:
+        """
+        keys, projected = project(self.players, self.seasons, self.table, 2016, ages=self.ages)
+        time = sum(self.table[f] for f in ('ab', 'bb', 'hbp', 'sf', 'sh'))
+        directions = {'so': -1, 'cs': -1, 'gidp': -1, 'ab': 0, 'sf': 0, 'sh': 0}
+        for i in (0, 7, len(keys) - 1):
+            player = keys[i]
+            age = self.ages[self.players == player][0] + 2016 - self.seasons[self.players == player][0]
+            expected = self.marcel(player, 2016, BATTING_STATS, (5, 4, 3), 1200, (0.5, 0.1, 200), time, age,
+                                   directions)
+            for field in BATTING_STATS:
+                self.assertAlmostEqual(projected[field][i], expected[field], places=6)
+        keys, plain = project(self.players, self.seasons, self.table, 2016)
+        expected = self.marcel(keys[3], 2016, BATTING_STATS, (5, 4, 3), 1200, (0.5, 0.1, 200), time)
+        self.assertAlmostEqual(plain['hr'][3], expected['hr'], places=6)
+
+    def test_metrics(self):
+        """
+        batch formulas over the projected counting stats
+        :return:
+        """
+        keys, result = projections(['avg', 'obp', 'ops', 'woba_mlb'], self.players, self.seasons, self.table, 2016)
+        expected = compute(['avg', 'obp', 'ops', 'woba_mlb'], {f: result[f] for f in BATTING_STATS})
+        for metric in ('avg', 'obp', 'ops', 'woba_mlb'):
+            np.testing.assert_equal(result[metric], expected[metric])
+            self.assertTrue(np.all((result[metric] > 0) & (result[metric] < 2)))
+        keys, result = projections(['era', 'fip'], self.players, self.seasons, self.table, 2016, side='pitching')
+        fields = tuple(f for f in PITCHING_STATS if f != 'ip_outs')
+        expected = self.marcel(keys[0], 2016, fields, (3, 2, 1), 402, (0.5, 0.1, 180), self.table['ip_outs'])
+        self.assertAlmostEqual(result['er'][0], expected['er'], places=6)
+        self.assertFalse(np.any(np.isnan(result['era'])) or np.any(np.isnan(result['fip'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
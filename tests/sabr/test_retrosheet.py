@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from sabr import events
+from sabr.evaluator import compute
+from sabr.retrosheet import BATTER, HOME, OUT, aggregate, batches, decode, plays, read
+from sabr.run_expectancy import RunExpectancy
+from sabr.stats import Stats
+
+GAME = """id,TST200404060
+version,2
+info,visteam,VIS
+info,hometeam,HOM
+start,v1,"V One",0,1,8
+start,v2,"V Two",0,2,6
+start,v3,"V Three",0,3,5
+start,v4,"V Four",0,4,3
+start,v5,"V Five",0,5,7
+start,vp,"V Pitch",0,0,1
+start,h1,"H One",1,1,8
+start,h2,"H Two",1,2,6
+start,h3,"H Three",1,3,5
+start,h4,"H Four",1,4,3
+start,h5,"H Five",1,5,7
+start,hp,"H Pitch",1,0,1
+play,1,0,v1,00,X,S8/G
+play,1,0,v2,00,X,W
+play,1,0,v3,00,X,K+SB3
+play,1,0,v4,00,X,8/SF.3-H
+play,1,0,v5,00,X,64(1)/FO
+play,1,1,h1,00,X,HR/9
+play,1,1,h2,00,X,E6/G
+play,1,1,h3,00,X,64(1)3/GDP
+play,1,1,h4,00,X,IW
+sub,pr,"Pinch Run",1,4,12
+play,1,1,h5,00,X,NP
+play,1,1,h5,00,X,K
+sub,hp2,"H Pitch2",1,0,1
+play,2,0,v1,00,X,T9/F
+play,2,0,v2,00,X,WP.3-H(UR)
+play,2,0,v2,00,X,HP
+play,2,0,v3,00,X,CS2(26)
+play,2,0,v3,00,X,K
+play,2,0,v4,00,X,D7/L
+play,2,0,v5,00,X,S7/L.2-H
+play,2,0,v1,00,X,7/F
+play,2,1,pr,00,X,23/SH
+play,2,1,h5,00,X,K
+play,2,1,h1,00,X,8/F
+data,er,hp,1
+"""
+
+
+class TestRetrosheet(unittest.TestCase):
+    """
+    Retrosheet event file Tests
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_decode(self):
+        """
+        play strings
+        :return:
+        """
+        d = decode('S8/G.1-3')
+        self.assertEqual((d.outcome, d.moves), (events.SINGLE, {BATTER: 1, 1: 3}))
+        d = decode('64(1)3/GDP')
+        self.assertEqual((d.outcome, d.moves), (events.DOUBLE_PLAY, {BATTER: OUT, 1: OUT}))
+        d = decode('54(1)/FO')
+        self.assertEqual((d.outcome, d.moves), (events.OUT, {BATTER: 1, 1: OUT}))
+        d = decode('K+SB2')
+        self.assertEqual((d.outcome, d.runner_events, d.moves), (events.STRIKEOUT, ((1, 'SB'), ), {BATTER: OUT, 1: 2}))
+        d = decode('K+WP.B-1')
+        self.assertEqual(d.moves, {BATTER: 1})
+        d = decode('HR/9.2-H;1-H(UR)')
+        self.assertEqual((d.outcome, d.moves, d.unearned), (events.HOME_RUN, {BATTER: HOME, 2: HOME, 1: HOME}, {1}))
+        d = decode('CS2(2E4).1-3')
+        self.assertEqual((d.outcome, d.runner_events, d.moves), (None, (), {1: 3}))
+        d = decode('POCS3(25)')
+        self.assertEqual(d.runner_events, ((2, 'CS'), ))
+        d = decode('8/SF.3-H')
+        self.assertEqual((d.outcome, d.moves), (events.SACRIFICE_FLY, {BATTER: OUT, 3: HOME}))
+        d = decode('S9.2XH(92)')
+        self.assertEqual(d.moves, {BATTER: 1, 2: OUT})
+        d = decode('S9.2XH(9E2)')
+        self.assertEqual(d.moves, {BATTER: 1, 2: HOME})
+        self.assertEqual(decode('IW').outcome, events.INTENTIONAL_WALK)
+        self.assertEqual(decode('HP').outcome, events.HIT_BY_PITCH)
+        self.assertEqual(decode('DGR/L9').outcome, events.DOUBLE)
+        self.assertEqual(decode('FC5/G.3XH(52)').moves, {BATTER: 1, 3: OUT})
+        self.assertIsNone(decode('WP.2-3').outcome)
+        d = decode('FC5/SH.1-2')
+        self.assertEqual((d.outcome, d.moves), (events.SACRIFICE_HIT, {BATTER: 1, 1: 2}))
+        self.assertEqual(decode('E1/SH').outcome, events.SACRIFICE_HIT)
+        d = decode('E9/SF.3-H')
+        self.assertEqual((d.outcome, d.moves), (events.SACRIFICE_FLY, {BATTER: 1, 3: HOME}))
+        self.assertEqual(decode('FC5/G').outcome, events.FIELDERS_CHOICE)
+
+    def test_plays(self):
+        """
+        base-out transitions
+        :return:
+        """
+        result = list(plays(read(io.StringIO(GAME))))
+        self.assertEqual(len(result), 21)
+        self.assertEqual([(p.outs, p.bases) for p in result[:5]], [(0, 0), (0, 1), (0, 3), (1, 5), (2, 1)])
+        self.assertEqual([p.outs_on_play for p in result[:5]], [0, 0, 1, 1, 1])
+        self.assertEqual(result[3].runs, 1)
+        self.assertEqual([p.event for p in result[5:10]], ['HR', 'E', 'GIDP', 'IBB', 'K'])
+        self.assertEqual(result[11].event, events.OTHER)
+        self.assertEqual(result[11].pitching, {'hp2': {'r': 1, 'er': 0}})
+        self.assertEqual(result[13].event, 'CS')
+        self.assertEqual(result[16].batting, {'v5': {'ab': 1, 'h': 1}, 'v4': {'r': 1}})
+        self.assertEqual(result[18].pitching['vp'], {'bfp': 1, 'ip_outs': 1})
+
+    def test_aggregate(self):
+        """
+        season totals feed the Stats inputs
+        :return:
+        """
+        path = os.path.join(self.path, '2004TST.EVN')
+        with io.open(path, 'w', encoding='latin-1') as f:
+            f.write(GAME)
+        batting, pitching = aggregate(path, size=4)
+        v1 = batting.counters(('v1', ))
+        self.assertEqual((v1['ab'], v1['h'], v1['_3b'], v1['sb'], v1['r']), (3, 2, 1, 1, 2))
+        v2 = batting.counters(('v2', ))
+        self.assertEqual((v2['ab'], v2['bb'], v2['hbp'], v2['cs']), (0, 1, 1, 1))
+        self.assertEqual(batting.counters(('pr', ))['sh'], 1)
+        self.assertEqual(batting.counters(('h3', ))['gidp'], 1)
+        hp = pitching.counters(('hp', ))
+        self.assertEqual((hp['ip_outs'], hp['bfp'], hp['so'], hp['bb'], hp['r'], hp['er']), (3, 5, 1, 1, 1, 1))
+        hp2 = pitching.counters(('hp2', ))
+        self.assertEqual((hp2['ip_outs'], hp2['h'], hp2['hbp'], hp2['r'], hp2['er']), (3, 3, 1, 2, 1))
+        v1 = batting.counters(('v1', ))
+        values = compute(['pa', 'tb'], v1)
+        self.assertEqual(values['pa'], Stats.pa(3, 0, 0, 0, 0))
+        self.assertEqual(values['tb'], Stats.tb(1, 0, 0, 1))
+        self.assertEqual(pitching.stat(('hp2', ), 'fip'), Stats.fip(0, 0, 1, 1, Stats.ip(3)))
+
+    def test_sacrifice_on_error(self):
+        """
+        a sacrifice with the batter safe on a fielder's choice or an error is no at bat
+        :return:
+        """
+        game = GAME.split('play,', 1)[0] + (
+            'play,1,0,v1,00,X,S8/G\n'
+            'play,1,0,v2,00,X,FC5/SH.1-2\n'
+            'play,1,0,v3,00,X,E1/SH.2-3;1-2\n'
+            'play,1,0,v4,00,X,E9/SF.3-H;2-3;1-2\n'
+        )
+        batting, pitching = aggregate(io.StringIO(game))
+        self.assertEqual([batting.counters((p, ))['ab'] for p in ('v1', 'v2', 'v3', 'v4')], [1, 0, 0, 0])
+        self.assertEqual((batting.counters(('v2', ))['sh'], batting.counters(('v3', ))['sh']), (1, 1))
+        self.assertEqual(batting.counters(('v4', ))['sf'], 1)
+        self.assertEqual(compute(['pa'], batting.counters(('v4', )))['pa'], 1)
+        self.assertEqual(pitching.counters(('hp', ))['bfp'], 4)
+
+    def test_batches(self):
+        """
+        batches end at half-inning boundaries, so RE24 and the weights do not depend on the batch size
+        :return:
+        """
+        results = []
+        for size in (4096, 7, 10, 1):
+            engine = RunExpectancy()
+            sizes = []
+            for batch in batches(read(io.StringIO(GAME * 3)), size=size):
+                table = batch['plays']
+                sizes.append(len(table['event']))
+                first = np.r_[True, table['half_inning'][1:] != table['half_inning'][:-1]]
+                self.assertTrue((table['outs'][first] == 0).all())
+                engine.add(2004, table['half_inning'], table['outs'], table['bases'], table['runs'], table['event'],
+                           table['outs_on_play'], table['game'])
+            self.assertEqual(sum(sizes), 63)
+            self.assertTrue(all(s >= size for s in sizes[:-1]))
+            results.append((sizes, engine.matrix(2004), engine.weights(2004)))
+        self.assertEqual(len(results[0][0]), 1)
+        self.assertEqual(results[1][0], [10, 8, 8, 13, 8, 13, 3])
+        for sizes, matrix, weights in results[1:]:
+            np.testing.assert_allclose(matrix, results[0][1])
+            for field in ('runs', 'woba'):
+                expected = getattr(results[0][2], field)
+                self.assertEqual(list(getattr(weights, field)), list(expected))
+                np.testing.assert_allclose(list(getattr(weights, field).values()), list(expected.values()))
+            np.testing.assert_allclose(weights[3:], results[0][2][3:])
+
+    def test_other_plays(self):
+        """
+        wild pitches, passed balls and other non plate appearance plays count as base-out transitions
+        :return:
+        """
+        game = GAME.split('play,', 1)[0] + (
+            'play,1,0,v1,00,X,S8/G\n'
+            'play,1,0,v2,00,X,WP.1-2\n'
+            'play,1,0,v2,00,X,PB.2-3\n'
+            'play,1,0,v2,00,X,BK.3-H\n'
+            'play,1,0,v2,00,X,K\n'
+            'play,1,0,v3,00,X,C/E2\n'
+            'play,1,0,v4,00,X,DI.1-2\n'
+            'play,1,0,v4,00,X,63\n'
+            'play,1,0,v5,00,X,8/F\n'
+        )
+        batch = next(batches(read(io.StringIO(game))))
+        table = batch['plays']
+        self.assertEqual(table['event'].tolist(), ['1B', 'OTHER', 'OTHER', 'OTHER', 'K', 'OTHER', 'OTHER', 'OUT',
+                                                   'OUT'])
+        self.assertEqual(table['bases'].tolist(), [0, 1, 2, 4, 0, 0, 1, 2, 2])
+        engine = RunExpectancy()
+        engine.add(2004, table['half_inning'], table['outs'], table['bases'], table['runs'], table['event'],
+                   table['outs_on_play'])
+        weights = engine.weights(2004)
+        self.assertNotIn(events.OTHER, weights.runs)
+        # the single(1 run to come) and the strikeout after the balk(none)
+        self.assertAlmostEqual(engine.matrix(2004)[0, 0], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
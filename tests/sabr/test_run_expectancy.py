@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import random
+import unittest
+
+import numpy as np
+
+from sabr.run_expectancy import EVENTS, OUTS, RunExpectancy, encode
+from sabr.stats import Stats
+
+
+def simulate(innings, seed):
+    """
+    Play-by-play of simple half-innings(runners move up as many bases as the batter)
+    """
+    rng = random.Random(seed)
+    choices = ['1B'] * 15 + ['2B'] * 5 + ['3B'] + ['HR'] * 3 + ['BB'] * 8 + ['HBP', 'E', 'IBB'] + \
+              ['K'] * 20 + ['OUT'] * 40 + ['GIDP'] * 2
+    rows = []
+    for inning in range(innings):
+        outs, bases = 0, 0
+        while outs < 3:
+            event = rng.choice(choices)
+            runs, made = 0, 0
+            if event in ('K', 'OUT'):
+                made, after = 1, bases
+            elif event == 'GIDP':
+                made = 2 if bases & 1 and outs < 2 else 1
+                after = bases & ~1 if made == 2 else bases
+            elif event in ('BB', 'IBB', 'HBP'):
+                after, runner = bases, 1
+                while after & runner:
+                    runner <<= 1
+                if runner == 8:
+                    runs, after = 1, bases
+                else:
+                    after = bases | runner
+            else:
+                step = {'1B': 1, 'E': 1, '2B': 2, '3B': 3, 'HR': 4}[event]
+                moved = (bases << step) | (1 << (step - 1))
+                runs = bin(moved >> 3).count('1')
+                after = moved & 7
+            rows.append((inning, outs, bases, runs, event, made))
+            outs, bases = outs + made, after
+    return [list(column) for column in zip(*rows)]
+
+
+class TestRunExpectancy(unittest.TestCase):
+    """
+    RunExpectancy Tests
+    """
+
+    def setUp(self):
+        self.engine = RunExpectancy()
+
+    def tearDown(self):
+        pass
+
+    def test_encode(self):
+        """
+        event codes
+        :return:
+        """
+        self.assertEqual(encode(['1B', 'SB', 'HR']).tolist(), [0, 14, 3])
+        self.assertEqual(encode([3, 4]).tolist(), [3, 4])
+        self.assertRaises(ValueError, encode, ['XX'])
+        with self.assertRaisesRegex(ValueError, r"unknown event: '' at game NYA200404040, row 1"):
+            encode(['1B', '', 'HR'], games=['NYA200404040'] * 3)
+        with self.assertRaisesRegex(ValueError, r"unknown event: '' at game g, row 2"):
+            self.engine.add(2004, [1, 1, 1], [0, 0, 0], [0, 1, 1], [0, 0, 0], ['1B', 'SB', ''], games=['g'] * 3)
+
+    def test_matrix(self):
+        """
+        RE24 by hand
+        :return:
+        """
+        self.engine.add(
+            2004,
+            [0, 0, 0, 0, 0, 1, 1, 1, 1, 1],
+            [0, 0, 1, 1, 2, 0, 0, 0, 1, 2],
+            [0, 0, 0, 1, 1, 0, 1, 2, 2, 2],
+            [1, 0, 0, 0, 0, 0, 1, 0, 0, 0],
+            ['HR', 'K', '1B', 'OUT', 'K', 'BB', '2B', 'K', 'K', 'OUT'],
+            [0, 1, 0, 1, 1, 0, 0, 1, 1, 1],
+        )
+        matrix = self.engine.matrix(2004)
+        self.assertAlmostEqual(matrix[0, 0], 2.0 / 3)
+        self.assertAlmostEqual(matrix[0, 1], 1.0)
+        self.assertAlmostEqual(matrix[2, 1], 0.0)
+        self.assertTrue(np.isnan(matrix[2, 7]))
+        self.assertAlmostEqual(self.engine.weights(2004).runs['HR'], 1.0)
+        self.assertEqual(self.engine.seasons(), [2004])
+
+    def test_weights(self):
+        """
+        vectorized run values equal an event loop
+        :return:
+        """
+        columns = simulate(3000, 16)
+        half, outs, bases, runs, event, made = columns
+        split = half.index(1500)
+        # two chunks split on a half-inning boundary
+        for start, stop in ((0, split), (split, len(half))):
+            self.engine.add(2010, half[start:stop], outs[start:stop], bases[start:stop], runs[start:stop],
+                            event[start:stop], made[start:stop])
+        sums, counts, rest = np.zeros(24), np.zeros(24), 0
+        for i in reversed(range(len(half))):
+            if i + 1 == len(half) or half[i + 1] != half[i]:
+                rest = 0
+            rest += runs[i]
+            sums[outs[i] * 8 + bases[i]] += rest
+            counts[outs[i] * 8 + bases[i]] += 1
+        expectancy = sums / np.maximum(counts, 1)
+        np.testing.assert_allclose(self.engine.matrix(2010).reshape(-1)[counts > 0], expectancy[counts > 0])
+        values = {}
+        for i in range(len(half)):
+            after = 0.0 if i + 1 == len(half) or half[i + 1] != half[i] else \
+                expectancy[outs[i + 1] * 8 + bases[i + 1]]
+            values.setdefault(event[i], []).append(after - expectancy[outs[i] * 8 + bases[i]] + runs[i])
+        weights = self.engine.weights(2010)
+        for code, value in values.items():
+            self.assertAlmostEqual(weights.runs[code], np.mean(value))
+        out = np.mean(sum((values[code] for code in OUTS if code in values), []))
+        self.assertAlmostEqual(weights.woba['const_u_hr'] / weights.woba_scale, np.mean(values['HR']) - out)
+        self.assertGreater(weights.woba['const_u_hr'], weights.woba['const_u_1b'])
+        self.assertAlmostEqual(weights.lg_woba, weights.lg_obp, delta=0.002)
+        self.assertTrue(np.isnan(weights.runs['SB']))
+        self.assertEqual(list(weights.runs), [event for event in EVENTS if event != 'OTHER'])
+
+    def test_woba(self):
+        """
+        weights feed Stats.woba
+        :return:
+        """
+        half, outs, bases, runs, event, made = simulate(500, 17)
+        self.engine.add(2011, half, outs, bases, runs, event, made)
+        weights = self.engine.weights(2011)
+        self.assertIs(self.engine.weights(2011), weights)
+        value = Stats.woba(50, 5, 100, 30, 3, 25, 550, 5, ibb=5, **weights.woba)
+        self.assertGreater(value, 0)
+        self.assertEqual(list(self.engine.constants(2011))[-1], 'woba_scale')
+        self.engine.add(2011, half, outs, bases, runs, event, made)
+        self.assertIsNot(self.engine.weights(2011), weights)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import asyncio
+import json
+import unittest
+
+from sabr.evaluator import compute
+from sabr.serve import Client, MicroBatcher, Overloaded, Service
+
+
+class TestServe(unittest.TestCase):
+    """
+    Micro-batching service Tests
+    """
+
+    def setUp(self):
+        self.rows = [
+            {'ab': 500 + i, 'h': 150 + i % 7, '_2b': 30, '_3b': 2, 'hr': 20 + i % 5, 'bb': 60, 'hbp': 4, 'sf': 5}
+            for i in range(100)
+        ]
+
+    def tearDown(self):
+        pass
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_batching(self):
+        """
+        concurrent requests are coalesced and fanned back out
+        :return:
+        """
+        async def scenario():
+            async with Client(Service(MicroBatcher(max_batch=32, max_delay=0.05))) as client:
+                results = await asyncio.gather(*[client.stats(['avg', 'ops'], row) for row in self.rows])
+                status, metrics = await client.get('/metrics')
+            return results, status, metrics
+
+        results, status, metrics = self.run_async(scenario())
+        for row, result in zip(self.rows, results):
+            expected = compute(['avg', 'ops'], row)
+            self.assertEqual(result, {'avg': expected['avg'], 'ops': expected['ops']})
+        self.assertEqual(status, 200)
+        self.assertEqual(metrics['requests'], 100)
+        self.assertLessEqual(metrics['batches'], 4)
+        self.assertGreaterEqual(metrics['mean_batch'], 25)
+        self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+
+    def test_mixed(self):
+        """
+        requests of different shapes, rows and errors in one window
+        :return:
+        """
+        async def scenario():
+            async with Client(Service(MicroBatcher(max_batch=64, max_delay=0.05))) as client:
+                return await asyncio.gather(
+                    client.post('/stats', {'metrics': ['avg'], 'data': {'h': [3, 4], 'ab': [10, 0]}}),
+                    client.post('/stats', {'metrics': ['slg'], 'data': self.rows[0]}),
+                    client.post('/stats', {'metrics': ['war'], 'data': {'h': 3, 'ab': 10}}),
+                    client.post('/stats', {'metrics': ['avg'], 'data': {'h': [3, 4], 'ab': [10]}}),
+                    client.post('/stats', {'metrics': ['fip'], 'data': {'hr': 10, 'bb': 40, 'hbp': 3, 'so': 150,
+                                                                        'ip': 180.0}, 'constants': {'c': 3.1}}),
+                    client.post('/stats', 'not an object'),
+                    client.get('/stats'),
+                    client.get('/nowhere'),
+                )
+
+        avg, slg, unknown, ragged, fip, bad, method, missing = self.run_async(scenario())
+        self.assertEqual(avg, (200, {'results': {'avg': [0.3, None]}}))
+        self.assertEqual(slg[1]['results']['slg'], compute(['slg'], self.rows[0])['slg'])
+        self.assertEqual(unknown[0], 400)
+        self.assertIn('war', unknown[1]['error'])
+        self.assertEqual(ragged[0], 400)
+        expected = compute(['fip'], {'hr': 10, 'bb': 40, 'hbp': 3, 'so': 150, 'ip': 180.0}, {'c': 3.1})['fip']
+        self.assertEqual(fip, (200, {'results': {'fip': expected}}))
+        self.assertEqual((bad[0], method[0], missing[0]), (400, 405, 404))
+
+    def test_backpressure(self):
+        """
+        a full queue rejects with 503
+        :return:
+        """
+        async def scenario():
+            service = Service(MicroBatcher(max_batch=8, max_delay=0.05, max_pending=10))
+            async with Client(service) as client:
+                responses = await asyncio.gather(
+                    *[client.post('/stats', {'metrics': ['avg'], 'data': row}) for row in self.rows[:30]])
+                try:
+                    await asyncio.gather(*[client.stats(['avg'], row) for row in self.rows[:30]])
+                except Overloaded:
+                    overloaded = True
+                else:
+                    overloaded = False
+            return responses, overloaded, service.batcher.stats()
+
+        responses, overloaded, stats = self.run_async(scenario())
+        statuses = [status for status, _ in responses]
+        self.assertEqual(statuses.count(200), 10)
+        self.assertEqual(statuses.count(503), 20)
+        self.assertTrue(overloaded)
+        self.assertEqual(stats['rejected'], 40)
+
+    def test_not_started(self):
+        """
+        requests before start() or after stop() fail instead of waiting forever
+        :return:
+        """
+        async def scenario():
+            service = Service()
+            with self.assertRaisesRegex(RuntimeError, 'service not started'):
+                await service.handle('POST', '/stats', json.dumps({'metrics': ['avg'], 'data': {'h': 3, 'ab': 10}}))
+            status, _ = await service.handle('GET', '/metrics')
+            self.assertEqual(status, 200)
+            await service.batcher.start()
+            result = await service.batcher.submit(['avg'], {'h': 3, 'ab': 10})
+            await service.batcher.stop()
+            with self.assertRaisesRegex(RuntimeError, 'service not started'):
+                await service.batcher.submit(['avg'], {'h': 3, 'ab': 10})
+            return result
+
+        self.assertEqual(self.run_async(scenario()), {'avg': 0.3})
+
+    def test_http(self):
+        """
+        HTTP endpoint on a local socket
+        :return:
+        """
+        async def scenario():
+            service = Service(MicroBatcher(max_batch=4, max_delay=0.001))
+            server = await service.serve('127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            body = json.dumps({'metrics': ['avg'], 'data': {'h': 30, 'ab': 100}}).encode('utf-8')
+            writer.write(b'POST /stats HTTP/1.1\r\nContent-Length: ' + str(len(body)).encode('latin-1') +
+                         b'\r\nConnection: close\r\n\r\n' + body)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            await service.batcher.stop()
+            return response
+
+        try:
+            response = self.run_async(scenario())
+        except OSError as e:
+            self.skipTest('no local socket: {}'.format(e))
+        head, _, body = response.partition(b'\r\n\r\n')
+        self.assertTrue(head.startswith(b'HTTP/1.1 200 OK'))
+        self.assertEqual(json.loads(body.decode('utf-8')), {'results': {'avg': 0.3}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import itertools
+import unittest
+
+import numpy as np
+
+from sabr import events
+from sabr.simulation import EVENTS, FOLLOWING, RUNS, expected_runs, inning_runs, profiles, search, simulate
+
+
+class TestSimulation(unittest.TestCase):
+    """
+    Simulation Tests
+    """
+
+    def setUp(self):
+        self.table = {
+            'ab': np.array([550, 500, 0]),
+            'h': np.array([170, 120, 0]),
+            '_2b': np.array([35, 20, 0]),
+            '_3b': np.array([3, 0, 0]),
+            'hr': np.array([30, 5, 0]),
+            'bb': np.array([70, 30, 0]),
+            'ibb': np.array([8, 0, 0]),
+            'hbp': np.array([5, 2, 0]),
+            'sf': np.array([6, 4, 0]),
+            'sh': np.array([0, 8, 0]),
+            'so': np.array([120, 90, 0]),
+        }
+        self.probabilities = profiles(self.table)
+
+    def tearDown(self):
+        pass
+
+    def test_transitions(self):
+        """
+        base-out transitions
+        :return:
+        """
+        walk, single, home_run = EVENTS.index(events.WALK), EVENTS.index(events.SINGLE), EVENTS.index(events.HOME_RUN)
+        self.assertEqual((FOLLOWING[walk, 0b011], RUNS[walk, 0b011]), (0b111, 0))
+        self.assertEqual((FOLLOWING[walk, 0b101], RUNS[walk, 0b101]), (0b111, 0))
+        self.assertEqual((FOLLOWING[walk, 0b111], RUNS[walk, 0b111]), (0b111, 1))
+        self.assertEqual((FOLLOWING[single, 0b001], RUNS[single, 0b001]), (0b101, 0))
+        self.assertEqual((FOLLOWING[home_run, 0b111], RUNS[home_run, 0b111]), (0, 4))
+
+    def test_profiles(self):
+        """
+        outcome probabilities of counting stats
+        :return:
+        """
+        np.testing.assert_allclose(self.probabilities.sum(axis=1), 1.0)
+        self.assertAlmostEqual(self.probabilities[0, EVENTS.index(events.HOME_RUN)], 30.0 / 631)
+        self.assertAlmostEqual(self.probabilities[0, EVENTS.index(events.WALK)], 75.0 / 631)
+        self.assertEqual(self.probabilities[2].tolist(), [1.0, 0, 0, 0, 0, 0])
+
+    def test_exact(self):
+        """
+        exact solver against a closed form
+        :return:
+        """
+        # half home runs, half outs: 3 expected home runs before the third out
+        probabilities = np.array([[0.5, 0, 0, 0, 0, 0.5]])
+        self.assertAlmostEqual(inning_runs(probabilities, [0])[0], 3.0)
+        self.assertAlmostEqual(expected_runs(probabilities, [0] * 9), 27.0)
+        self.assertEqual(expected_runs(self.probabilities, [2] * 9), 0.0)
+
+    def test_simulate(self):
+        """
+        simulated runs agree with the exact solver and are reproducible
+        :return:
+        """
+        lineup = [0, 1, 0, 1, 0, 1, 0, 1, 1]
+        runs = simulate(self.probabilities, lineup, games=40000, innings=1, seed=20)
+        self.assertEqual(len(runs), 40000)
+        expected = inning_runs(self.probabilities, lineup)[0]
+        self.assertLess(abs(runs.mean() - expected), 4 * runs.std() / np.sqrt(len(runs)))
+        games = simulate(self.probabilities, lineup, games=20000, seed=20, chunk_size=5000)
+        expected = expected_runs(self.probabilities, lineup)
+        self.assertLess(abs(games.mean() - expected), 4 * games.std() / np.sqrt(len(games)))
+        again = simulate(self.probabilities, lineup, games=20000, seed=20, chunk_size=5000)
+        np.testing.assert_equal(games, again)
+
+    def test_search(self):
+        """
+        lineup search, in process and on a process pool
+        :return:
+        """
+        lineups = sorted(set(itertools.permutations([0, 0, 1, 1, 1])))
+        exact = search(self.probabilities, lineups)
+        self.assertEqual(len(exact), len(lineups))
+        self.assertAlmostEqual(exact[0], expected_runs(self.probabilities, lineups[0]))
+        np.testing.assert_allclose(search(self.probabilities, lineups, workers=2, chunk_size=4), exact)
+        simulated = search(self.probabilities, lineups[:4], method='simulate', games=2000, seed=1)
+        np.testing.assert_equal(simulated, search(self.probabilities, lineups[:4], method='simulate', games=2000,
+                                                  seed=1, workers=2, chunk_size=2))
+        self.assertRaises(ValueError, search, self.probabilities, lineups, method='guess')
+
+    def test_no_outs(self):
+        """
+        a lineup that can never make an out is rejected
+        :return:
+        """
+        never = np.zeros((2, len(EVENTS)))
+        never[0, EVENTS.index(events.HOME_RUN)] = 1.0
+        never[1, EVENTS.index(events.WALK)] = 1.0
+        for function in (inning_runs, expected_runs):
+            self.assertRaises(ValueError, function, never, [0, 1])
+        self.assertRaises(ValueError, simulate, never, [1, 0], games=2)
+        self.assertRaises(ValueError, search, never, [(0, 1)], method='simulate', games=2)
+        mixed = np.vstack([never, self.probabilities[2]])
+        self.assertGreater(expected_runs(mixed, [0, 1, 2]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import random
+import unittest
+
+from sabr import events
+from sabr.stats import Stats
+from sabr.streaming import Accumulator, BATTER, PITCHER
+
+
+class TestAccumulator(unittest.TestCase):
+    """
+    Accumulator Tests
+    """
+
+    def setUp(self):
+        self.accumulator = Accumulator()
+
+    def tearDown(self):
+        pass
+
+    def test_batter(self):
+        """
+        batting counters and metrics
+        :return:
+        """
+        a = self.accumulator
+        for event in ('1B', '2B', 'HR', 'BB', 'IBB', 'HBP', 'K', 'SF', 'SH', 'OUT', 'GIDP', '3B'):
+            a.plate_appearance('ichiro', 'darvish', event)
+        a.runner('ichiro', 'darvish', events.STOLEN_BASE)
+        a.runner('ichiro', 'darvish', events.CAUGHT_STEALING)
+        a.score('ichiro', 'darvish', earned=False)
+        c = a.counters('ichiro')
+        self.assertEqual((c['ab'], c['h'], c['_2b'], c['_3b'], c['hr']), (7, 4, 1, 1, 1))
+        self.assertEqual((c['bb'], c['ibb'], c['hbp'], c['so'], c['sf'], c['sh'], c['gidp']), (2, 1, 1, 1, 1, 1, 1))
+        self.assertEqual((c['sb'], c['cs'], c['r']), (1, 1, 1))
+        self.assertEqual(a.stat('ichiro', 'avg'), Stats.avg(4, 7))
+        self.assertEqual(a.stat('ichiro', 'obp'), Stats.obp(4, 2, 1, 7, 1))
+        tb = Stats.tb(Stats.single(4, 1, 1, 1), 1, 1, 1)
+        self.assertEqual(a.stat('ichiro', 'ops'), Stats.ops(4, 2, 1, 7, 1, tb))
+        self.assertEqual(a.stat('ichiro', 'woba_mlb'), Stats.woba_mlb(2, 1, 1, 1, 1, 1, 7, 1, 1))
+
+    def test_pitcher(self):
+        """
+        pitching counters and metrics
+        :return:
+        """
+        a = self.accumulator
+        for event in ('K', 'K', 'OUT', 'HR', 'BB', 'GIDP', 'HBP', 'SF', '1B', 'E'):
+            a.plate_appearance('ichiro', 'darvish', event)
+        a.score('ichiro', 'darvish')
+        a.score('ichiro', 'darvish', earned=False)
+        c = a.counters('darvish', PITCHER)
+        self.assertEqual((c['ip_outs'], c['bfp'], c['h'], c['hr'], c['bb'], c['hbp'], c['so']), (6, 10, 2, 1, 1, 1, 2))
+        self.assertEqual((c['r'], c['er']), (2, 1))
+        self.assertEqual(a.stat('darvish', 'ip', PITCHER), 2.0)
+        self.assertEqual(a.stat('darvish', 'era', PITCHER), Stats.era(1, 2.0))
+        self.assertEqual(a.stat('darvish', 'whip', PITCHER), Stats.whip(1, 2, 2.0))
+        self.assertEqual(a.stat('darvish', 'fip', PITCHER), Stats.fip(1, 1, 1, 2, 2.0))
+
+    def test_memo(self):
+        """
+        metrics are memoized until the next update of that player
+        :return:
+        """
+        a = self.accumulator
+        a.plate_appearance('ichiro', 'darvish', '1B')
+        a.plate_appearance('bonds', 'darvish', 'HR')
+        self.assertEqual(a.stat('ichiro', 'avg'), 1.0)
+        self.assertIn('avg', a._memo[(BATTER, 'ichiro')])
+        a.plate_appearance('bonds', 'darvish', 'K')
+        self.assertIn('avg', a._memo[(BATTER, 'ichiro')])
+        a.plate_appearance('ichiro', 'darvish', 'K')
+        self.assertNotIn((BATTER, 'ichiro'), a._memo)
+        self.assertEqual(a.stat('ichiro', 'avg'), 0.5)
+
+    def test_stream(self):
+        """
+        random stream against summed counters
+        :return:
+        """
+        rng = random.Random(2013)
+        a = self.accumulator
+        players = ['p{}'.format(i) for i in range(20)]
+        for _ in range(5000):
+            a.plate_appearance(rng.choice(players), 'darvish', rng.choice(events.PLATE_APPEARANCES))
+        total = sum(sum(a.counters(p).values()) for p in a.players())
+        self.assertGreater(total, 5000)
+        for player in players:
+            c = a.counters(player)
+            self.assertEqual(a.stat(player, 'babip'), Stats.babip(c['h'], c['hr'], c['ab'], c['so'], c['sf']))
+        self.assertEqual(a.counters('darvish', PITCHER)['bfp'], 5000)
+        self.assertRaises(ZeroDivisionError, a.stat, 'nobody', 'avg')
+
+
+if __name__ == '__main__':
+    unittest.main()
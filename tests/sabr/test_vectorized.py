@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Shinichi Nakagawa'
+
+
+import unittest
+from array import array
+
+import numpy as np
+
+from sabr.stats import Stats
+from sabr.vectorized import Stats as BatchStats, py_round
+
+
+class TestPyRound(unittest.TestCase):
+    """
+    py_round Tests
+    """
+
+    def test_ties(self):
+        """
+        decimal ties that numpy.round settles differently
+        :return:
+        """
+        values = [0.285, 2.675, 1.005, 0.125, 0.0625, 2.25, 0.5, 1.5, 2.5, -0.125]
+        for ndigits in (None, 0, 1, 2, 3):
+            expected = [round(v, ndigits) for v in values]
+            self.assertEqual(py_round(values, ndigits).tolist(), expected)
+
+    def test_random(self):
+        """
+        random values against round()
+        :return:
+        """
+        rng = np.random.RandomState(2004)
+        values = np.concatenate([rng.random_sample(10000) * 100, np.arange(10000) / 2000.0])
+        for ndigits in (1, 2, 3):
+            expected = [round(float(v), ndigits) for v in values]
+            self.assertEqual(py_round(values, ndigits).tolist(), expected)
+
+    def test_scalar(self):
+        """
+        0-d input keeps its shape
+        :return:
+        """
+        self.assertEqual(py_round(2.675, 2).shape, ())
+        self.assertEqual(float(py_round(2.675, 2)), 2.67)
+
+
+class TestBatchStats(unittest.TestCase):
+    """
+    Batch Stats Class Tests
+    """
+
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        size = 5000
+        c = {k: rng.randint(0, 40, size) for k in ('hr', '_2b', '_3b', 'bb', 'hbp', 'sf', 'sh', 'so', 'sb', 'cs',
+                                                   'gidp', 'ibb', 'e_bb', 'er')}
+        c['ibb'] = np.minimum(c['ibb'], c['bb'])
+        c['h'] = c['hr'] + c['_2b'] + c['_3b'] + rng.randint(0, 150, size)
+        c['ab'] = c['h'] + c['so'] + rng.randint(1, 400, size)
+        c['single'] = c['_1b'] = c['h'] - c['hr'] - c['_2b'] - c['_3b']
+        c['tb'] = c['hr'] * 4 + c['_3b'] * 3 + c['_2b'] * 2 + c['single']
+        c['ip_outs'] = rng.randint(1, 700, size)
+        c['ip'] = np.array([Stats.ip(v) for v in c['ip_outs'].tolist()])
+        c['pa'] = c['bfp'] = c['ab'] + c['bb'] + c['hbp'] + c['sf'] + c['sh']
+        self.size = size
+        self.columns = c
+
+    def tearDown(self):
+        pass
+
+    def assertSameAsScalar(self, name, params, **extra):
+        columns = [self.columns[p] for p in params]
+        expected = [
+            getattr(Stats, name)(*[col[i].item() for col in columns], **extra) for i in range(self.size)
+        ]
+        result = getattr(BatchStats, name)(*columns, **extra)
+        self.assertEqual(result.tolist(), expected, name)
+
+    def test_pitching(self):
+        """
+        ip, era, whip, h9, so9, bb9, hr9 test
+        :return:
+        """
+        self.assertSameAsScalar('ip', ('ip_outs',))
+        self.assertSameAsScalar('era', ('er', 'ip'))
+        self.assertSameAsScalar('whip', ('bb', 'h', 'ip'))
+        self.assertSameAsScalar('h9', ('h', 'ip'))
+        self.assertSameAsScalar('so9', ('so', 'ip'))
+        self.assertSameAsScalar('bb9', ('bb', 'ip'))
+        self.assertSameAsScalar('hr9', ('hr', 'ip'))
+        self.assertSameAsScalar('adam_dunn_pitcher', ('hr', 'bb', 'hbp', 'so', 'bfp'))
+
+    def test_fip(self):
+        """
+        FIP test
+        :return:
+        """
+        self.assertSameAsScalar('fip', ('hr', 'bb', 'hbp', 'so', 'ip', 'ibb'))
+        self.assertSameAsScalar('fip', ('hr', 'bb', 'hbp', 'so', 'ip', 'ibb'), c=3.05)
+        # Yu Darvish(2013)
+        self.assertEqual(BatchStats.fip([26], [80], [8], [277], [209.2], [1]).tolist(), [3.34])
+
+    def test_batting(self):
+        """
+        single, pa, tb, avg, slg, obp, ops, babip test
+        :return:
+        """
+        self.assertSameAsScalar('single', ('h', 'hr', '_2b', '_3b'))
+        self.assertSameAsScalar('pa', ('ab', 'bb', 'hbp', 'sf', 'sh'))
+        self.assertSameAsScalar('tb', ('single', 'hr', '_2b', '_3b'))
+        self.assertSameAsScalar('avg', ('h', 'ab'))
+        self.assertSameAsScalar('slg', ('tb', 'ab'))
+        self.assertSameAsScalar('obp', ('h', 'bb', 'hbp', 'ab', 'sf'))
+        self.assertSameAsScalar('ops', ('h', 'bb', 'hbp', 'ab', 'sf', 'tb'))
+        self.assertSameAsScalar('babip', ('h', 'hr', 'ab', 'so', 'sf'))
+        self.assertSameAsScalar('adam_dunn_batter', ('hr', 'bb', 'so', 'pa'))
+
+    def test_rc(self):
+        """
+        Run created test
+        :return:
+        """
+        self.assertSameAsScalar('rc', ('tb', 'h', 'bb', 'hbp', 'cs', 'gidp', 'sf', 'sh', 'sb', 'so', 'ab', 'ibb'))
+        self.assertSameAsScalar('rc2002', ('h', 'bb', 'hbp', 'cs', 'gidp', 'sf', 'sh', 'sb', 'so', 'ab', 'ibb',
+                                           'single', '_2b', '_3b', 'hr'))
+        self.columns['rc'] = BatchStats.rc(*[self.columns[p] for p in (
+            'tb', 'h', 'bb', 'hbp', 'cs', 'gidp', 'sf', 'sh', 'sb', 'so', 'ab', 'ibb'
+        )])
+        self.assertSameAsScalar('rc27', ('rc', 'ab', 'h', 'sh', 'sf', 'cs', 'gidp'))
+        # ichiro suzuki(2004)
+        self.assertEqual(BatchStats.rc(320, 262, 49, 4, 11, 6, 3, 2, 36, 63, 704, 19), 132.09)
+
+    def test_base_runs(self):
+        """
+        Base Runs test
+        :return:
+        """
+        self.assertSameAsScalar('base_runs', ('ab', 'tb', 'h', 'hr', 'bb', 'hbp', 'sb', 'cs', 'gidp', 'ibb'))
+
+    def test_woba(self):
+        """
+        wOBA & wRAA test
+        :return:
+        """
+        params = ('bb', 'hbp', '_1b', '_2b', '_3b', 'hr', 'ab', 'sf', 'ibb')
+        self.assertSameAsScalar('woba_mlb', params)
+        self.assertSameAsScalar('woba_npb', params + ('e_bb', ))
+        self.columns['woba'] = BatchStats.woba_mlb(*[self.columns[p] for p in params])
+        self.columns['lg_woba'] = np.full(self.size, 0.323)
+        self.assertSameAsScalar('wraa', ('woba', 'lg_woba', 'pa'))
+        self.assertSameAsScalar('wraa', ('woba', 'lg_woba', 'pa'), woba_scale=1.189)
+
+    def test_rsaa(self):
+        """
+        Run Saved Above Average test
+        :return:
+        """
+        # nagisa arakaki, hisashi iwakuma, Dice-K(2004)
+        rsaa = BatchStats.rsaa([3.51, 3.23, 3.08], 5.14, [192.1, 158.2, 146])
+        self.assertEqual(rsaa.tolist(), [34.8, 33.6, 33.4])
+
+    def test_buffer_protocol(self):
+        """
+        array.array and unsigned columns
+        :return:
+        """
+        # Barry bonds(2004)
+        self.assertEqual(BatchStats.avg(array('i', [135]), array('i', [373])).tolist(), [0.362])
+        sb = np.array([1], dtype=np.uint32)
+        cs = np.array([3], dtype=np.uint32)
+        self.assertEqual(
+            BatchStats.base_runs([704], [320], [262], [8], [49], [4], sb, cs, [6], [19]).tolist(),
+            [Stats.base_runs(704, 320, 262, 8, 49, 4, 1, 3, 6, 19)]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()